@@ -0,0 +1,122 @@
+'''
+Пояснения по коду:
+
+Аналитика статусов за произвольный период:
+
+Подсчет выполняется в базе данных (GROUP BY): Database.count_statuses_by_day возвращает
+количество статусов каждого вида по дням, Database.count_statuses_by_user — по сотрудникам.
+Сырые записи статусов в бот не загружаются, объем данных — не больше
+"дней × видов статусов" и "сотрудников × видов статусов".
+Агрегаты за завершенные дни кэшируются в Database, поэтому повторный запрос того же периода
+обращается к базе только за сегодняшний день.
+
+Из этих агрегатов функция build_analytics получает:
+количество по каждому статусу за период;
+распределение статусов по дням недели и по неделям (ISO);
+количество статусов по каждому сотруднику.
+
+Результат (AnalyticsReport):
+text — текстовый отчет для администратора;
+days_csv — таблица "дата × статус" для построения графиков;
+users_csv — таблица "сотрудник × статус".
+'''
+# analytics.py
+import csv
+import io
+from collections import Counter, namedtuple
+from utils import REPORT_STATUSES
+from rendering import renderer
+
+AnalyticsReport = namedtuple('AnalyticsReport', ['text', 'days_csv', 'users_csv'])
+
+WEEKDAYS = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+
+
+async def collect_analytics(db, start_date, end_date):
+    """
+    Получает агрегаты из базы данных и формирует отчет в пуле потоков генерации отчетов.
+    """
+    by_day = await db.count_statuses_by_day(start_date, end_date)
+    by_user = await db.count_statuses_by_user(start_date, end_date)
+    users = await db.get_all_users()
+    return await renderer.run(build_analytics, start_date, end_date, by_day, by_user, users)
+
+
+def _csv_bytes(header, rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    writer.writerows(rows)
+    # utf-8-sig, чтобы Excel корректно открыл кириллицу
+    return output.getvalue().encode('utf-8-sig')
+
+
+def _format_counts(counts: Counter, status_order):
+    return ", ".join(f"{status} {counts[status]}" for status in status_order if counts[status])
+
+
+def build_analytics(start_date, end_date, by_day, by_user, users):
+    """
+    Строит отчет по агрегатам (date, status, count) и (telegram_id, status, count).
+    """
+    totals = Counter()
+    per_day = {}
+    per_weekday = {}
+    per_week = {}
+    for date_, status, count in by_day:
+        totals[status] += count
+        per_day.setdefault(date_, Counter())[status] += count
+        per_weekday.setdefault(date_.weekday(), Counter())[status] += count
+        year, week, _ = date_.isocalendar()
+        per_week.setdefault((year, week), Counter())[status] += count
+
+    per_user = {}
+    for telegram_id, status, count in by_user:
+        per_user.setdefault(telegram_id, Counter())[status] += count
+
+    status_order = [status for status in REPORT_STATUSES if status in totals]
+    status_order += sorted(status for status in totals if status not in REPORT_STATUSES)
+
+    lines = [f"Аналитические данные за период с {start_date} по {end_date}:", "", "По статусам:"]
+    if not totals:
+        lines.append("Нет данных за период.")
+    for status in status_order:
+        lines.append(f"{status}: {totals[status]} раз(а)")
+
+    if per_weekday:
+        lines += ["", "По дням недели:"]
+        for weekday in sorted(per_weekday):
+            counts = per_weekday[weekday]
+            total = sum(counts.values())
+            office_share = counts['Очно'] * 100 // total
+            lines.append(
+                f"{WEEKDAYS[weekday]}: в офисе {office_share}% — {_format_counts(counts, status_order)}"
+            )
+
+    if per_week:
+        lines += ["", "По неделям:"]
+        for year, week in sorted(per_week):
+            counts = per_week[(year, week)]
+            lines.append(f"{year}-W{week:02d}: {_format_counts(counts, status_order)}")
+
+    lines += ["", f"Сотрудников со статусами за период: {len(per_user)}. Подробности — в таблицах."]
+
+    days_csv = _csv_bytes(
+        ['Дата'] + status_order,
+        (
+            [date_.isoformat()] + [per_day[date_][status] for status in status_order]
+            for date_ in sorted(per_day)
+        )
+    )
+    names = {user['telegram_id']: user['full_name'] for user in users}
+    users_csv = _csv_bytes(
+        ['ФИО', 'Telegram ID'] + status_order,
+        (
+            [names.get(telegram_id, "Неизвестный пользователь"), telegram_id]
+            + [counts[status] for status in status_order]
+            for telegram_id, counts in sorted(
+                per_user.items(), key=lambda item: names.get(item[0], "")
+            )
+        )
+    )
+    return AnalyticsReport("\n".join(lines), days_csv, users_csv)
@@ -0,0 +1,187 @@
+'''
+Пояснения по коду:
+
+Матричная аналитика посещаемости на NumPy:
+
+Статусы за период (Database.get_statuses_in_period) загружаются в компактную матрицу
+"сотрудник × рабочий день" (numpy.int8), где каждый статус закодирован небольшим числом
+(STATUS_CODES), а 0 означает отсутствие записи. Выходные дни в матрицу не входят.
+
+Все показатели считаются векторными операциями над матрицей, без циклов по записям:
+office_ratio — доля дней в офисе среди рабочих дней сотрудника (очно, удаленно, другое);
+longest_sick — самая длинная серия больничных подряд, current_sick — текущая серия;
+non_response — доля дней без ответа (нет записи или "Не известно");
+weekly_office — доля сотрудников в офисе по неделям и изменение к предыдущей неделе.
+
+Матрица на тысячи сотрудников за несколько лет занимает единицы мегабайт
+и обрабатывается за доли секунды. Расчет выполняется в пуле потоков генерации отчетов.
+'''
+# attendance.py
+from collections import namedtuple
+from datetime import timedelta
+import numpy as np
+import config
+from rendering import renderer
+
+NO_STATUS = 0
+OFFICE = 1
+REMOTE = 2
+SICK = 3
+VACATION = 4
+OTHER = 5
+UNKNOWN = 6
+
+STATUS_CODES = {
+    "Очно": OFFICE,
+    "Удаленно": REMOTE,
+    "Больничный": SICK,
+    "В отпуске": VACATION,
+    "Другое": OTHER,
+    "Не известно": UNKNOWN,
+}
+
+AttendanceMatrix = namedtuple('AttendanceMatrix', ['user_ids', 'days', 'codes'])
+
+AttendanceStats = namedtuple('AttendanceStats', [
+    'office_ratio', 'longest_sick', 'current_sick', 'non_response', 'weeks', 'weekly_office'
+])
+
+
+def build_matrix(users, rows, start_date, end_date):
+    """
+    Строит матрицу кодов статусов "сотрудник × рабочий день" за период.
+    """
+    user_ids = np.array(sorted(user['telegram_id'] for user in users), dtype=np.int64)
+    days = [
+        start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)
+        if (start_date + timedelta(days=i)).weekday() < 5
+    ]
+    day_ordinals = np.array([day.toordinal() for day in days], dtype=np.int64)
+    codes = np.zeros((len(user_ids), len(days)), dtype=np.int8)
+    if not len(rows) or not len(user_ids) or not len(days):
+        return AttendanceMatrix(user_ids, days, codes)
+
+    row_users = np.fromiter((row['telegram_id'] for row in rows), dtype=np.int64, count=len(rows))
+    row_days = np.fromiter((row['date'].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+    row_codes = np.fromiter(
+        (STATUS_CODES.get(row['status'], OTHER) for row in rows), dtype=np.int8, count=len(rows)
+    )
+    user_index = np.searchsorted(user_ids, row_users)
+    day_index = np.searchsorted(day_ordinals, row_days)
+    # Записи удаленных пользователей и выходных дней отбрасываются
+    valid = (user_index < len(user_ids)) & (day_index < len(days))
+    valid[valid] &= (
+        (user_ids[user_index[valid]] == row_users[valid])
+        & (day_ordinals[day_index[valid]] == row_days[valid])
+    )
+    codes[user_index[valid], day_index[valid]] = row_codes[valid]
+    return AttendanceMatrix(user_ids, days, codes)
+
+
+def _runs(mask):
+    """
+    Для булевой матрицы возвращает (строка, начало, длина) всех серий True подряд.
+    """
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    return starts[:, 0], starts[:, 1], ends[:, 1] - starts[:, 1]
+
+
+def compute_stats(matrix: AttendanceMatrix):
+    """
+    Считает показатели посещаемости по матрице статусов.
+    """
+    codes = matrix.codes
+    n_users, n_days = codes.shape
+
+    office = codes == OFFICE
+    working = office | (codes == REMOTE) | (codes == OTHER)
+    working_days = working.sum(axis=1)
+    office_ratio = np.divide(
+        office.sum(axis=1), working_days,
+        out=np.zeros(n_users, dtype=np.float64), where=working_days > 0
+    )
+
+    rows, starts, lengths = _runs(codes == SICK)
+    longest_sick = np.zeros(n_users, dtype=np.int64)
+    np.maximum.at(longest_sick, rows, lengths)
+    current_sick = np.zeros(n_users, dtype=np.int64)
+    ongoing = starts + lengths == n_days
+    current_sick[rows[ongoing]] = lengths[ongoing]
+
+    non_response = ((codes == NO_STATUS) | (codes == UNKNOWN)).sum(axis=1) / max(n_days, 1)
+
+    # Доля сотрудников в офисе по ISO-неделям
+    week_keys = np.array(
+        [day.isocalendar()[0] * 100 + day.isocalendar()[1] for day in matrix.days], dtype=np.int64
+    )
+    weeks, week_starts = np.unique(week_keys, return_index=True)
+    if n_days and n_users:
+        office_per_day = office.sum(axis=0)
+        days_per_week = np.diff(np.append(week_starts, n_days))
+        weekly_office = np.add.reduceat(office_per_day, week_starts) / (days_per_week * n_users)
+    else:
+        weekly_office = np.zeros(len(weeks))
+    return AttendanceStats(
+        office_ratio, longest_sick, current_sick, non_response, weeks, weekly_office
+    )
+
+
+def format_attendance_report(users, rows, start_date, end_date, top_n: int, threshold: float):
+    """
+    Строит матрицу, считает показатели и форматирует текстовый отчет.
+    """
+    matrix = build_matrix(users, rows, start_date, end_date)
+    stats = compute_stats(matrix)
+    names = {user['telegram_id']: user['full_name'] for user in users}
+    user_ids = matrix.user_ids
+
+    lines = [
+        f"Посещаемость за период с {start_date} по {end_date} "
+        f"({len(user_ids)} сотрудников, {len(matrix.days)} рабочих дней):"
+    ]
+
+    lines += ["", "Недельная доля сотрудников в офисе:"]
+    previous = None
+    for week, share in zip(stats.weeks, stats.weekly_office):
+        trend = "" if previous is None else f" ({(share - previous) * 100:+.1f} п.п.)"
+        lines.append(f"{week // 100}-W{week % 100:02d}: {share * 100:.1f}%{trend}")
+        previous = share
+
+    order = np.argsort(-stats.office_ratio, kind='stable')[:top_n]
+    lines += ["", "Чаще всего в офисе:"]
+    lines += [
+        f"{names[user_ids[i]]}: {stats.office_ratio[i] * 100:.0f}%"
+        for i in order if stats.office_ratio[i] > 0
+    ] or ["Нет данных."]
+
+    order = np.argsort(-stats.longest_sick, kind='stable')[:top_n]
+    lines += ["", "Самые длинные больничные (рабочих дней подряд):"]
+    lines += [
+        f"{names[user_ids[i]]}: {stats.longest_sick[i]}"
+        + (f", сейчас {stats.current_sick[i]}" if stats.current_sick[i] else "")
+        for i in order if stats.longest_sick[i] > 0
+    ] or ["Нет данных."]
+
+    chronic = np.flatnonzero(stats.non_response >= threshold)
+    chronic = chronic[np.argsort(-stats.non_response[chronic], kind='stable')][:top_n]
+    lines += ["", f"Систематически не отвечают (не менее {threshold * 100:.0f}% дней):"]
+    lines += [
+        f"{names[user_ids[i]]}: {stats.non_response[i] * 100:.0f}%" for i in chronic
+    ] or ["Нет."]
+    return "\n".join(lines)
+
+
+async def collect_attendance(db, start_date, end_date):
+    """
+    Загружает статусы за период и формирует отчет о посещаемости в пуле потоков.
+    """
+    rows = await db.get_statuses_in_period(start_date, end_date)
+    users = await db.get_all_users()
+    return await renderer.run(
+        format_attendance_report, users, rows, start_date, end_date,
+        config.ATTENDANCE_TOP_N, config.ATTENDANCE_NON_RESPONSE_THRESHOLD
+    )
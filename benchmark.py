@@ -0,0 +1,330 @@
+'''
+Пояснения по коду:
+
+Замеры производительности методов Database и формирования отчетов:
+
+python benchmark.py [--sizes 100x7,1000x30] [--repeat N] [--output results.json] [--baseline old.json]
+python benchmark.py --compare old.json new.json
+
+Данные:
+
+Для каждого размера "сотрудники x дни" создается новая база SQLite во временном каталоге
+(адрес задается до импорта config, рабочая база из .env не затрагивается). В нее добавляются
+сотрудники (первые BENCH_ADMINS — администраторы), статусы за каждый день периода,
+заканчивающегося сегодня, и многодневные статусы у доли BENCH_INTERVAL_SHARE сотрудников.
+Генератор случайных чисел инициализируется --seed, поэтому данные воспроизводимы.
+
+Замеры:
+
+Каждый замер выполняется один раз для прогрева и затем --repeat раз; сохраняются медиана,
+минимум и 95-й процентиль. Методы с кэшем (get_all_users, get_daily_summary, агрегаты аналитики)
+замеряются дважды: с кэшем и "cold" — с очисткой кэша перед каждым вызовом (очистка не входит
+во время замера). Отчеты — format_status_report, format_daily_report, send_admin_report
+(через пул потоков генерации отчетов), аналитика, посещаемость и выгрузка Excel.
+
+Сравнение с базовыми результатами:
+
+С --baseline (или в режиме --compare) медианы сравниваются по каждому размеру и замеру.
+Замедление больше чем на config.BENCHMARK_THRESHOLD (доля, по умолчанию 0.2 — 20%)
+и больше NOISE_FLOOR секунд считается регрессией; при регрессиях скрипт завершается с кодом 1.
+'''
+# benchmark.py
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Адрес базы задается до импорта config, чтобы замеры не затронули рабочую базу из .env
+BENCH_DIR = tempfile.mkdtemp(prefix='benchmark_')
+BENCH_DB_PATH = os.path.join(BENCH_DIR, 'benchmark.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + BENCH_DB_PATH
+
+import config
+from db import Database, users as users_table, status_intervals
+from utils import format_status_report, format_daily_report, REPORT_STATUSES
+from broadcast import split_text
+from analytics import collect_analytics
+from attendance import collect_attendance
+from export import write_status_matrix
+from handlers import send_admin_report
+from rendering import renderer
+
+DEFAULT_SIZES = '100x7,1000x30,5000x30'
+
+# Количество администраторов среди синтетических сотрудников
+BENCH_ADMINS = 3
+
+# Доля сотрудников с многодневным статусом на сегодня
+BENCH_INTERVAL_SHARE = 0.02
+
+# Распределение статусов в синтетических данных: статус и вес
+STATUS_WEIGHTS = (
+    ('Очно', 55), ('Удаленно', 25), ('Больничный', 3), ('В отпуске', 4),
+    ('Другое', 5), ('Не известно', 8)
+)
+
+# Разница медиан меньше этого значения (в секундах) не считается регрессией
+NOISE_FLOOR = 0.0002
+
+
+def parse_sizes(value: str):
+    sizes = []
+    for item in value.split(','):
+        users, days = item.lower().split('x')
+        sizes.append((int(users), int(days)))
+    return sizes
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        'median': timings[len(timings) // 2],
+        'min': timings[0],
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'runs': len(timings),
+    }
+
+
+async def seed(db: Database, users_count: int, days: int, rng: random.Random):
+    """
+    Заполняет базу сотрудниками и статусами за days дней, заканчивающихся сегодня.
+    """
+    today = datetime.now(db.timezone).date()
+    surnames = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Волков', 'Соколов')
+    names = ('Иван', 'Петр', 'Анна', 'Мария', 'Олег', 'Елена')
+    user_rows = [
+        {
+            'telegram_id': 1000 + n,
+            'full_name': f"{rng.choice(surnames)} {rng.choice(names)} {n}",
+            'is_admin': n < BENCH_ADMINS,
+        }
+        for n in range(users_count)
+    ]
+    await db.database.execute_many(users_table.insert(), user_rows)
+    statuses, weights = zip(*STATUS_WEIGHTS)
+    for offset in range(days):
+        date_ = today - timedelta(days=offset)
+        chosen = rng.choices(statuses, weights, k=users_count)
+        await db.upsert_statuses([
+            {
+                'telegram_id': row['telegram_id'],
+                'status': status,
+                'description': "Командировка" if status == 'Другое' else None,
+                'date': date_,
+            }
+            for row, status in zip(user_rows, chosen)
+        ])
+    interval_rows = [
+        {
+            'telegram_id': row['telegram_id'],
+            'status': rng.choice(('Больничный', 'В отпуске')),
+            'start_date': today - timedelta(days=rng.randint(0, 5)),
+            'end_date': today + timedelta(days=rng.randint(0, 10)),
+        }
+        for row in user_rows if rng.random() < BENCH_INTERVAL_SHARE
+    ]
+    if interval_rows:
+        await db.database.execute_many(status_intervals.insert(), interval_rows)
+
+
+def benchmarks(db: Database, today, start_date, users, statuses, summary):
+    """
+    Возвращает замеры: (название, функция, подготовка перед каждым вызовом или None).
+    """
+    week_start = max(start_date, today - timedelta(days=6))
+    user_id = users[len(users) // 2]['telegram_id']
+    user_ids = [user['telegram_id'] for user in users]
+    buckets = {status: summary.members(status) for status in REPORT_STATUSES}
+    report_text = format_status_report(users, statuses)
+    xlsx_path = os.path.join(BENCH_DIR, 'export.xlsx')
+
+    def clear_users():
+        db.users_cache.clear()
+
+    def clear_summaries():
+        db.daily_summaries.clear()
+
+    def clear_analytics():
+        db.analytics_cache.clear()
+
+    async def iterate_matrix():
+        async for _ in db.iterate_status_matrix(week_start, today):
+            pass
+
+    return [
+        ('get_user', lambda: db.get_user(user_id), None),
+        ('get_user[cold]', lambda: db.get_user(user_id), clear_users),
+        ('get_admins', db.get_admins, None),
+        ('get_admins[cold]', db.get_admins, clear_users),
+        ('get_all_users', db.get_all_users, None),
+        ('get_all_users[cold]', db.get_all_users, clear_users),
+        ('get_users_page', lambda: db.get_users_page(len(users) // 2, config.EMPLOYEE_PAGE_SIZE), None),
+        ('count_users', db.count_users, None),
+        ('add_or_update_status', lambda: db.add_or_update_status(user_id, 'Очно'), None),
+        ('get_status', lambda: db.get_status(user_id, today), None),
+        ('check_status_exists', lambda: db.check_status_exists(user_id, today), None),
+        ('get_statuses_for_date', lambda: db.get_statuses_for_date(today), None),
+        ('get_statuses_in_period[week]', lambda: db.get_statuses_in_period(week_start, today), None),
+        ('get_statuses_in_period[all]', lambda: db.get_statuses_in_period(start_date, today), None),
+        ('get_users_without_status', lambda: db.get_users_without_status(today), None),
+        ('get_users_without_interval', lambda: db.get_users_without_interval(today), None),
+        ('apply_status_intervals', lambda: db.apply_status_intervals(today), None),
+        ('add_unknown_statuses', lambda: db.add_unknown_statuses(user_ids, today), None),
+        ('get_daily_summary', lambda: db.get_daily_summary(today), None),
+        ('get_daily_summary[cold]', lambda: db.get_daily_summary(today), clear_summaries),
+        ('count_statuses_by_day', lambda: db.count_statuses_by_day(start_date, today), None),
+        ('count_statuses_by_day[cold]', lambda: db.count_statuses_by_day(start_date, today), clear_analytics),
+        ('count_statuses_by_user[cold]', lambda: db.count_statuses_by_user(start_date, today), clear_analytics),
+        ('iterate_status_matrix[week]', iterate_matrix, None),
+        ('format_status_report', lambda: format_status_report(users, statuses), None),
+        ('format_daily_report', lambda: format_daily_report(users, buckets), None),
+        ('split_text', lambda: split_text(report_text), None),
+        ('send_admin_report', lambda: send_admin_report(db, today), None),
+        ('collect_analytics', lambda: collect_analytics(db, start_date, today), None),
+        ('collect_attendance', lambda: collect_attendance(db, start_date, today), None),
+        ('write_status_matrix[week]', lambda: write_status_matrix(db, week_start, today, xlsx_path), None),
+    ]
+
+
+async def measure(func, setup, repeat: int):
+    timings = []
+    for run in range(repeat + 1):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        if inspect.isawaitable(result):
+            await result
+        elapsed = time.perf_counter() - started
+        # Первый вызов — прогрев
+        if run:
+            timings.append(elapsed)
+    return summarize(timings)
+
+
+async def run_size(users_count: int, days: int, repeat: int, seed_value: int, only=None):
+    if os.path.exists(BENCH_DB_PATH):
+        os.remove(BENCH_DB_PATH)
+    db = Database()
+    await db.connect()
+    try:
+        await seed(db, users_count, days, random.Random(seed_value))
+        today = datetime.now(db.timezone).date()
+        start_date = today - timedelta(days=days - 1)
+        users = await db.get_all_users()
+        statuses = await db.get_statuses_for_date(today)
+        summary = await db.get_daily_summary(today)
+        results = {}
+        for name, func, setup in benchmarks(db, today, start_date, users, statuses, summary):
+            if only and not any(part in name for part in only):
+                continue
+            results[name] = await measure(func, setup, repeat)
+            print(f"  {name}: {results[name]['median'] * 1000:.3f} мс", file=sys.stderr)
+        return results
+    finally:
+        await db.disconnect()
+
+
+async def run(sizes, repeat: int, seed_value: int, only=None):
+    results = {}
+    for users_count, days in sizes:
+        key = f"{users_count}x{days}"
+        print(f"Размер {key}:", file=sys.stderr)
+        results[key] = await run_size(users_count, days, repeat, seed_value, only)
+    renderer.shutdown()
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'repeat': repeat,
+            'seed': seed_value,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold: float):
+    """
+    Сравнивает медианы и возвращает строки отчета и количество регрессий.
+    """
+    lines = []
+    regressions = 0
+    for size, benches in current['results'].items():
+        base_benches = baseline['results'].get(size)
+        if base_benches is None:
+            lines.append(f"{size}: нет в базовых результатах")
+            continue
+        lines.append(f"{size}:")
+        for name, result in benches.items():
+            base = base_benches.get(name)
+            if base is None:
+                lines.append(f"  {name}: новый замер, {result['median'] * 1000:.3f} мс")
+                continue
+            old, new = base['median'], result['median']
+            change = (new - old) / old if old else 0.0
+            mark = ""
+            if change > threshold and new - old > NOISE_FLOOR:
+                mark = "  РЕГРЕССИЯ"
+                regressions += 1
+            lines.append(
+                f"  {name}: {old * 1000:.3f} → {new * 1000:.3f} мс ({change * 100:+.1f}%){mark}"
+            )
+    lines.append(
+        f"Регрессий (медленнее более чем на {threshold * 100:.0f}%): {regressions}"
+    )
+    return lines, regressions
+
+
+def load(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности методов Database и отчетов")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="размеры данных: сотрудники x дни через запятую")
+    parser.add_argument("--repeat", type=int, default=20, help="количество замеров каждого вызова")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора синтетических данных")
+    parser.add_argument("--only", default=None, help="замерять только вызовы, содержащие эти подстроки (через запятую)")
+    parser.add_argument("--output", default=None, help="файл для результатов в формате JSON")
+    parser.add_argument("--baseline", default=None, help="сравнить результаты с этим файлом")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("BASELINE", "CURRENT"), default=None,
+        help="только сравнить два файла результатов"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=config.BENCHMARK_THRESHOLD,
+        help="допустимое замедление медианы (доля)"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = load(args.compare[0]), load(args.compare[1])
+    else:
+        only = args.only.split(',') if args.only else None
+        current = asyncio.run(run(parse_sizes(args.sizes), args.repeat, args.seed, only))
+        output = json.dumps(current, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            print(output)
+        baseline = load(args.baseline) if args.baseline else None
+
+    if baseline is not None:
+        lines, regressions = compare(baseline, current, args.threshold)
+        # Если результаты выведены в stdout, сравнение выводится в stderr, чтобы не испортить JSON
+        stream = sys.stderr if not args.compare and not args.output else sys.stdout
+        print("\n".join(lines), file=stream)
+        if regressions:
+            sys.exit(1)
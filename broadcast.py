@@ -0,0 +1,204 @@
+'''
+Пояснения по коду:
+
+Движок массовой рассылки сообщений:
+
+Отправляет сообщения конкурентно, но в рамках лимитов Telegram:
+глобального (config.BROADCAST_RATE_LIMIT сообщений в секунду на бота)
+и на отдельный чат (не чаще одного сообщения в config.BROADCAST_CHAT_INTERVAL секунд).
+Количество одновременных запросов к API ограничено config.BROADCAST_CONCURRENCY.
+
+Обработка ошибок:
+
+RetryAfter (flood wait) — рассылка приостанавливается для всех чатов на указанное Telegram время,
+после чего сообщение отправляется повторно.
+NetworkError, RestartingTelegram и ошибки сервера Telegram (5xx) — повторная отправка
+с экспоненциальной задержкой; если попытки исчерпаны, результат RETRY (можно повторить позже).
+BadRequest и другие ошибки запроса — результат FAILED сразу, повтор не поможет.
+BotBlocked, UserDeactivated, ChatNotFound и т.п. — получатель считается заблокировавшим бота.
+CantParseEntities при отправке с разметкой (parse_mode) — сообщение отправляется еще раз без разметки.
+Результаты отправок, ошибки по типу и время запросов к API записываются в метрики (metrics.py).
+
+Длинные тексты:
+
+split_text делит текст на части по границам строк, чтобы каждая помещалась в лимит Telegram (4096 символов).
+
+Результат рассылки:
+
+Функция broadcast возвращает BroadcastResult с количеством отправленных, неотправленных
+и заблокированных сообщений и пишет итог в лог.
+'''
+# broadcast.py
+import asyncio
+import logging
+from collections import namedtuple
+from aiogram.utils.exceptions import (
+    RetryAfter, NetworkError, RestartingTelegram, Unauthorized, ChatNotFound, CantParseEntities,
+    TelegramAPIError
+)
+import config
+from metrics import TELEGRAM_SENDS, TELEGRAM_SEND_ERRORS, TELEGRAM_SEND_SECONDS
+
+BroadcastResult = namedtuple('BroadcastResult', ['sent', 'failed', 'blocked'])
+
+# Максимальная длина текста одного сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Результаты отправки одного сообщения
+SENT = 'sent'
+FAILED = 'failed'
+BLOCKED = 'blocked'
+# Временная ошибка, попытки исчерпаны: сообщение можно отправить позже
+RETRY = 'retry'
+
+
+def split_text(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT):
+    """
+    Делит текст на части не длиннее limit символов по границам строк.
+    Строка длиннее limit делится по последнему пробелу перед границей
+    (или ровно по limit символов, если пробелов нет).
+    """
+    chunks = []
+    current = []
+    size = 0
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if current:
+                chunks.append('\n'.join(current))
+                current, size = [], 0
+            cut = line.rfind(' ', 0, limit + 1)
+            if cut <= 0:
+                cut = limit
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip(' ')
+        if current and size + 1 + len(line) > limit:
+            chunks.append('\n'.join(current))
+            current, size = [], 0
+        size += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты: выдает "слоты" на отправку не чаще rate раз в секунду
+    глобально и не чаще одного раза в chat_interval секунд для каждого чата.
+    """
+
+    def __init__(self, rate: float, chat_interval: float):
+        self.interval = 1.0 / rate
+        self.chat_interval = chat_interval
+        self._next_slot = 0.0
+        self._chat_slots = {}
+        self._lock = None
+
+    async def acquire(self, chat_id: int):
+        # Блокировка создается лениво, чтобы быть привязанной к работающему циклу событий
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_event_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot, self._chat_slots.get(chat_id, 0.0))
+            self._next_slot = slot + self.interval
+            self._chat_slots[chat_id] = slot + self.chat_interval
+            if len(self._chat_slots) > config.BROADCAST_CONCURRENCY * 100:
+                self._chat_slots = {
+                    key: value for key, value in self._chat_slots.items() if value > now
+                }
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        """
+        Приостанавливает выдачу слотов для всех чатов (используется при RetryAfter).
+        """
+        now = asyncio.get_event_loop().time()
+        self._next_slot = max(self._next_slot, now + seconds)
+
+
+limiter = RateLimiter(config.BROADCAST_RATE_LIMIT, config.BROADCAST_CHAT_INTERVAL)
+
+
+async def send_one(bot, chat_id: int, text: str, retries: int = None, **kwargs):
+    """
+    Отправляет одно сообщение с учетом лимитов и повторных попыток.
+    retries — число повторов при временных ошибках (по умолчанию config.BROADCAST_MAX_RETRIES).
+    Возвращает SENT, BLOCKED, FAILED (постоянная ошибка) или RETRY (временная ошибка,
+    попытки исчерпаны).
+    """
+    if retries is None:
+        retries = config.BROADCAST_MAX_RETRIES
+    result = await _send_with_retries(bot, chat_id, text, retries, **kwargs)
+    TELEGRAM_SENDS.inc(result=result)
+    return result
+
+
+async def _send_with_retries(bot, chat_id: int, text: str, retries: int, **kwargs):
+    plain_text = False
+    for attempt in range(retries + 1):
+        await limiter.acquire(chat_id)
+        started = asyncio.get_event_loop().time()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            return SENT
+        except RetryAfter as e:
+            logging.warning(f"Flood wait {e.timeout} с. при отправке в чат {chat_id}.")
+            TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            limiter.pause(e.timeout)
+        except (NetworkError, RestartingTelegram) as e:
+            logging.warning(f"Временная ошибка при отправке в чат {chat_id}: {e}")
+            TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            await asyncio.sleep(2 ** attempt)
+        except (Unauthorized, ChatNotFound) as e:
+            logging.info(f"Чат {chat_id} недоступен: {e}")
+            TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            return BLOCKED
+        except CantParseEntities as e:
+            TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            if not kwargs.get('parse_mode'):
+                logging.error(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                return FAILED
+            # Сообщение с ошибкой разметки отправляется без разметки, а не теряется
+            logging.warning(f"Ошибка разметки сообщения в чат {chat_id}, отправка без разметки: {e}")
+            kwargs = {key: value for key, value in kwargs.items() if key != 'parse_mode'}
+            plain_text = True
+        except TelegramAPIError as e:
+            TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+            if type(e) is not TelegramAPIError:
+                # BadRequest, NotFound и т.п.: повтор не поможет
+                logging.error(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                return FAILED
+            # Ошибка сервера Telegram (5xx)
+            logging.warning(f"Ошибка сервера Telegram при отправке в чат {chat_id}: {e}")
+            await asyncio.sleep(2 ** attempt)
+        finally:
+            TELEGRAM_SEND_SECONDS.observe(asyncio.get_event_loop().time() - started)
+        if plain_text:
+            return await _send_with_retries(bot, chat_id, text, retries - attempt, **kwargs)
+    logging.error(f"Не удалось отправить сообщение в чат {chat_id}: исчерпаны попытки.")
+    return RETRY
+
+
+async def broadcast(bot, chat_ids, text: str, **kwargs):
+    """
+    Рассылает сообщение text во все чаты chat_ids.
+    Дополнительные аргументы (reply_markup, parse_mode и т.д.) передаются в send_message.
+    """
+    semaphore = asyncio.Semaphore(config.BROADCAST_CONCURRENCY)
+    counts = {SENT: 0, FAILED: 0, BLOCKED: 0}
+
+    async def worker(chat_id):
+        async with semaphore:
+            result = await send_one(bot, chat_id, text, **kwargs)
+            counts[FAILED if result == RETRY else result] += 1
+
+    await asyncio.gather(*(worker(chat_id) for chat_id in chat_ids))
+    result = BroadcastResult(counts[SENT], counts[FAILED], counts[BLOCKED])
+    logging.info(
+        f"Рассылка завершена: отправлено {result.sent}, "
+        f"не отправлено {result.failed}, заблокировали бота {result.blocked}."
+    )
+    return result
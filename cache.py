@@ -0,0 +1,59 @@
+'''
+Пояснения по коду:
+
+TTLCache — небольшой кэш в памяти процесса:
+
+Записи живут не дольше ttl секунд, после чего считаются отсутствующими.
+При превышении maxsize вытесняется запись, к которой дольше всего не обращались (LRU).
+Счетчики hits и misses показывают эффективность кэша.
+
+Значение None можно кэшировать (например, "пользователь не найден"),
+поэтому отсутствие записи в get обозначается константой MISSING.
+'''
+# cache.py
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=MISSING):
+        """
+        Возвращает значение по ключу или default, если записи нет или она устарела.
+        """
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
@@ -0,0 +1,170 @@
+'''
+Пояснения по коду:
+
+Работа нескольких процессов бота (python main.py --webhook --workers N):
+
+Обновления Telegram распределяются между процессами, но плановые задачи (запрос статусов,
+напоминание, проверка неответивших, отчет администраторам) должны выполняться один раз.
+
+Выбор ведущего планировщика (SchedulerLeader):
+
+Каждый процесс раз в config.CLUSTER_LEASE_RENEW секунд пытается захватить или продлить
+аренду "scheduler" в таблице leases на config.CLUSTER_LEASE_TTL секунд
+(Database.acquire_lease). Планировщик запускается приостановленным и работает только
+в процессе, владеющем арендой. Если ведущий процесс завершился, аренда истекает
+и ее захватывает другой процесс.
+
+Ведущий процесс при каждом захвате и продлении аренды, до возобновления планировщика,
+вызывает sync — например, применяет время утреннего запроса статусов из таблицы settings,
+измененное администратором в любом процессе (handlers.sync_status_schedule).
+
+Один запуск задачи за период (run_once):
+
+Плановая задача оборачивается в run_once: перед выполнением она отмечает запуск
+в таблице job_runs с ключом "задача + дата" (Database.claim_job_run); если задан period,
+к дате добавляется его значение (время запуска по расписанию), поэтому перенос задачи
+на более позднее время того же дня дает новый запуск. Уникальный индекс
+гарантирует, что запуск за день достанется только одному процессу, даже если при смене
+ведущего задача сработала в двух процессах.
+Если задача завершилась ошибкой, отметка удаляется. Если процесс завершился во время задачи,
+незавершенную отметку старше JOB_RUN_STALE секунд (срок аренды минус интервал продления:
+к этому времени аренда умершего процесса истекла) забирает новый ведущий при пропущенном
+запуске (misfire), и задача выполняется.
+Длительность и результат каждого запуска (ok, error, skipped) записываются в метрики
+bot_job_seconds и bot_job_runs_total (metrics.py).
+
+Пропущенные запуски:
+
+Пока процесс не владеет арендой, его планировщик приостановлен. Если аренда захвачена
+после назначенного времени задачи (перезапуск, смена ведущего), задача выполняется при
+возобновлении планировщика, если опоздание не больше misfire_grace_time
+(config.SCHEDULER_MISFIRE_GRACE, не меньше CLUSTER_LEASE_TTL + CLUSTER_LEASE_RENEW).
+
+Что не распределяется между процессами:
+
+Порядок обработки обновлений одного пользователя, ограничение частоты и объединение
+повторных нажатий (throttling.py) действуют внутри процесса. Telegram доставляет обновления
+через несколько соединений (config.WEBHOOK_MAX_CONNECTIONS), которые ядро распределяет между
+процессами, поэтому обновления одного пользователя могут попасть в разные процессы, и
+ограничения применяются в каждом процессе отдельно. Запись статуса от этого не страдает:
+add_or_update_status — один upsert, последняя запись побеждает.
+'''
+# cluster.py
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+import config
+from metrics import JOB_SECONDS, JOB_RUNS
+from tracing import tracer
+
+SCHEDULER_LEASE = 'scheduler'
+
+# Идентификатор процесса в таблицах leases и job_runs
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Через сколько секунд незавершенный запуск задачи считается брошенным. Новый ведущий
+# получает аренду не раньше чем через CLUSTER_LEASE_TTL после последнего продления,
+# а задача начата не раньше чем за CLUSTER_LEASE_RENEW до него
+JOB_RUN_STALE = max(config.CLUSTER_LEASE_TTL - config.CLUSTER_LEASE_RENEW, 1)
+
+
+def run_once(db, job_id: str, func, period=None):
+    """
+    Оборачивает плановую задачу: за один день (и значение period(), если задан)
+    она выполняется не более одного раза во всех процессах бота.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        run_key = datetime.now(db.timezone).date().isoformat()
+        if period is not None:
+            run_key = f"{run_key}@{period()}"
+        claim = await db.claim_job_run(job_id, run_key, NODE_ID, JOB_RUN_STALE)
+        if claim is None:
+            logging.info(f"Задача {job_id} за {run_key} уже выполнена или выполняется.")
+            JOB_RUNS.inc(job=job_id, result='skipped')
+            return None
+        started = time.monotonic()
+        # Запросы задачи группируются в одну трассу (tracing.py)
+        token = tracer.start(f"job {job_id}")
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            JOB_RUNS.inc(job=job_id, result='error')
+            # Отметка снимается, чтобы задачу можно было выполнить снова
+            try:
+                await db.release_job_run(job_id, run_key, claim)
+            except Exception as e:
+                logging.error(f"Не удалось снять отметку запуска задачи {job_id}: {e}")
+            raise
+        finally:
+            tracer.finish(token)
+            JOB_SECONDS.observe(time.monotonic() - started, job=job_id)
+        JOB_RUNS.inc(job=job_id, result='ok')
+        await db.finish_job_run(job_id, run_key, claim)
+        return result
+    return wrapper
+
+
+class SchedulerLeader:
+    def __init__(self, lease_ttl: float, renew_interval: float):
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval
+        self.is_leader = False
+        self._db = None
+        self._scheduler = None
+        self._sync = None
+        self._task = None
+
+    def setup(self, db, scheduler, sync=None):
+        """
+        sync — асинхронная функция без аргументов, которую ведущий процесс вызывает
+        перед возобновлением планировщика и при каждом продлении аренды.
+        """
+        self._db, self._scheduler, self._sync = db, scheduler, sync
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            self._set_leader(False)
+            await self._db.release_lease(SCHEDULER_LEASE, NODE_ID)
+
+    def _set_leader(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        if is_leader:
+            logging.info(f"Процесс {NODE_ID} стал ведущим, планировщик запущен.")
+            self._scheduler.resume()
+        else:
+            logging.info(f"Процесс {NODE_ID} больше не ведущий, планировщик приостановлен.")
+            self._scheduler.pause()
+
+    async def _run(self):
+        while True:
+            try:
+                is_leader = await self._db.acquire_lease(SCHEDULER_LEASE, NODE_ID, self.lease_ttl)
+            except Exception as e:
+                # Без подтвержденной аренды процесс не может считаться ведущим
+                logging.error(f"Не удалось продлить аренду планировщика: {e}")
+                is_leader = False
+            if is_leader and self._sync is not None:
+                try:
+                    await self._sync()
+                except Exception as e:
+                    logging.error(f"Не удалось обновить расписание планировщика: {e}")
+            self._set_leader(is_leader)
+            await asyncio.sleep(self.renew_interval)
+
+
+leader = SchedulerLeader(config.CLUSTER_LEASE_TTL, config.CLUSTER_LEASE_RENEW)
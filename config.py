@@ -31,4 +31,179 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Время в минутах, через которое необходимо напомнить о непроставленном статусе
-REMINDER_TIME = 10
\ No newline at end of file
+REMINDER_TIME = 10
+
+# Глобальный лимит Telegram на рассылку: сообщений в секунду на бота
+BROADCAST_RATE_LIMIT = float(os.getenv("BROADCAST_RATE_LIMIT", "25"))
+
+# Минимальный интервал в секундах между сообщениями в один и тот же чат
+BROADCAST_CHAT_INTERVAL = float(os.getenv("BROADCAST_CHAT_INTERVAL", "1"))
+
+# Максимальное число одновременных запросов к Telegram при рассылке
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+
+# Количество повторных попыток отправки при RetryAfter и сетевых ошибках
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+# Время жизни записей кэша пользователей и администраторов в секундах
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+# Максимальное число записей в кэше пользователей
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# Количество последних дней, агрегаты статусов за которые хранятся в памяти
+DAILY_SUMMARY_DAYS = int(os.getenv("DAILY_SUMMARY_DAYS", "7"))
+
+# Количество потоков для формирования отчетов и выгрузок Excel
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+
+# Максимальное число отчетов, формируемых одновременно по запросам администраторов
+REPORT_QUEUE_LIMIT = int(os.getenv("REPORT_QUEUE_LIMIT", "4"))
+
+# Периоды аналитики в днях, доступные в панели администратора
+ANALYTICS_PERIODS = [int(days) for days in os.getenv("ANALYTICS_PERIODS", "7,30,90,365").split(",")]
+
+# Максимальное число закэшированных агрегатов аналитики за завершенные периоды
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "64"))
+
+# Количество сотрудников в каждом списке отчета о посещаемости
+ATTENDANCE_TOP_N = int(os.getenv("ATTENDANCE_TOP_N", "10"))
+
+# Доля дней без ответа, начиная с которой сотрудник считается систематически не отвечающим
+ATTENDANCE_NON_RESPONSE_THRESHOLD = float(os.getenv("ATTENDANCE_NON_RESPONSE_THRESHOLD", "0.5"))
+
+# Окно накопления уведомлений администраторам в секундах: события за это время отправляются одним сообщением
+ADMIN_DIGEST_WINDOW = float(os.getenv("ADMIN_DIGEST_WINDOW", "60"))
+
+# Минимальный интервал в секундах между обновлениями живой сводки администратора
+DASHBOARD_INTERVAL = float(os.getenv("DASHBOARD_INTERVAL", "15"))
+
+# Закреплять ли сообщение живой сводки в чате администратора
+DASHBOARD_PIN = os.getenv("DASHBOARD_PIN", "true").lower() in ("1", "true", "yes")
+
+# Количество фоновых обработчиков очереди исходящих сообщений
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+
+# Количество сообщений, забираемых обработчиком из очереди за один раз
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+
+# Интервал опроса очереди в секундах, когда она пуста
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+
+# Время в секундах, на которое сообщение закрепляется за обработчиком во время отправки
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "120"))
+
+# Максимальное число попыток отправки сообщения из очереди
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Начальная задержка в секундах перед повторной отправкой (удваивается с каждой попыткой)
+OUTBOX_RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", "10"))
+
+# Количество состояний FSM, хранимых в памяти
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "1000"))
+
+# Время в секундах, после которого брошенное состояние FSM удаляется
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 60 * 60)))
+
+# Интервал записи измененных состояний FSM в базу данных в секундах
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "2"))
+
+# Количество измененных состояний FSM, при котором запись выполняется сразу
+FSM_FLUSH_BATCH = int(os.getenv("FSM_FLUSH_BATCH", "100"))
+
+# Публичный адрес бота для webhook (например, https://bot.example.com).
+# Если не указан, webhook не регистрируется в Telegram (локальная проверка через replay_updates.py)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+
+# Путь, по которому принимаются обновления
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+# (1–256 символов A-Z, a-z, 0-9, _ и -). Обязателен: без него режим --webhook не запускается
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# Адрес и порт, на которых слушает webhook-сервер (по умолчанию только локально, за обратным прокси)
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+
+# Количество одновременно обрабатываемых обновлений в режиме webhook
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "32"))
+
+# Максимальная длина очереди принятых, но еще не обработанных обновлений
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Максимальное число одновременных HTTPS-соединений Telegram с webhook
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Срок аренды ведущего планировщика в секундах (при нескольких процессах бота)
+CLUSTER_LEASE_TTL = int(os.getenv("CLUSTER_LEASE_TTL", "30"))
+
+# Интервал продления аренды ведущего планировщика в секундах
+CLUSTER_LEASE_RENEW = int(os.getenv("CLUSTER_LEASE_RENEW", "10"))
+
+# Время жизни кэша пользователей в секундах при нескольких процессах бота
+CLUSTER_CACHE_TTL = int(os.getenv("CLUSTER_CACHE_TTL", "5"))
+
+# Скорость пополнения запросов пользователя в секунду (ограничение частоты обновлений)
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+
+# Максимальное число запросов пользователя подряд
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+
+# Максимальное число ожидающих обработки обновлений одного пользователя
+THROTTLE_MAX_PENDING = int(os.getenv("THROTTLE_MAX_PENDING", "3"))
+
+# Количество сотрудников на одной странице выбора сотрудника
+EMPLOYEE_PAGE_SIZE = int(os.getenv("EMPLOYEE_PAGE_SIZE", "10"))
+
+# Максимальное количество результатов поиска сотрудника по ФИО
+EMPLOYEE_SEARCH_LIMIT = int(os.getenv("EMPLOYEE_SEARCH_LIMIT", "20"))
+
+# Максимальное число сообщений, на которые делится длинный отчет; отчет длиннее отправляется файлом
+REPORT_MAX_PAGES = int(os.getenv("REPORT_MAX_PAGES", "3"))
+
+# Максимальная длительность больничного или отпуска, задаваемого сотрудником, в днях
+STATUS_INTERVAL_MAX_DAYS = int(os.getenv("STATUS_INTERVAL_MAX_DAYS", "90"))
+
+# Допустимое замедление медианы в замерах benchmark.py (доля: 0.2 — на 20%), больше — регрессия
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "0.2"))
+
+# Сервер метрик в формате Prometheus (metrics.py); METRICS_PORT=0 отключает сервер.
+# В режиме --workers N процесс с номером i слушает порт METRICS_PORT + i
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+# Трассировка запросов к базе (tracing.py): включена ли при запуске (переключается из панели администратора),
+# порог медленного запроса в секундах и сколько одинаковых запросов в одном обновлении
+# или задаче считается признаком N+1
+TRACE_QUERIES = os.getenv("TRACE_QUERIES", "false").lower() in ("1", "true", "yes")
+TRACE_SLOW_QUERY = float(os.getenv("TRACE_SLOW_QUERY", "0.1"))
+TRACE_REPEAT_THRESHOLD = int(os.getenv("TRACE_REPEAT_THRESHOLD", "10"))
+
+# Пул соединений с базой (db.py): минимальное и максимальное число соединений (PostgreSQL, MySQL).
+# Для утренней рассылки максимальный размер пула должен покрывать число одновременно
+# обрабатываемых обновлений (WEBHOOK_WORKERS) и обработчиков очереди сообщений.
+# Значения min_size, max_size и pool_recycle (MySQL) из DATABASE_URL (?max_size=20) важнее этих настроек
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Максимальное время выполнения одного запроса, в секундах (0 — без ограничения);
+# для SQLite — время ожидания блокировки базы
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", "30"))
+# Через сколько секунд простоя соединение пула закрывается и открывается заново (0 — не закрывать)
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "300"))
+# Проверка соединения при запуске: число попыток, пауза между ними и таймаут проверки, в секундах
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "5"))
+DB_CONNECT_RETRY_DELAY = float(os.getenv("DB_CONNECT_RETRY_DELAY", "2"))
+DB_HEALTH_TIMEOUT = float(os.getenv("DB_HEALTH_TIMEOUT", "5"))
+
+# Сколько секунд после назначенного времени плановая задача еще запускается, если планировщик
+# был приостановлен (перезапуск, смена ведущего процесса); не меньше CLUSTER_LEASE_TTL + CLUSTER_LEASE_RENEW
+SCHEDULER_MISFIRE_GRACE = int(os.getenv("SCHEDULER_MISFIRE_GRACE", "300"))
+
+# Максимальная длина периода выгрузки статусов в Excel, в днях (по колонке на день)
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", "366"))
+
+# Период принудительного обновления открытых сводок администраторов, в секундах (0 — только по нажатиям).
+# Показывает статусы, записанные другими процессами (--workers) и проставленные из интервалов
+DASHBOARD_POLL_INTERVAL = float(os.getenv("DASHBOARD_POLL_INTERVAL", "60"))
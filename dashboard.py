@@ -0,0 +1,152 @@
+'''
+Пояснения по коду:
+
+Живая сводка для администраторов:
+
+Администратор включает сводку кнопкой в панели администратора: бот отправляет сообщение
+с текущим отчетом за день, закрепляет его (если config.DASHBOARD_PIN) и затем
+редактирует это же сообщение (edit_message_text) по мере поступления статусов.
+
+Объединение обновлений:
+
+Каждая запись статуса вызывает dashboard.touch(), который только помечает сводку
+как устаревшую. Обновление выполняется не чаще одного раза в config.DASHBOARD_INTERVAL секунд:
+сотни нажатий кнопок в утренний час превращаются в несколько редактирований.
+Текст отчета формируется один раз на обновление и рассылается во все открытые сводки
+с учетом лимитов Telegram (broadcast.limiter).
+
+Кроме того, пока открыта хотя бы одна сводка, она обновляется каждые
+config.DASHBOARD_POLL_INTERVAL секунд (если текст не изменился, Telegram ничего не меняет).
+
+Размер:
+
+Если полный отчет с именами не помещается в одно сообщение Telegram, сводка показывает
+только количество сотрудников по статусам и подсказку, где получить полный отчет.
+
+Если сообщение сводки удалено или бот заблокирован, сводка для этого чата отключается.
+
+Ограничения режима нескольких процессов (main.py --workers N):
+
+Список открытых сводок хранится в памяти процесса, который обработал нажатие кнопки
+включения, и теряется при его перезапуске. dashboard.touch() вызывается только в процессе,
+записавшем статус, поэтому статусы из других процессов появляются в сводке при периодическом
+обновлении (агрегат статусов в этом режиме каждый раз строится из базы).
+'''
+# dashboard.py
+import asyncio
+import logging
+from datetime import datetime
+from aiogram.utils.exceptions import (
+    MessageNotModified, MessageToEditNotFound, MessageCantBeEdited, Unauthorized,
+    ChatNotFound, RetryAfter, TelegramAPIError
+)
+import config
+from broadcast import limiter, TELEGRAM_MESSAGE_LIMIT
+
+# Подсказка под сокращенной сводкой
+FULL_REPORT_HINT = "Полный отчет с именами — /admin → «Получить статистику»."
+
+
+class Dashboard:
+    def __init__(self, interval: float, poll_interval: float):
+        self.interval = interval
+        self.poll_interval = poll_interval
+        # chat_id -> message_id сообщения сводки
+        self.chats = {}
+        self._dp = None
+        self._db = None
+        self._render = None
+        self._task = None
+        self._poll_task = None
+        self._last_refresh = 0.0
+
+    def setup(self, dp, db, render):
+        """
+        render — корутина render(db, compact=False), возвращающая текст сводки;
+        при compact=True — только количество сотрудников по статусам.
+        """
+        self._dp, self._db, self._render = dp, db, render
+
+    async def _text(self):
+        report = await self._render(self._db)
+        updated = datetime.now(self._db.timezone).strftime('%H:%M:%S')
+        text = f"{report}\n\nОбновлено в {updated}"
+        if len(text) > TELEGRAM_MESSAGE_LIMIT:
+            report = await self._render(self._db, compact=True)
+            text = f"{report}\n\n{FULL_REPORT_HINT}\nОбновлено в {updated}"
+        return text
+
+    async def open(self, chat_id: int):
+        """
+        Отправляет в чат сообщение сводки и начинает его обновлять.
+        """
+        message = await self._dp.bot.send_message(chat_id=chat_id, text=await self._text())
+        self.chats[chat_id] = message.message_id
+        if config.DASHBOARD_PIN:
+            try:
+                await self._dp.bot.pin_chat_message(
+                    chat_id, message.message_id, disable_notification=True
+                )
+            except TelegramAPIError as e:
+                logging.warning(f"Не удалось закрепить сводку в чате {chat_id}: {e}")
+        if self.poll_interval and self._poll_task is None:
+            self._poll_task = asyncio.ensure_future(self._poll())
+
+    def close(self, chat_id: int):
+        self.chats.pop(chat_id, None)
+
+    def touch(self):
+        """
+        Помечает сводку как устаревшую; обновление будет выполнено не чаще раза в interval секунд.
+        """
+        if not self.chats or self._task is not None:
+            return
+        self._task = asyncio.ensure_future(self._refresh_later())
+
+    async def _poll(self):
+        try:
+            while self.chats:
+                await asyncio.sleep(self.poll_interval)
+                self.touch()
+        finally:
+            self._poll_task = None
+
+    async def _refresh_later(self):
+        loop = asyncio.get_event_loop()
+        await asyncio.sleep(max(0.0, self._last_refresh + self.interval - loop.time()))
+        self._task = None
+        self._last_refresh = loop.time()
+        try:
+            await self.refresh()
+        except Exception as e:
+            logging.error(f"Не удалось обновить сводку: {e}")
+
+    async def refresh(self):
+        """
+        Обновляет все открытые сводки.
+        """
+        if not self.chats:
+            return
+        text = await self._text()
+        retry = False
+        for chat_id, message_id in list(self.chats.items()):
+            await limiter.acquire(chat_id)
+            try:
+                await self._dp.bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=message_id
+                )
+            except MessageNotModified:
+                pass
+            except RetryAfter as e:
+                limiter.pause(e.timeout)
+                retry = True
+            except (MessageToEditNotFound, MessageCantBeEdited, Unauthorized, ChatNotFound) as e:
+                logging.info(f"Сводка в чате {chat_id} отключена: {e}")
+                self.close(chat_id)
+            except TelegramAPIError as e:
+                logging.error(f"Не удалось обновить сводку в чате {chat_id}: {e}")
+        if retry:
+            self.touch()
+
+
+dashboard = Dashboard(config.DASHBOARD_INTERVAL, config.DASHBOARD_POLL_INTERVAL)
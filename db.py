@@ -19,32 +19,89 @@ telegram_id — идентификатор пользователя, внешн
 status — статус пользователя на конкретную дату.
 description — дополнительное описание статуса, если выбрано "Другое".
 date — дата, на которую установлен статус.
+Уникальный индекс (telegram_id, date) гарантирует не более одного статуса в день.
+Таблица status_intervals:
+telegram_id — пользователь; status — статус ("Больничный" или "В отпуске");
+start_date, end_date — первый и последний день интервала включительно.
+В дни интервала пользователю не отправляются запросы статуса и напоминания,
+а статус за день записывается в statuses из интервала (apply_status_intervals).
+Таблица fsm_states:
+chat_id, user_id — чат и пользователь, составной первичный ключ.
+state, data, bucket — состояние FSM и его данные (JSON).
+updated_at — время последнего изменения (UTC), по нему удаляются брошенные состояния.
+Таблица settings:
+name — название настройки, первичный ключ; value — значение; updated_at — время изменения (UTC).
+Хранит настройки, общие для всех процессов бота (например, время утреннего запроса статусов).
+Схема и индексы создаются версионными миграциями из migrations.py.
 Класс Database:
 
 Инициализация:
-Создает подключение к базе данных и инициализирует схему.
+Создает объект подключения к базе данных с параметрами пула соединений и таймаутов из config.py
+(pool_options: размер пула, ограничение времени запроса, пересоздание простаивающих соединений).
 Методы для подключения и отключения от базы данных:
 connect и disconnect — устанавливают и разрывают соединение с базой данных.
+connect проверяет соединение (health_check), повторяя попытки, пока база недоступна,
+и применяет новые миграции схемы (в процессах --workers миграции уже применены, connect(migrate=False)).
+health_check — запрос SELECT 1 с таймаутом, возвращает время ответа базы.
+pool_stats — размер пула и число свободных соединений (PostgreSQL, MySQL).
 Методы для работы с пользователями:
 add_user — добавляет нового пользователя.
 get_user — получает информацию о пользователе.
 set_admin — устанавливает или снимает права администратора.
 get_admins — получает список всех администраторов.
 get_all_users — получает список всех пользователей.
+get_users_page и count_users — постраничный вывод пользователей по ФИО и их количество.
+get_user, get_admins и get_all_users читают из кэша в памяти (cache.py) с TTL и вытеснением LRU;
+add_user, delete_user и set_admin сбрасывают кэш. cache_stats возвращает счетчики попаданий и промахов.
+Методы для работы с очередью исходящих сообщений (outbox):
+enqueue_messages — ставит сообщения в очередь с ключом идемпотентности.
+claim_outbox_batch — забирает пакет сообщений на отправку (с арендой на время отправки).
+finish_outbox, retry_outbox — отмечают результат отправки или планируют повтор.
+purge_outbox, outbox_stats — очистка старых сообщений и статистика очереди.
+Методы для хранилища состояний FSM (fsm_storage.py):
+get_fsm_record — читает состояние пользователя в чате.
+save_fsm_records, delete_fsm_records — пакетно сохраняют и удаляют состояния.
+purge_fsm_records — удаляет состояния, не изменявшиеся дольше заданного времени.
+Методы для работы нескольких процессов (cluster.py):
+acquire_lease, release_lease — захват, продление и освобождение аренды с ограниченным сроком.
+claim_job_run, finish_job_run, release_job_run — отметка запуска плановой задачи
+(не более одного за период), его завершения и отмена запуска, завершившегося ошибкой.
+get_setting, set_setting — чтение и запись настроек, общих для всех процессов.
 Методы для работы со статусами:
 add_status — добавляет новый статус для пользователя на текущую дату.
 get_status — получает статус пользователя на текущую дату.
 get_statuses_for_date — получает все статусы на заданную дату.
 check_status_exists — проверяет наличие статуса у пользователя на заданную дату.
 update_status — обновляет существующий статус пользователя.
+get_users_without_status — получает пользователей без статуса и без интервала статуса на заданную дату одним запросом.
+get_users_without_interval — получает пользователей, которых не покрывает интервал статуса на дату.
+set_status_interval, end_status_interval — задают и досрочно завершают многодневный статус.
+get_status_intervals — интервалы статусов, действующие на дату.
+apply_status_intervals — записывает статусы из интервалов на дату одним пакетом.
+add_unknown_statuses — массово проставляет статус "Не известно".
+upsert_statuses — пакетно добавляет или обновляет статусы одним запросом на пакет.
+count_statuses_by_day и count_statuses_by_user — количество статусов по дням и по сотрудникам
+за период (GROUP BY в базе); агрегаты за завершенные дни кэшируются.
+iterate_status_matrix — построчно читает статусы всех пользователей за период для выгрузки в Excel.
+get_daily_summary — возвращает агрегат статусов за день (summary.py), который обновляется при каждой записи статуса.
+rebuild_daily_summary — пересчитывает агрегат за любой день из записей таблицы statuses.
 Важно:
 
 Асинхронные операции:
 
 Все методы взаимодействия с базой данных являются асинхронными (async def), что позволяет эффективно работать с большим количеством запросов без блокировки основного потока.
-Использование metadata.create_all(self.engine):
+Схема создается и изменяется через то же асинхронное подключение, отдельного синхронного подключения нет.
+Миграции (migrations.py):
 
-При инициализации класса Database создаются все таблицы в базе данных, если они еще не существуют.
+При подключении к базе данных применяются миграции, которые еще не записаны в таблицу schema_migrations.
+Метрики (metrics.py):
+
+Время каждого публичного метода Database записывается в гистограмму bot_db_seconds (instrument_methods),
+размер пула соединений — в bot_db_pool_connections (collect_metrics).
+Трассировка (tracing.py):
+
+Запросы подключения проходят через QueryTracer: медленные запросы и повторы одного запроса (N+1)
+в рамках обновления или задачи попадают в лог, когда трассировка включена.
 Безопасность и корректность данных:
 
 Поля таблиц имеют ограничения nullable=False, где это необходимо, чтобы обеспечить целостность данных.
@@ -62,17 +119,36 @@ pip install databases[sqlite] sqlalchemy
 Замените sqlite на соответствующий драйвер вашей базы данных, если используете другую СУБД.
 '''
 # db.py
+import asyncio
+import logging
+import time
 import databases
 import sqlalchemy
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Date, MetaData, Table, create_engine, and_
+    Column, Integer, BigInteger, String, Text, Boolean, Date, DateTime, MetaData, Table, and_, or_
 )
-from config import DATABASE_URL
-from datetime import datetime
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from config import (
+    DATABASE_URL, USER_CACHE_SIZE, USER_CACHE_TTL, DAILY_SUMMARY_DAYS, ANALYTICS_CACHE_SIZE,
+    CLUSTER_CACHE_TTL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_TIMEOUT, DB_POOL_RECYCLE,
+    DB_CONNECT_RETRIES, DB_CONNECT_RETRY_DELAY, DB_HEALTH_TIMEOUT
+)
+from migrations import run_migrations
+from cache import TTLCache, MISSING
+from metrics import instrument_methods, DB_SECONDS, DB_POOL_CONNECTIONS
+from tracing import tracer
+from summary import DailySummary
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import uuid
 import pytz
 
 metadata = MetaData()
 
+# Максимальное число строк в одном многострочном INSERT
+# (ограничено числом параметров запроса в SQLite)
+STATUS_BATCH_SIZE = 200
+
 # Определение таблицы пользователей
 users = Table(
     'users', metadata,
@@ -91,15 +167,211 @@ statuses = Table(
     Column('date', Date, nullable=False),
 )
 
+# Определение таблицы многодневных статусов (больничный, отпуск с датой окончания)
+status_intervals = Table(
+    'status_intervals', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('telegram_id', BigInteger, nullable=False),
+    Column('status', String(64), nullable=False),
+    Column('start_date', Date, nullable=False),
+    Column('end_date', Date, nullable=False),
+)
+
+# Определение таблицы исходящих сообщений (outbox)
+outbox = Table(
+    'outbox', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('idempotency_key', String(255), nullable=False),
+    Column('chat_id', BigInteger, nullable=False),
+    Column('text', Text, nullable=False),
+    Column('reply_markup', Text, nullable=True),
+    Column('parse_mode', String(16), nullable=True),
+    Column('state', String(16), nullable=False),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('next_attempt_at', DateTime, nullable=False),
+    Column('claimed_by', String(64), nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('last_error', Text, nullable=True),
+)
+
+# Определение таблицы состояний FSM (fsm_storage.py)
+fsm_states = Table(
+    'fsm_states', metadata,
+    Column('chat_id', BigInteger, primary_key=True, autoincrement=False),
+    Column('user_id', BigInteger, primary_key=True, autoincrement=False),
+    Column('state', String(255), nullable=True),
+    Column('data', Text, nullable=False),
+    Column('bucket', Text, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+# Определение таблицы аренд (выбор ведущего процесса, cluster.py)
+leases = Table(
+    'leases', metadata,
+    Column('name', String(64), primary_key=True),
+    Column('holder', String(128), nullable=False),
+    Column('expires_at', DateTime, nullable=False),
+)
+
+# Определение таблицы запусков плановых задач (cluster.py)
+job_runs = Table(
+    'job_runs', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('job_id', String(64), nullable=False),
+    Column('run_key', String(64), nullable=False),
+    Column('holder', String(128), nullable=False),
+    Column('started_at', DateTime, nullable=False),
+    Column('finished_at', DateTime, nullable=True),
+)
+
+# Определение таблицы настроек, общих для всех процессов бота
+settings = Table(
+    'settings', metadata,
+    Column('name', String(64), primary_key=True),
+    Column('value', Text, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+# Состояния сообщений в outbox
+OUTBOX_PENDING = 'pending'
+OUTBOX_SENDING = 'sending'
+OUTBOX_SENT = 'sent'
+OUTBOX_FAILED = 'failed'
+OUTBOX_BLOCKED = 'blocked'
+
+# Индексы таблиц создаются миграциями (см. migrations.py):
+# uq_statuses_telegram_id_date — уникальный (telegram_id, date), не более одного статуса в день;
+# ix_statuses_date — отчеты за дату и период;
+# ix_users_is_admin — частичный индекс для выборки администраторов;
+# ix_users_full_name — постраничный вывод сотрудников по ФИО;
+# ix_status_intervals_end_date_start_date — интервалы статусов, действующие на дату;
+# ix_status_intervals_telegram_id — интервалы статусов пользователя;
+# uq_outbox_idempotency_key — не более одного сообщения на ключ (пользователь, день, вид);
+# ix_outbox_state_next_attempt_at — выборка сообщений, готовых к отправке;
+# ix_fsm_states_updated_at — удаление устаревших состояний FSM;
+# uq_job_runs_job_id_run_key — не более одного запуска задачи за период.
+
+# Ключи списков пользователей в кэше (отдельные пользователи кэшируются по telegram_id)
+ADMINS_CACHE_KEY = 'admins'
+ALL_USERS_CACHE_KEY = 'all_users'
+
+# Время жизни агрегатов аналитики за завершенные дни в секундах
+ANALYTICS_CACHE_TTL = 24 * 60 * 60
+
+# Параметры пула, которые можно задать в url базы (?min_size=...); они важнее значений из config.py
+URL_POOL_OPTIONS = ('min_size', 'max_size', 'pool_recycle')
+
+
+def pool_options(url: str):
+    """
+    Параметры пула соединений и таймаутов для драйвера базы url из config.py.
+    Параметры пула, указанные в самом url (например, ?max_size=20), имеют больший приоритет:
+    значения из config.py для них не передаются.
+    """
+    database_url = databases.DatabaseURL(url)
+    options = _driver_options(database_url.dialect)
+    return {
+        name: value for name, value in options.items()
+        if name not in URL_POOL_OPTIONS or name not in database_url.options
+    }
+
+
+def _driver_options(dialect: str):
+    timeout_ms = int(DB_STATEMENT_TIMEOUT * 1000)
+    if dialect in ('postgresql', 'postgres'):
+        # asyncpg.create_pool
+        options = {'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE}
+        if timeout_ms:
+            # Запрос прерывает сервер; command_timeout — запасное ограничение на стороне клиента
+            options['server_settings'] = {'statement_timeout': str(timeout_ms)}
+            options['command_timeout'] = DB_STATEMENT_TIMEOUT + 1
+        if DB_POOL_RECYCLE:
+            options['max_inactive_connection_lifetime'] = DB_POOL_RECYCLE
+        return options
+    if dialect == 'mysql':
+        # aiomysql.create_pool
+        options = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'pool_recycle': int(DB_POOL_RECYCLE) if DB_POOL_RECYCLE else -1,
+        }
+        if timeout_ms:
+            options['init_command'] = f"SET SESSION max_execution_time={timeout_ms}"
+        return options
+    if dialect == 'sqlite':
+        # sqlite3.connect: сколько ждать снятия блокировки базы другим процессом
+        return {'timeout': DB_STATEMENT_TIMEOUT} if DB_STATEMENT_TIMEOUT else {}
+    return {}
+
+
 class Database:
-    def __init__(self):
-        self.database = databases.Database(DATABASE_URL)
-        self.engine = create_engine(DATABASE_URL)
-        metadata.create_all(self.engine)
+    def __init__(self, shared: bool = False):
+        self.database = databases.Database(DATABASE_URL, **pool_options(DATABASE_URL))
+        # Трассировка запросов (tracing.py), включается из панели администратора
+        tracer.install(self.database)
         self.timezone = pytz.timezone('Europe/Moscow')  # Укажите вашу таймзону
+        # shared — базу одновременно изменяют несколько процессов бота (main.py --workers)
+        self.shared = shared
+        # Кэш пользователей и администраторов, сбрасывается при их изменении.
+        # Изменения из других процессов сюда не попадают, поэтому в режиме shared кэш короткий
+        self.users_cache = TTLCache(
+            USER_CACHE_SIZE, min(USER_CACHE_TTL, CLUSTER_CACHE_TTL) if shared else USER_CACHE_TTL
+        )
+        # Агрегаты статусов по дням (summary.py), не более DAILY_SUMMARY_DAYS последних дней
+        self.daily_summaries = OrderedDict()
+        # Агрегаты аналитики за завершенные дни (они не меняются, поэтому кэшируются надолго)
+        self.analytics_cache = TTLCache(ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL)
 
-    async def connect(self):
-        await self.database.connect()
+    async def connect(self, migrate: bool = True):
+        """
+        Подключается к базе, дожидаясь ее готовности (до DB_CONNECT_RETRIES попыток),
+        и применяет новые миграции, если migrate.
+        """
+        for attempt in range(1, DB_CONNECT_RETRIES + 1):
+            try:
+                await self.database.connect()
+                latency = await self.health_check()
+                break
+            except Exception as e:
+                if self.database.is_connected:
+                    await self.database.disconnect()
+                if attempt >= DB_CONNECT_RETRIES:
+                    raise
+                logging.warning(
+                    f"База данных недоступна (попытка {attempt} из {DB_CONNECT_RETRIES}): {e}"
+                )
+                await asyncio.sleep(DB_CONNECT_RETRY_DELAY * attempt)
+        logging.info(f"Подключение к базе данных установлено, ответ за {latency * 1000:.1f} мс")
+        if migrate:
+            await run_migrations(self.database)
+
+    async def health_check(self):
+        """
+        Проверяет соединение запросом SELECT 1; возвращает время ответа в секундах.
+        Если база не ответила за DB_HEALTH_TIMEOUT секунд, выбрасывает asyncio.TimeoutError.
+        """
+        started = time.perf_counter()
+        await asyncio.wait_for(self.database.fetch_val("SELECT 1"), DB_HEALTH_TIMEOUT)
+        return time.perf_counter() - started
+
+    def pool_stats(self):
+        """
+        Размер пула соединений и число свободных соединений; для SQLite пула нет — пустой словарь.
+        """
+        pool = getattr(self.database._backend, '_pool', None)
+        if pool is None:
+            return {}
+        if hasattr(pool, 'get_size'):
+            # asyncpg
+            return {'size': pool.get_size(), 'idle': pool.get_idle_size(), 'max': pool.get_max_size()}
+        if hasattr(pool, 'freesize'):
+            # aiomysql
+            return {'size': pool.size, 'idle': pool.freesize, 'max': pool.maxsize}
+        return {}
+
+    async def collect_metrics(self):
+        for state, value in self.pool_stats().items():
+            DB_POOL_CONNECTIONS.set(value, state=state)
 
     async def disconnect(self):
         await self.database.disconnect()
@@ -116,6 +388,7 @@ class Database:
             is_admin=False
         )
         await self.database.execute(query)
+        self._invalidate_user(telegram_id)
 
     async def delete_user(self, telegram_id: int):
         """
@@ -123,16 +396,26 @@ class Database:
         """
         query = users.delete().where(users.c.telegram_id == telegram_id)
         await self.database.execute(query)
-        # Также удаляем все статусы пользователя
+        # Также удаляем все статусы и интервалы статусов пользователя
         query = statuses.delete().where(statuses.c.telegram_id == telegram_id)
         await self.database.execute(query)
+        query = status_intervals.delete().where(status_intervals.c.telegram_id == telegram_id)
+        await self.database.execute(query)
+        self._invalidate_user(telegram_id)
+        for summary in self.daily_summaries.values():
+            summary.remove(telegram_id)
+        self.analytics_cache.clear()
 
     async def get_user(self, telegram_id: int):
         """
         Получает информацию о пользователе по его Telegram ID.
         """
-        query = users.select().where(users.c.telegram_id == telegram_id)
-        return await self.database.fetch_one(query)
+        user = self.users_cache.get(telegram_id)
+        if user is MISSING:
+            query = users.select().where(users.c.telegram_id == telegram_id)
+            user = await self.database.fetch_one(query)
+            self.users_cache.set(telegram_id, user)
+        return user
 
     async def set_admin(self, telegram_id: int, is_admin: bool):
         """
@@ -142,32 +425,166 @@ class Database:
             users.c.telegram_id == telegram_id
         ).values(is_admin=is_admin)
         await self.database.execute(query)
+        self._invalidate_user(telegram_id)
 
     async def get_admins(self):
         """
         Возвращает список всех администраторов.
         """
-        query = users.select().where(users.c.is_admin == True)
-        return await self.database.fetch_all(query)
+        admins = self.users_cache.get(ADMINS_CACHE_KEY)
+        if admins is MISSING:
+            query = users.select().where(users.c.is_admin == True)
+            admins = await self.database.fetch_all(query)
+            self.users_cache.set(ADMINS_CACHE_KEY, admins)
+        return admins
 
     async def get_all_users(self):
         """
         Возвращает список всех пользователей.
         """
-        query = users.select()
+        all_users = self.users_cache.get(ALL_USERS_CACHE_KEY)
+        if all_users is MISSING:
+            query = users.select()
+            all_users = await self.database.fetch_all(query)
+            self.users_cache.set(ALL_USERS_CACHE_KEY, all_users)
+        return all_users
+
+    async def get_users_page(self, offset: int, limit: int):
+        """
+        Возвращает страницу пользователей, упорядоченных по ФИО.
+        """
+        query = users.select().order_by(
+            users.c.full_name, users.c.telegram_id
+        ).offset(offset).limit(limit)
         return await self.database.fetch_all(query)
 
+    async def count_users(self):
+        """
+        Возвращает количество зарегистрированных пользователей.
+        """
+        query = sqlalchemy.select(sqlalchemy.func.count()).select_from(users)
+        return await self.database.fetch_val(query)
+
+    def _invalidate_user(self, telegram_id: int):
+        """
+        Сбрасывает из кэша пользователя и списки, в которые он мог входить.
+        """
+        self.users_cache.pop(telegram_id)
+        self.users_cache.pop(ADMINS_CACHE_KEY)
+        self.users_cache.pop(ALL_USERS_CACHE_KEY)
+
+    def cache_stats(self):
+        """
+        Возвращает счетчики попаданий и промахов кэша пользователей.
+        """
+        return self.users_cache.stats()
+
     # Методы для работы со статусами
 
     async def add_or_update_status(self, telegram_id: int, status: str, description: str = None):
         """
-        Добавляет или обновляет статус пользователя на текущую дату.
+        Добавляет или обновляет статус пользователя на текущую дату одним запросом (upsert).
         """
         today = datetime.now(self.timezone).date()
-        if await self.check_status_exists(telegram_id, today):
-            await self.update_status(telegram_id, status, description)
+        await self.upsert_statuses([{
+            'telegram_id': telegram_id,
+            'status': status,
+            'description': description,
+            'date': today
+        }])
+
+    async def upsert_statuses(self, rows):
+        """
+        Пакетно добавляет или обновляет статусы.
+        rows — список словарей с ключами telegram_id, status, description, date.
+        """
+        await self._write_statuses(rows, overwrite=True)
+
+    def _insert_query(self, table, rows, index_elements, update_columns=()):
+        """
+        Строит многострочный INSERT с обработкой конфликта по уникальному индексу index_elements:
+        ON CONFLICT для SQLite и PostgreSQL, ON DUPLICATE KEY / INSERT IGNORE для MySQL.
+        Конфликтующие строки обновляют колонки update_columns, а если они не заданы — пропускаются.
+        """
+        dialect = self.database.url.dialect
+        if dialect.startswith('postgres'):
+            query = postgresql.insert(table).values(rows)
+        elif dialect == 'mysql':
+            query = mysql.insert(table).values(rows)
+            if update_columns:
+                return query.on_duplicate_key_update(
+                    **{column: query.inserted[column] for column in update_columns}
+                )
+            return query.prefix_with('IGNORE')
         else:
-            await self.add_status(telegram_id, status, description)
+            query = sqlite.insert(table).values(rows)
+        if update_columns:
+            return query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={column: query.excluded[column] for column in update_columns}
+            )
+        return query.on_conflict_do_nothing(index_elements=index_elements)
+
+    def _status_insert_query(self, rows, overwrite: bool):
+        """
+        INSERT в statuses с обработкой конфликта по (telegram_id, date).
+        При overwrite=False существующие статусы не изменяются.
+        """
+        return self._insert_query(
+            statuses, rows, ['telegram_id', 'date'],
+            ('status', 'description') if overwrite else ()
+        )
+
+    async def _write_statuses(self, rows, overwrite: bool):
+        rows = list(rows)
+        for i in range(0, len(rows), STATUS_BATCH_SIZE):
+            query = self._status_insert_query(rows[i:i + STATUS_BATCH_SIZE], overwrite)
+            await self.database.execute(query)
+        # Обновление агрегатов за дни, уже загруженные в память
+        for row in rows:
+            summary = self.daily_summaries.get(row['date'])
+            if summary is None:
+                continue
+            if overwrite:
+                summary.set(row['telegram_id'], row['status'], row['description'])
+            else:
+                summary.set_if_missing(row['telegram_id'], row['status'], row['description'])
+
+    async def get_daily_summary(self, date_):
+        """
+        Возвращает агрегат статусов за день (DailySummary).
+        Если его нет в памяти, он строится из записей таблицы statuses.
+        В режиме shared агрегат строится заново при каждом вызове: статусы могли
+        записать другие процессы.
+        """
+        summary = self.daily_summaries.get(date_)
+        if summary is None or self.shared:
+            return await self.rebuild_daily_summary(date_)
+        self.daily_summaries.move_to_end(date_)
+        await summary.loaded.wait()
+        if self.daily_summaries.get(date_) is not summary:
+            # Загрузка агрегата завершилась ошибкой
+            return await self.get_daily_summary(date_)
+        return summary
+
+    async def rebuild_daily_summary(self, date_):
+        """
+        Пересчитывает агрегат статусов за указанный день из записей таблицы statuses.
+        """
+        summary = DailySummary(date_)
+        # Агрегат регистрируется до загрузки, чтобы не потерять статусы, записанные во время нее
+        self.daily_summaries[date_] = summary
+        self.daily_summaries.move_to_end(date_)
+        while len(self.daily_summaries) > DAILY_SUMMARY_DAYS:
+            self.daily_summaries.popitem(last=False)
+        try:
+            summary.load(await self.get_statuses_for_date(date_))
+        except Exception:
+            if self.daily_summaries.get(date_) is summary:
+                del self.daily_summaries[date_]
+            summary.loaded.set()
+            raise
+        return summary
 
     async def add_status(self, telegram_id: int, status: str, description: str = None):
         """
@@ -199,6 +616,126 @@ class Database:
         query = statuses.select().where(statuses.c.date == date_)
         return await self.database.fetch_all(query)
 
+    async def get_users_without_status(self, date_):
+        """
+        Возвращает пользователей, у которых нет статуса на указанную дату
+        и которых не покрывает интервал статуса (одним запросом).
+        """
+        join = users.outerjoin(
+            statuses,
+            and_(
+                statuses.c.telegram_id == users.c.telegram_id,
+                statuses.c.date == date_
+            )
+        ).outerjoin(
+            status_intervals, self._interval_covers(date_)
+        )
+        query = sqlalchemy.select(users).select_from(join).where(and_(
+            statuses.c.id.is_(None),
+            status_intervals.c.id.is_(None)
+        ))
+        return await self.database.fetch_all(query)
+
+    async def get_users_without_interval(self, date_):
+        """
+        Возвращает пользователей, которых не покрывает интервал статуса на указанную дату
+        (одним запросом).
+        """
+        join = users.outerjoin(status_intervals, self._interval_covers(date_))
+        query = sqlalchemy.select(users).select_from(join).where(
+            status_intervals.c.id.is_(None)
+        )
+        return await self.database.fetch_all(query)
+
+    @staticmethod
+    def _interval_covers(date_):
+        return and_(
+            status_intervals.c.telegram_id == users.c.telegram_id,
+            status_intervals.c.start_date <= date_,
+            status_intervals.c.end_date >= date_
+        )
+
+    async def set_status_interval(self, telegram_id: int, status: str, start_date, end_date):
+        """
+        Задает многодневный статус пользователя с start_date по end_date включительно.
+        Интервалы пользователя, пересекающиеся с новым, завершаются накануне start_date.
+        """
+        async with self.database.transaction():
+            await self.end_status_interval(telegram_id, start_date)
+            query = status_intervals.insert().values(
+                telegram_id=telegram_id,
+                status=status,
+                start_date=start_date,
+                end_date=end_date
+            )
+            await self.database.execute(query)
+
+    async def end_status_interval(self, telegram_id: int, date_):
+        """
+        Завершает интервалы статусов пользователя накануне date_: интервалы, начинающиеся
+        с date_ или позже, удаляются, а действующий на date_ — укорачивается.
+        """
+        query = status_intervals.delete().where(and_(
+            status_intervals.c.telegram_id == telegram_id,
+            status_intervals.c.start_date >= date_
+        ))
+        await self.database.execute(query)
+        query = status_intervals.update().where(and_(
+            status_intervals.c.telegram_id == telegram_id,
+            status_intervals.c.end_date >= date_
+        )).values(end_date=date_ - timedelta(days=1))
+        await self.database.execute(query)
+
+    async def get_status_intervals(self, date_):
+        """
+        Возвращает интервалы статусов, действующие на указанную дату.
+        """
+        query = status_intervals.select().where(and_(
+            status_intervals.c.start_date <= date_,
+            status_intervals.c.end_date >= date_
+        ))
+        return await self.database.fetch_all(query)
+
+    async def apply_status_intervals(self, date_):
+        """
+        Записывает статусы из интервалов, действующих на указанную дату, пакетными INSERT;
+        статусы, уже выбранные пользователями на эту дату, не перезаписываются.
+        Возвращает количество интервалов.
+        """
+        intervals = await self.get_status_intervals(date_)
+        await self._write_statuses(
+            (
+                {
+                    'telegram_id': interval['telegram_id'],
+                    'status': interval['status'],
+                    'description': None,
+                    'date': date_
+                }
+                for interval in intervals
+            ),
+            overwrite=False
+        )
+        return len(intervals)
+
+    async def add_unknown_statuses(self, telegram_ids, date_):
+        """
+        Проставляет статус "Не известно" на указанную дату всем переданным пользователям.
+        Вставка выполняется одним многострочным INSERT на каждые STATUS_BATCH_SIZE записей;
+        статусы, выбранные пользователями в это же время, не перезаписываются.
+        """
+        await self._write_statuses(
+            (
+                {
+                    'telegram_id': telegram_id,
+                    'status': "Не известно",
+                    'description': None,
+                    'date': date_
+                }
+                for telegram_id in telegram_ids
+            ),
+            overwrite=False
+        )
+
     async def get_statuses_in_period(self, start_date, end_date):
         """
         Возвращает все статусы сотрудников за указанный период.
@@ -208,6 +745,74 @@ class Database:
         )
         return await self.database.fetch_all(query)
 
+    async def iterate_status_matrix(self, start_date, end_date):
+        """
+        Построчно (курсором) возвращает всех пользователей с их статусами за период,
+        отсортированных по ФИО, пользователю и дате. Пользователь без статусов
+        за период возвращается одной строкой с пустыми status и date.
+        """
+        join = users.outerjoin(
+            statuses,
+            and_(
+                statuses.c.telegram_id == users.c.telegram_id,
+                statuses.c.date.between(start_date, end_date)
+            )
+        )
+        query = sqlalchemy.select(
+            users.c.telegram_id,
+            users.c.full_name,
+            statuses.c.status,
+            statuses.c.description,
+            statuses.c.date
+        ).select_from(join).order_by(
+            users.c.full_name, users.c.telegram_id, statuses.c.date
+        )
+        async for row in self.database.iterate(query):
+            yield row
+
+    async def count_statuses_by_day(self, start_date, end_date):
+        """
+        Возвращает количество статусов каждого вида по дням за период:
+        список строк (date, status, count), агрегация выполняется в базе (GROUP BY).
+        """
+        return await self._count_statuses(statuses.c.date, start_date, end_date)
+
+    async def count_statuses_by_user(self, start_date, end_date):
+        """
+        Возвращает количество статусов каждого вида по сотрудникам за период:
+        список строк (telegram_id, status, count), агрегация выполняется в базе (GROUP BY).
+        """
+        return await self._count_statuses(statuses.c.telegram_id, start_date, end_date)
+
+    async def _count_statuses(self, key_column, start_date, end_date):
+        """
+        Агрегат за завершенные дни периода берется из кэша (или считается и кэшируется),
+        за сегодняшний день — всегда запрашивается заново.
+        """
+        today = datetime.now(self.timezone).date()
+        closed_end = min(end_date, today - timedelta(days=1))
+        rows = []
+        if start_date <= closed_end:
+            cache_key = (key_column.name, start_date, closed_end)
+            closed_rows = self.analytics_cache.get(cache_key)
+            if closed_rows is MISSING:
+                closed_rows = await self._fetch_status_counts(key_column, start_date, closed_end)
+                self.analytics_cache.set(cache_key, closed_rows)
+            rows.extend(closed_rows)
+        if end_date >= today and start_date <= end_date:
+            rows.extend(await self._fetch_status_counts(key_column, max(start_date, today), end_date))
+        return rows
+
+    async def _fetch_status_counts(self, key_column, start_date, end_date):
+        count = sqlalchemy.func.count().label('count')
+        query = sqlalchemy.select(key_column, statuses.c.status, count).where(
+            statuses.c.date.between(start_date, end_date)
+        ).group_by(key_column, statuses.c.status)
+        return [
+            (row[key_column.name], row['status'], row['count'])
+            for row in await self.database.fetch_all(query)
+        ]
+
     async def check_status_exists(self, telegram_id: int, date_):
         """
         Проверяет, существует ли статус у пользователя на заданную дату.
@@ -232,3 +837,252 @@ class Database:
             description=description
         )
         await self.database.execute(query)
+
+    # Методы для работы с очередью исходящих сообщений (outbox)
+
+    async def enqueue_messages(self, messages):
+        """
+        Ставит сообщения в очередь на отправку.
+        messages — список словарей с ключами idempotency_key, chat_id, text и
+        необязательными reply_markup (JSON) и parse_mode.
+        Сообщение с уже существующим idempotency_key повторно не добавляется.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                'idempotency_key': message['idempotency_key'],
+                'chat_id': message['chat_id'],
+                'text': message['text'],
+                'reply_markup': message.get('reply_markup'),
+                'parse_mode': message.get('parse_mode'),
+                'state': OUTBOX_PENDING,
+                'attempts': 0,
+                'next_attempt_at': now,
+                'claimed_by': None,
+                'created_at': now,
+                'last_error': None,
+            }
+            for message in messages
+        ]
+        # 11 параметров на строку, поэтому пакет меньше, чем для статусов
+        batch_size = STATUS_BATCH_SIZE // 3
+        for i in range(0, len(rows), batch_size):
+            query = self._insert_query(outbox, rows[i:i + batch_size], ['idempotency_key'])
+            await self.database.execute(query)
+
+    async def claim_outbox_batch(self, limit: int, lease_seconds: float):
+        """
+        Забирает до limit сообщений, готовых к отправке, и помечает их как отправляемые
+        на lease_seconds секунд. Сообщения, чья аренда истекла (процесс завершился во время
+        отправки), забираются повторно. Безопасно при нескольких обработчиках и процессах.
+        """
+        now = datetime.utcnow()
+        claimable = and_(
+            or_(outbox.c.state == OUTBOX_PENDING, outbox.c.state == OUTBOX_SENDING),
+            outbox.c.next_attempt_at <= now
+        )
+        query = sqlalchemy.select(outbox.c.id).where(claimable).order_by(outbox.c.id).limit(limit)
+        ids = [row['id'] for row in await self.database.fetch_all(query)]
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        query = outbox.update().where(and_(outbox.c.id.in_(ids), claimable)).values(
+            state=OUTBOX_SENDING,
+            claimed_by=token,
+            next_attempt_at=now + timedelta(seconds=lease_seconds)
+        )
+        await self.database.execute(query)
+        query = outbox.select().where(and_(
+            outbox.c.id.in_(ids),
+            outbox.c.claimed_by == token,
+            outbox.c.state == OUTBOX_SENDING
+        )).order_by(outbox.c.id)
+        return await self.database.fetch_all(query)
+
+    async def finish_outbox(self, ids, state: str):
+        """
+        Переводит сообщения в конечное состояние (отправлено, заблокировано, не отправлено).
+        """
+        if not ids:
+            return
+        query = outbox.update().where(outbox.c.id.in_(ids)).values(
+            state=state, claimed_by=None
+        )
+        await self.database.execute(query)
+
+    async def retry_outbox(self, message_id: int, attempts: int, delay: float, error: str):
+        """
+        Возвращает сообщение в очередь для повторной отправки через delay секунд.
+        """
+        query = outbox.update().where(outbox.c.id == message_id).values(
+            state=OUTBOX_PENDING,
+            attempts=attempts,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+            claimed_by=None,
+            last_error=error
+        )
+        await self.database.execute(query)
+
+    async def purge_outbox(self, older_than: datetime):
+        """
+        Удаляет из очереди обработанные сообщения, созданные раньше older_than.
+        """
+        query = outbox.delete().where(and_(
+            outbox.c.state.in_([OUTBOX_SENT, OUTBOX_FAILED, OUTBOX_BLOCKED]),
+            outbox.c.created_at < older_than
+        ))
+        await self.database.execute(query)
+
+    async def outbox_stats(self):
+        """
+        Возвращает количество сообщений в очереди по состояниям.
+        """
+        query = sqlalchemy.select(
+            outbox.c.state, sqlalchemy.func.count().label('count')
+        ).group_by(outbox.c.state)
+        return {row['state']: row['count'] for row in await self.database.fetch_all(query)}
+
+    # Методы для хранилища состояний FSM
+
+    async def get_fsm_record(self, chat_id: int, user_id: int):
+        """
+        Возвращает сохраненное состояние FSM пользователя в чате или None.
+        """
+        query = fsm_states.select().where(and_(
+            fsm_states.c.chat_id == chat_id,
+            fsm_states.c.user_id == user_id
+        ))
+        return await self.database.fetch_one(query)
+
+    async def save_fsm_records(self, rows):
+        """
+        Добавляет или обновляет состояния FSM.
+        rows — список словарей с ключами chat_id, user_id, state, data, bucket, updated_at.
+        """
+        for i in range(0, len(rows), STATUS_BATCH_SIZE // 2):
+            query = self._insert_query(
+                fsm_states, rows[i:i + STATUS_BATCH_SIZE // 2], ['chat_id', 'user_id'],
+                ('state', 'data', 'bucket', 'updated_at')
+            )
+            await self.database.execute(query)
+
+    async def delete_fsm_records(self, keys):
+        """
+        Удаляет состояния FSM по списку пар (chat_id, user_id).
+        """
+        for i in range(0, len(keys), STATUS_BATCH_SIZE):
+            query = fsm_states.delete().where(or_(*(
+                and_(fsm_states.c.chat_id == chat_id, fsm_states.c.user_id == user_id)
+                for chat_id, user_id in keys[i:i + STATUS_BATCH_SIZE]
+            )))
+            await self.database.execute(query)
+
+    async def purge_fsm_records(self, older_than: datetime):
+        """
+        Удаляет состояния FSM, которые не изменялись с момента older_than.
+        """
+        query = fsm_states.delete().where(fsm_states.c.updated_at < older_than)
+        await self.database.execute(query)
+
+    # Методы для работы нескольких процессов
+
+    async def acquire_lease(self, name: str, holder: str, seconds: float):
+        """
+        Захватывает или продлевает аренду name на seconds секунд.
+        Возвращает True, если аренда принадлежит holder.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=seconds)
+        query = self._insert_query(
+            leases, [{'name': name, 'holder': holder, 'expires_at': expires_at}], ['name']
+        )
+        await self.database.execute(query)
+        # Продлить можно свою аренду, захватить — только истекшую
+        query = leases.update().where(and_(
+            leases.c.name == name,
+            or_(leases.c.holder == holder, leases.c.expires_at < now)
+        )).values(holder=holder, expires_at=expires_at)
+        await self.database.execute(query)
+        query = sqlalchemy.select(leases.c.holder).where(leases.c.name == name)
+        return await self.database.fetch_val(query) == holder
+
+    async def release_lease(self, name: str, holder: str):
+        """
+        Освобождает аренду name, если она принадлежит holder.
+        """
+        query = leases.delete().where(and_(leases.c.name == name, leases.c.holder == holder))
+        await self.database.execute(query)
+
+    async def claim_job_run(self, job_id: str, run_key: str, holder: str, stale_after: float):
+        """
+        Отмечает запуск задачи job_id за период run_key процессом holder.
+        Запуск достается holder, если задача за этот период еще не запускалась или ее запуск
+        не завершен и начат больше stale_after секунд назад (процесс завершился во время задачи).
+        Возвращает метку запуска для finish_job_run и release_job_run или None.
+        """
+        claim = f"{holder}/{uuid.uuid4().hex[:8]}"
+        now = datetime.utcnow()
+        query = self._insert_query(job_runs, [{
+            'job_id': job_id,
+            'run_key': run_key,
+            'holder': claim,
+            'started_at': now,
+            'finished_at': None,
+        }], ['job_id', 'run_key'])
+        await self.database.execute(query)
+        query = job_runs.update().where(and_(
+            job_runs.c.job_id == job_id,
+            job_runs.c.run_key == run_key,
+            job_runs.c.finished_at.is_(None),
+            job_runs.c.started_at < now - timedelta(seconds=stale_after)
+        )).values(holder=claim, started_at=now)
+        await self.database.execute(query)
+        query = sqlalchemy.select(job_runs.c.holder).where(and_(
+            job_runs.c.job_id == job_id,
+            job_runs.c.run_key == run_key
+        ))
+        return claim if await self.database.fetch_val(query) == claim else None
+
+    async def finish_job_run(self, job_id: str, run_key: str, claim: str):
+        """
+        Отмечает завершение запуска задачи с меткой claim.
+        """
+        query = job_runs.update().where(and_(
+            job_runs.c.job_id == job_id,
+            job_runs.c.run_key == run_key,
+            job_runs.c.holder == claim
+        )).values(finished_at=datetime.utcnow())
+        await self.database.execute(query)
+
+    async def release_job_run(self, job_id: str, run_key: str, claim: str):
+        """
+        Удаляет отметку запуска с меткой claim (задача завершилась ошибкой и может быть запущена снова).
+        """
+        query = job_runs.delete().where(and_(
+            job_runs.c.job_id == job_id,
+            job_runs.c.run_key == run_key,
+            job_runs.c.holder == claim
+        ))
+        await self.database.execute(query)
+
+    async def get_setting(self, name: str, default: str = None):
+        """
+        Возвращает значение настройки name или default, если она не задана.
+        """
+        query = sqlalchemy.select(settings.c.value).where(settings.c.name == name)
+        value = await self.database.fetch_val(query)
+        return default if value is None else value
+
+    async def set_setting(self, name: str, value: str):
+        """
+        Сохраняет значение настройки name.
+        """
+        query = self._insert_query(
+            settings, [{'name': name, 'value': value, 'updated_at': datetime.utcnow()}],
+            ['name'], ['value', 'updated_at']
+        )
+        await self.database.execute(query)
+
+
+# Время методов для метрик (bot_db_seconds)
+instrument_methods(Database, DB_SECONDS, exclude=('connect', 'disconnect', 'collect_metrics'))
@@ -0,0 +1,104 @@
+'''
+Пояснения по коду:
+
+Потоковая выгрузка статусов в Excel за произвольный период:
+
+Отчет строится в виде матрицы "сотрудник × день": первая колонка — ФИО,
+далее по колонке на каждый день периода. В ячейке — статус (для "Другое" с пояснением),
+для рабочих дней без статуса — "Не известно", выходные без статуса остаются пустыми.
+
+Память:
+
+Строки читаются из базы курсором (Database.iterate_status_matrix), отсортированными
+по сотруднику и дате, и записываются в книгу по одной строке на сотрудника.
+Позиция колонки для даты находится по словарю, поэтому сборка строки линейна.
+xlsxwriter работает в режиме constant_memory: каждая записанная строка сразу
+сбрасывается во временный файл, а книга сохраняется в файл на диске, а не в BytesIO.
+Поэтому объем памяти не зависит от числа сотрудников, а строка одного сотрудника
+ограничена длиной периода: период длиннее config.EXPORT_MAX_DAYS дней не выгружается
+(к тому же Excel не поддерживает больше 16384 колонок).
+
+Запись книги выполняется в пуле потоков генерации отчетов (rendering.py),
+чтобы не блокировать цикл событий бота.
+'''
+# export.py
+from datetime import timedelta
+import xlsxwriter
+import config
+from rendering import renderer
+
+# Количество строк (сотрудников), передаваемых в пул потоков за один вызов
+EXPORT_BATCH_SIZE = 200
+
+
+def format_cell(status, description):
+    if status == "Другое" and description:
+        return f"{status} ({description})"
+    return status
+
+
+class StatusMatrixWriter:
+    """
+    Синхронная запись матрицы статусов в книгу Excel. Методы вызываются
+    в пуле потоков генерации отчетов (rendering.py) строго последовательно.
+    """
+
+    def __init__(self, path: str, days):
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.worksheet = self.workbook.add_worksheet("Статусы")
+        self.row_index = 0
+        header_format = self.workbook.add_format({'bold': True})
+        self.worksheet.set_column(0, 0, 35)
+        self.worksheet.set_column(1, len(days), 12)
+        self.worksheet.freeze_panes(1, 1)
+        self.worksheet.write_row(
+            0, 0, ['ФИО'] + [day.strftime('%Y-%m-%d') for day in days], header_format
+        )
+
+    def write_rows(self, rows):
+        for cells in rows:
+            self.row_index += 1
+            self.worksheet.write_row(self.row_index, 0, cells)
+
+    def close(self):
+        self.workbook.close()
+        return self.row_index
+
+
+async def write_status_matrix(db, start_date, end_date, path: str):
+    """
+    Записывает в файл path книгу Excel со статусами сотрудников за период [start_date, end_date].
+    Строки из базы собираются в цикле событий, запись книги выполняется в пуле потоков
+    пакетами по EXPORT_BATCH_SIZE сотрудников.
+    Период длиннее config.EXPORT_MAX_DAYS дней отклоняется с ValueError.
+    """
+    if (end_date - start_date).days + 1 > config.EXPORT_MAX_DAYS:
+        raise ValueError(f"Период выгрузки длиннее {config.EXPORT_MAX_DAYS} дн.")
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    columns = {day: i + 1 for i, day in enumerate(days)}
+    empty_row = [
+        "Не известно" if day.weekday() < 5 else None for day in days
+    ]
+
+    writer = await renderer.run(StatusMatrixWriter, path, days)
+    try:
+        batch = []
+        current_user = None
+        cells = None
+        async for row in db.iterate_status_matrix(start_date, end_date):
+            if row['telegram_id'] != current_user:
+                if cells is not None:
+                    batch.append(cells)
+                    if len(batch) >= EXPORT_BATCH_SIZE:
+                        await renderer.run(writer.write_rows, batch)
+                        batch = []
+                current_user = row['telegram_id']
+                cells = [row['full_name']] + empty_row
+            if row['date'] is not None:
+                cells[columns[row['date']]] = format_cell(row['status'], row['description'])
+        if cells is not None:
+            batch.append(cells)
+        await renderer.run(writer.write_rows, batch)
+    finally:
+        rows_written = await renderer.run(writer.close)
+    return rows_written
@@ -0,0 +1,257 @@
+'''
+Пояснения по коду:
+
+Хранилище состояний FSM в базе данных (вместо MemoryStorage):
+
+Состояния диалогов (/start, /delete_me, описание статуса "Другое" и т.п.) хранятся
+в таблице fsm_states, поэтому после перезапуска бота пользователь продолжает диалог
+с того же шага. Поддерживаются те же СУБД, что и в Database (SQLite, PostgreSQL, MySQL).
+
+Кэш в памяти:
+
+Последние config.FSM_CACHE_SIZE состояний хранятся в памяти (вытеснение LRU),
+поэтому чтение состояния при каждом сообщении не обращается к базе.
+Объем памяти ограничен размером кэша и числом еще не записанных изменений.
+
+Отложенная запись (write-behind):
+
+Изменения не пишутся в базу сразу, а копятся и записываются пакетом раз в
+config.FSM_FLUSH_INTERVAL секунд (или сразу, если накопилось config.FSM_FLUSH_BATCH изменений):
+один INSERT ... ON CONFLICT на пакет, сброшенные состояния удаляются одним DELETE.
+При штатной остановке (close) все изменения записываются.
+
+Несколько процессов бота (main.py --workers):
+
+Обновления одного пользователя могут обрабатываться разными процессами, поэтому хранилище
+создается без кэша и с немедленной записью (cache_size=0, flush_batch=1):
+каждое чтение обращается к базе, каждое изменение записывается до ответа обработчика.
+
+Удаление брошенных состояний:
+
+Состояние, которое не изменялось дольше config.FSM_STATE_TTL секунд, считается брошенным:
+при чтении оно возвращается пустым, а раз в час такие состояния удаляются из базы.
+'''
+# fsm_storage.py
+import asyncio
+import copy
+import json
+import logging
+import typing
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from aiogram.dispatcher.storage import BaseStorage
+
+# Как часто удаляются брошенные состояния из базы, в секундах
+FSM_PURGE_INTERVAL = 60 * 60
+
+
+def _empty_record():
+    return {'state': None, 'data': {}, 'bucket': {}, 'updated_at': datetime.utcnow()}
+
+
+def _is_empty(record):
+    return record['state'] is None and not record['data'] and not record['bucket']
+
+
+class DatabaseStorage(BaseStorage):
+    def __init__(self, db, cache_size: int, ttl: float, flush_interval: float, flush_batch: int):
+        self.db = db
+        self.cache_size = cache_size
+        self.ttl = timedelta(seconds=ttl)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        # (chat_id, user_id) -> запись состояния, порядок — от давно использованных к недавним
+        self.records = OrderedDict()
+        # Ключи записей, измененных после последней записи в базу
+        self.dirty = set()
+        self._task = None
+        self._flushing = None
+        self._last_purge = None
+
+    def _key(self, chat, user):
+        chat_id, user_id = self.check_address(chat=chat, user=user)
+        return int(chat_id), int(user_id)
+
+    def _expired(self, record):
+        return record['updated_at'] < datetime.utcnow() - self.ttl
+
+    async def _record(self, chat, user):
+        """
+        Возвращает запись состояния из кэша, а при промахе — из базы данных.
+        """
+        key = self._key(chat, user)
+        record = self.records.get(key)
+        # Без кэша (cache_size=0) сохраненное состояние всегда читается из базы
+        if record is None or (not self.cache_size and key not in self.dirty):
+            row = await self.db.get_fsm_record(*key)
+            # За время запроса запись могла появиться в кэше
+            record = self.records.get(key)
+            if record is None or (not self.cache_size and key not in self.dirty):
+                record = _empty_record()
+                if row is not None:
+                    record.update(
+                        state=row['state'],
+                        data=json.loads(row['data']),
+                        bucket=json.loads(row['bucket']),
+                        updated_at=row['updated_at']
+                    )
+                self.records[key] = record
+        self.records.move_to_end(key)
+        if self._expired(record) and not _is_empty(record):
+            record.update(_empty_record())
+            self.dirty.add(key)
+        self._evict()
+        return key, record
+
+    def _evict(self):
+        # Вытесняются только записи, уже сохраненные в базе, кроме последней использованной
+        if self._flushing is not None:
+            return
+        for key in list(self.records)[:-1]:
+            if len(self.records) <= self.cache_size:
+                break
+            if key not in self.dirty:
+                del self.records[key]
+
+    async def _touch(self, key, record):
+        record['updated_at'] = datetime.utcnow()
+        self.dirty.add(key)
+        if len(self.dirty) >= self.flush_batch:
+            await self.flush()
+        elif self._task is None:
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Не удалось сохранить состояния FSM: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+            try:
+                await self._purge()
+            except Exception as e:
+                logging.error(f"Не удалось удалить устаревшие состояния FSM: {e}")
+
+    async def flush(self):
+        """
+        Записывает в базу все измененные состояния одним пакетом.
+        """
+        while self._flushing is not None:
+            await self._flushing.wait()
+        if not self.dirty:
+            return
+        self._flushing = asyncio.Event()
+        dirty, self.dirty = self.dirty, set()
+        try:
+            saved, deleted = [], []
+            for key in dirty:
+                record = self.records[key]
+                if _is_empty(record):
+                    deleted.append(key)
+                    continue
+                saved.append({
+                    'chat_id': key[0],
+                    'user_id': key[1],
+                    'state': record['state'],
+                    'data': json.dumps(record['data'], ensure_ascii=False),
+                    'bucket': json.dumps(record['bucket'], ensure_ascii=False),
+                    'updated_at': record['updated_at'],
+                })
+            await self.db.save_fsm_records(saved)
+            await self.db.delete_fsm_records(deleted)
+        except Exception:
+            # Несохраненные записи будут записаны при следующей попытке
+            self.dirty |= dirty
+            raise
+        finally:
+            self._flushing.set()
+            self._flushing = None
+        self._evict()
+
+    async def _purge(self):
+        now = datetime.utcnow()
+        if self._last_purge and now - self._last_purge < timedelta(seconds=FSM_PURGE_INTERVAL):
+            return
+        self._last_purge = now
+        await self.db.purge_fsm_records(now - self.ttl)
+        for key, record in list(self.records.items()):
+            if key not in self.dirty and self._expired(record):
+                del self.records[key]
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        self.records.clear()
+
+    async def wait_closed(self):
+        pass
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        _, record = await self._record(chat, user)
+        return record['state'] if record['state'] is not None else self.resolve_state(default)
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[str] = None) -> typing.Dict:
+        _, record = await self._record(chat, user)
+        return copy.deepcopy(record['data'])
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        key, record = await self._record(chat, user)
+        record['state'] = self.resolve_state(state)
+        await self._touch(key, record)
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        key, record = await self._record(chat, user)
+        record['data'] = copy.deepcopy(data) if data else {}
+        await self._touch(key, record)
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        key, record = await self._record(chat, user)
+        record['data'].update(copy.deepcopy(data or {}), **kwargs)
+        await self._touch(key, record)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         default: typing.Optional[dict] = None) -> typing.Dict:
+        _, record = await self._record(chat, user)
+        return copy.deepcopy(record['bucket'])
+
+    async def set_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         bucket: typing.Dict = None):
+        key, record = await self._record(chat, user)
+        record['bucket'] = copy.deepcopy(bucket) if bucket else {}
+        await self._touch(key, record)
+
+    async def update_bucket(self, *,
+                            chat: typing.Union[str, int, None] = None,
+                            user: typing.Union[str, int, None] = None,
+                            bucket: typing.Dict = None, **kwargs):
+        key, record = await self._record(chat, user)
+        record['bucket'].update(copy.deepcopy(bucket or {}), **kwargs)
+        await self._touch(key, record)
@@ -12,6 +12,7 @@ date из модуля datetime.
 Registration для регистрации пользователя.
 AddAdmin и RemoveAdmin для добавления и удаления администратора.
 OtherStatus для обработки статуса "Другое" с пояснением.
+StatusInterval для ввода даты окончания больничного или отпуска (только после кнопки "Другая дата").
 Функция register_handlers:
 
 Регистрирует все обработчики команд и сообщений.
@@ -21,16 +22,27 @@ OtherStatus для обработки статуса "Другое" с пояс
 /start — регистрация нового пользователя.
 /status — проверка и изменение статуса сотрудника.
 /admin — доступ к панели администратора.
+/request_status ID — запрос статуса у конкретного сотрудника (для администраторов).
+/bot_stats — счетчики обработки обновлений, очереди сообщений, состояние базы и пула соединений, кэша и трассировки запросов (для администраторов).
+/rebuild_summary [ГГГГ-ММ-ДД] — пересчет сводки статусов за день из базы данных, по умолчанию за сегодня (для администраторов).
+/help — список команд; администраторам также показываются команды администратора.
 Обработчики состояний FSM:
 
 process_full_name — обработка ввода ФИО при регистрации.
 process_add_admin — обработка добавления нового администратора.
 process_remove_admin — обработка удаления администратора.
 process_other_status — обработка пояснения к статусу "Другое".
+process_interval_end_date — обработка даты окончания больничного или отпуска (интервал статуса).
 Обработчики CallbackQuery:
 
-admin_menu_callback — обработка действий в панели администратора.
-status_callback — обработка выбора статуса сотрудником.
+admin_menu_callback — обработка действий в панели администратора (только для администраторов).
+status_callback — обработка выбора статуса сотрудником (в любом состоянии FSM: незавершенный ввод
+пояснения или даты окончания статуса отменяется, и утренний ответ не теряется).
+interval_callback — срок больничного или отпуска кнопкой (сегодня, несколько дней или другая дата).
+Данные кнопок содержат код статуса и срок, поэтому до ввода своей даты состояние FSM не задается.
+Обработчик inline-запросов:
+
+employee_inline_search — поиск сотрудника по началу ФИО (name_index.py) для администраторов.
 Функции для планировщика задач:
 
 send_status_request_scheduled — отправка запроса статусов сотрудникам в 8:00.
@@ -38,7 +50,9 @@ check_unanswered_statuses — проверка неответивших сотр
 Вспомогательные функции:
 
 send_status_request_to_user — отправка запроса статуса конкретному сотруднику.
+employee_picker — страница выбора сотрудника с кнопками "Назад" / "Вперед" и поиском по ФИО.
 send_admin_report — формирование и отправка отчета администраторам.
+collect_status_metrics — метрики статусов за сегодня и доли ответивших (metrics.py).
 check_employee_statuses — получение текущей статистики по статусам сотрудников.
 Важно:
 
@@ -50,18 +64,37 @@ check_employee_statuses — получение текущей статистик
 from aiogram import Dispatcher, types
 from aiogram.dispatcher.filters import Text
 from aiogram.types import (
-    InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, InputFile
+    InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, InputFile,
+    InlineQueryResultArticle, InputTextMessageContent
 )
+from aiogram.utils.exceptions import MessageNotModified
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from apscheduler.triggers.cron import CronTrigger
 import config
 from db import Database
-from utils import is_admin, format_status_report, notify_admins, get_user_full_name
+from utils import (
+    is_admin, format_status_report, format_daily_report, notify_admins, flush_admin_notifications,
+    escape_markdown, markdown_mention,
+    get_user_full_name, send_long_text, reply_long_text, REPORT_STATUSES
+)
+from outbox import outbox
+from export import write_status_matrix
+from rendering import renderer, RendererBusy
+from analytics import collect_analytics
+from attendance import collect_attendance
+from dashboard import dashboard
+from cluster import run_once, leader
+from throttling import throttling
+from name_index import name_index
+from metrics import metrics, handler_metrics, dispatcher_commands, STATUS_RESPONSES, STATUS_RESPONSE_RATE
+from tracing import tracer
 from datetime import datetime, timedelta
 import pytz
+import functools
 import io
-import xlsxwriter
+import os
+import tempfile
 import logging
 
 DJANGO_CELERY_BEAT_TZ_AWARE = False
@@ -84,6 +117,32 @@ class OtherStatus(StatesGroup):
     description = State()
 
 
+class StatusInterval(StatesGroup):
+    end_date = State()
+
+
+# Кнопки срока больничного или отпуска: число дней, включая сегодняшний, и подпись
+INTERVAL_CHOICES = ((1, "Только сегодня"), (3, "3 дня"), (7, "Неделя"), (14, "2 недели"))
+
+# Коды статусов в callback_data кнопок
+STATUS_CODES = {
+    "1": "Очно",
+    "2": "Удаленно",
+    "3": "Больничный",
+    "4": "В отпуске",
+    "5": "Другое"
+}
+
+# Действия кнопок для метки action метрик (callback_data без числовых частей, metrics.py)
+CALLBACK_ACTIONS = (
+    "admin_get_stats", "admin_today_report", "admin_xlsx_report", "admin_check_statuses",
+    "admin_check_all_statuses", "admin_check_specific_status", "admin_add_admin", "admin_remove_admin",
+    "admin_send_message", "admin_change_schedule", "admin_get_stats_by_date", "admin_get_analytics",
+    "admin_analytics", "admin_get_attendance", "admin_attendance", "admin_dashboard", "admin_tracing",
+    "admin_employees_page", "admin_select_employee", "status", "interval", "interval_date",
+)
+
+
 class SendMessage(StatesGroup):
     message_text = State()
 
@@ -102,6 +161,37 @@ class ScheduleChange(StatesGroup):
 
 timezone = pytz.timezone('Europe/Moscow')
 
+# Клавиатура выбора статуса, собирается один раз и переиспользуется во всех рассылках
+STATUS_KEYBOARD = InlineKeyboardMarkup()
+STATUS_KEYBOARD.add(
+    InlineKeyboardButton("Очно", callback_data="status_1"),
+    InlineKeyboardButton("Удаленно", callback_data="status_2")
+)
+STATUS_KEYBOARD.add(
+    InlineKeyboardButton("Больничный", callback_data="status_3"),
+    InlineKeyboardButton("В отпуске", callback_data="status_4"),
+    InlineKeyboardButton("Другое", callback_data="status_5")
+)
+
+STATUS_REQUEST_TEXT = "Пожалуйста, выберите ваш статус на сегодня:"
+
+BUSY_TEXT = "Сейчас формируется слишком много отчетов. Пожалуйста, повторите запрос чуть позже."
+
+# Время утреннего запроса статусов по умолчанию; измененное администратором хранится в settings
+DEFAULT_STATUS_REQUEST_TIME = "08:30"
+STATUS_REQUEST_TIME_SETTING = 'status_request_time'
+
+# Задачи утреннего цикла и их сдвиг в минутах от времени запроса статусов
+STATUS_JOB_OFFSETS = (
+    ('send_status_request_job', 0),
+    ('send_reminders_job', config.REMINDER_TIME),
+    ('check_unanswered_statuses_job', config.REMINDER_TIME + 5),
+    ('send_admin_report_job', config.REMINDER_TIME + 10),
+)
+
+# Время запроса статусов, действующее в планировщике этого процесса
+status_schedule = {'time': DEFAULT_STATUS_REQUEST_TIME}
+
 
 def register_handlers(dp: Dispatcher, db: Database, scheduler):
     @dp.message_handler(commands=['start'])
@@ -138,6 +228,14 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
             "/help - Показать это сообщение\n"
             "/delete_me - Удалить свою регистрацию"
         )
+        user = await db.get_user(message.from_user.id)
+        if user and user['is_admin']:
+            help_text += (
+                "\n\nКоманды администратора:\n"
+                "/request_status ID - Запросить статус у сотрудника\n"
+                "/bot_stats - Состояние бота, очереди сообщений и базы данных\n"
+                "/rebuild_summary [ГГГГ-ММ-ДД] - Пересчитать сводку статусов за день"
+            )
         await message.reply(help_text)
 
     @dp.message_handler(commands=['delete_me'])
@@ -203,9 +301,62 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
                 "Получить аналитические данные", callback_data="admin_get_analytics"
             )
         )
+        keyboard.add(
+            InlineKeyboardButton(
+                "Посещаемость и тренды", callback_data="admin_get_attendance"
+            ),
+            InlineKeyboardButton(
+                "Живая сводка (вкл/выкл)", callback_data="admin_dashboard"
+            )
+        )
+        keyboard.add(
+            InlineKeyboardButton(
+                "Трассировка запросов (вкл/выкл)", callback_data="admin_tracing"
+            )
+        )
         await message.reply("Выберите действие:", reply_markup=keyboard)
 
+    @dp.message_handler(commands=['bot_stats'])
+    @is_admin(db)
+    async def cmd_bot_stats(message: types.Message):
+        lines = ["Обработка обновлений:"]
+        lines += [f"{name}: {value}" for name, value in sorted(throttling.stats().items())]
+        lines += ["", "Очередь сообщений:"]
+        lines += [f"{name}: {value}" for name, value in sorted(outbox.stats().items())]
+        lines += [f"в базе, {state}: {count}" for state, count in sorted((await db.outbox_stats()).items())]
+        lines += ["", "База данных:"]
+        try:
+            lines.append(f"ответ: {await db.health_check() * 1000:.1f} мс")
+        except Exception as e:
+            lines.append(f"недоступна: {e!r}")
+        lines += [f"пул, {name}: {value}" for name, value in sorted(db.pool_stats().items())]
+        lines += ["", "Кэш пользователей:"]
+        lines += [f"{name}: {value}" for name, value in sorted(db.cache_stats().items())]
+        lines += ["", "Трассировка запросов:"]
+        lines += [f"{name}: {value}" for name, value in sorted(tracer.stats().items())]
+        lines += list(tracer.warnings)
+        await reply_long_text(message, "\n".join(lines), "bot_stats.txt")
+
+    @dp.message_handler(commands=['rebuild_summary'])
+    @is_admin(db)
+    async def cmd_rebuild_summary(message: types.Message):
+        date_text = message.get_args().strip()
+        try:
+            report_date = (
+                datetime.strptime(date_text, "%Y-%m-%d").date() if date_text
+                else datetime.now(timezone).date()
+            )
+        except ValueError:
+            await message.reply("Некорректный формат даты. Используйте /rebuild_summary ГГГГ-ММ-ДД.")
+            return
+        await db.rebuild_daily_summary(report_date)
+        report = await send_admin_report(db, report_date)
+        await reply_long_text(
+            message, f"Сводка за {report_date} пересчитана:\n{report}", f"summary_{report_date}.txt"
+        )
+
     @dp.callback_query_handler(Text(startswith="admin_"))
+    @is_admin(db)
     async def admin_menu_callback(
             callback_query: CallbackQuery, state: FSMContext
     ):
@@ -272,45 +423,104 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
             await callback_query.answer()
         elif action == "admin_get_stats_by_date":
             await callback_query.message.reply(
-                "Введите дату в формате ГГГГ-ММ-ДД для получения отчета."
+                "Введите дату в формате ГГГГ-ММ-ДД для получения отчета "
+                "или две даты через пробел (ГГГГ-ММ-ДД ГГГГ-ММ-ДД) для отчета за период."
             )
             await ReportDate.date.set()
             await callback_query.answer()
-        elif action == "admin_get_analytics":
-            await send_analytics(callback_query.message, db)
+        elif action in ("admin_get_analytics", "admin_get_attendance"):
+            prefix = "admin_analytics_" if action == "admin_get_analytics" else "admin_attendance_"
+            keyboard = InlineKeyboardMarkup(row_width=2)
+            keyboard.add(*(
+                InlineKeyboardButton(
+                    f"За {days} дн.", callback_data=f"{prefix}{days}"
+                )
+                for days in config.ANALYTICS_PERIODS
+            ))
+            await callback_query.message.reply("Выберите период:", reply_markup=keyboard)
+            await callback_query.answer()
+        elif action.startswith("admin_analytics_"):
+            days = int(action.split("_")[-1])
+            await send_analytics(callback_query.message, db, days)
+            await callback_query.answer()
+        elif action.startswith("admin_attendance_"):
+            days = int(action.split("_")[-1])
+            await send_attendance(callback_query.message, db, days)
+            await callback_query.answer()
+        elif action == "admin_dashboard":
+            chat_id = callback_query.message.chat.id
+            if chat_id in dashboard.chats:
+                dashboard.close(chat_id)
+                await callback_query.message.reply("Живая сводка отключена.")
+            else:
+                await dashboard.open(chat_id)
+            await callback_query.answer()
+        elif action == "admin_tracing":
+            tracer.enabled = not tracer.enabled
+            if tracer.enabled:
+                await callback_query.message.reply(
+                    f"Трассировка запросов включена: в лог пишутся запросы дольше "
+                    f"{config.TRACE_SLOW_QUERY * 1000:.0f} мс и запросы, повторенные не менее "
+                    f"{config.TRACE_REPEAT_THRESHOLD} раз за обновление или задачу. Итоги — /bot_stats."
+                )
+            else:
+                await callback_query.message.reply("Трассировка запросов отключена.")
             await callback_query.answer()
         elif action == "admin_check_all_statuses":
-            await send_status_request_scheduled(dp, db)
+            await send_status_request_scheduled(
+                dp, db, kind=f"status_request:{callback_query.id}"
+            )
             await callback_query.message.reply("Запрос статусов всех сотрудников отправлен.")
             await callback_query.answer()
         elif action == "admin_check_specific_status":
-            users = await db.get_all_users()
-            if not users:
-                await callback_query.message.reply("Нет зарегистрированных сотрудников.")
-                await callback_query.answer()
-                return
-            keyboard = InlineKeyboardMarkup(row_width=1)
-            for user in users:
-                keyboard.add(
-                    InlineKeyboardButton(
-                        user['full_name'],
-                        callback_data=f"admin_select_employee_{user['telegram_id']}"
-                    )
-                )
-            await callback_query.message.reply("Выберите сотрудника:", reply_markup=keyboard)
+            text, keyboard = await employee_picker(db, 0)
+            if keyboard is None:
+                await callback_query.message.reply(text)
+            else:
+                await callback_query.message.reply(text, reply_markup=keyboard)
+            await callback_query.answer()
+        elif action.startswith("admin_employees_page_"):
+            page = int(action.split("_")[-1])
+            text, keyboard = await employee_picker(db, page)
+            try:
+                await callback_query.message.edit_text(text, reply_markup=keyboard)
+            except MessageNotModified:
+                pass
             await callback_query.answer()
         elif action.startswith("admin_select_employee_"):
             telegram_id = int(action.split("_")[-1])
-            await send_status_request_to_user(dp, telegram_id)
-            selected_user = await db.get_user(telegram_id)
-            if selected_user:
-                await callback_query.message.reply(
-                    f"Запрос статуса отправлен сотруднику {selected_user['full_name']}."
-                )
-            else:
-                await callback_query.message.reply("Сотрудник не найден.")
+            await request_employee_status(dp, db, callback_query.message, telegram_id)
             await callback_query.answer()
 
+    @dp.message_handler(commands=['request_status'])
+    @is_admin(db)
+    async def cmd_request_status(message: types.Message):
+        try:
+            telegram_id = int(message.get_args().strip())
+        except ValueError:
+            await message.reply("Укажите Telegram ID сотрудника: /request_status ID.")
+            return
+        await request_employee_status(dp, db, message, telegram_id)
+
+    @dp.inline_handler()
+    async def employee_inline_search(inline_query: types.InlineQuery):
+        # Поиск доступен только администраторам
+        user = await db.get_user(inline_query.from_user.id)
+        if not user or not user['is_admin']:
+            await inline_query.answer([], cache_time=1, is_personal=True)
+            return
+        found = await name_index.search(db, inline_query.query, config.EMPLOYEE_SEARCH_LIMIT)
+        results = [
+            InlineQueryResultArticle(
+                id=str(telegram_id),
+                title=full_name,
+                description="Запросить статус",
+                input_message_content=InputTextMessageContent(f"/request_status {telegram_id}")
+            )
+            for telegram_id, full_name in found
+        ]
+        await inline_query.answer(results, cache_time=1, is_personal=True)
+
     @dp.message_handler(state=AddAdmin.admin_id)
     async def process_add_admin(message: types.Message, state: FSMContext):
         try:
@@ -347,55 +557,75 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
     async def process_send_message(message: types.Message, state: FSMContext):
         text = message.text.strip()
         users = await db.get_all_users()
-        for user in users:
-            try:
-                await dp.bot.send_message(
-                    chat_id=user['telegram_id'],
-                    text=f"Сообщение от администратора:\n\n{text}",
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                logging.error(f"Не удалось отправить сообщение пользователю {user['telegram_id']}: {e}")
-        await message.reply("Сообщение отправлено всем сотрудникам.")
+        queued = await outbox.enqueue(
+            [user['telegram_id'] for user in users],
+            f"Сообщение от администратора:\n\n{text}",
+            f"admin_message:{message.chat.id}:{message.message_id}",
+            datetime.now(timezone).date(),
+            parse_mode='Markdown'
+        )
+        await message.reply(f"Сообщение поставлено в очередь на отправку {queued} сотрудникам.")
         await state.finish()
 
     @dp.message_handler(state=ScheduleChange.time)
     async def process_schedule_change(message: types.Message, state: FSMContext):
-        time_text = message.text.strip()
+        await state.finish()
         try:
-            hour, minute = map(int, time_text.split(":"))
-            # Обновление расписания в планировщике
-            scheduler.reschedule_job('send_status_request_job', trigger='cron', hour=hour, minute=minute)
-            scheduler.reschedule_job('send_reminders_job', trigger='cron', hour=hour,
-                                     minute=minute - config.REMINDER_TIME)
-            await message.reply(f"Время отправки запросов изменено на {hour:02d}:{minute:02d}.")
+            hour, minute = parse_schedule_time(message.text.strip())
         except ValueError:
             await message.reply("Некорректный формат времени. Пожалуйста, введите в формате ЧЧ:ММ.")
-        await state.finish()
+            return
+        time_text = f"{hour:02d}:{minute:02d}"
+        # Время сохраняется в базе: задачи выполняет ведущий процесс, который может быть другим
+        try:
+            await db.set_setting(STATUS_REQUEST_TIME_SETTING, time_text)
+        except Exception as e:
+            logging.error(f"Не удалось сохранить время отправки запросов: {e}")
+            await message.reply("Не удалось сохранить время отправки запросов. Попробуйте позже.")
+            return
+        if leader.is_leader:
+            await sync_status_schedule(db, scheduler)
+        await message.reply(
+            f"Время отправки запросов изменено на {time_text}. "
+            f"Расписание обновится в течение {config.CLUSTER_LEASE_RENEW} с."
+        )
 
     @dp.message_handler(state=ReportDate.date)
     async def process_report_date(message: types.Message, state: FSMContext):
-        date_text = message.text.strip()
+        date_parts = message.text.split()
         try:
-            report_date = datetime.strptime(date_text, "%Y-%m-%d").date()
-            await send_admin_xlsx_report(message, db, report_date)
+            if not 1 <= len(date_parts) <= 2:
+                raise ValueError
+            dates = [datetime.strptime(part, "%Y-%m-%d").date() for part in date_parts]
         except ValueError:
-            await message.reply("Некорректный формат даты. Пожалуйста, введите в формате ГГГГ-ММ-ДД.")
+            await message.reply(
+                "Некорректный формат даты. Пожалуйста, введите в формате ГГГГ-ММ-ДД "
+                "или ГГГГ-ММ-ДД ГГГГ-ММ-ДД."
+            )
+        else:
+            start_date, end_date = min(dates), max(dates)
+            if (end_date - start_date).days + 1 > config.EXPORT_MAX_DAYS:
+                await message.reply(
+                    f"Период слишком длинный: не более {config.EXPORT_MAX_DAYS} дн. "
+                    "Разбейте его на несколько отчетов."
+                )
+            else:
+                await send_admin_xlsx_report(message, db, start_date, end_date)
         await state.finish()
 
-    @dp.callback_query_handler(Text(startswith="status_"))
+    @dp.callback_query_handler(Text(startswith="status_"), state="*")
     async def status_callback(
             callback_query: CallbackQuery, state: FSMContext
     ):
+        # Ответ сразу убирает индикатор загрузки на кнопке, не дожидаясь записи в базу
+        await callback_query.answer()
+        # Новый выбор статуса отменяет незавершенный ввод пояснения или даты окончания статуса
+        if await state.get_state() in OtherStatus.all_states_names + StatusInterval.all_states_names:
+            await state.finish()
         status_code = callback_query.data.split("_")[1]
-        status_text = {
-            "1": "Очно",
-            "2": "Удаленно",
-            "3": "Больничный",
-            "4": "В отпуске",
-            "5": "Другое"
-        }
-        status = status_text[status_code]
+        status = STATUS_CODES[status_code]
+        # Новый выбор статуса завершает действующий многодневный статус (больничный, отпуск)
+        await db.end_status_interval(callback_query.from_user.id, datetime.now(timezone).date())
         if status_code == "5":
             await callback_query.message.reply(
                 "Пожалуйста, уточните ваш статус."
@@ -404,15 +634,88 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
             # Оповещение администраторов
             full_name = await get_user_full_name(db, callback_query.from_user.id)
             await notify_admins(dp, db,
-                                f"Сотрудник [{full_name}](tg://user?id={callback_query.from_user.id}) установил статус: {status}.")
-            await callback_query.answer()
+                                f"Сотрудник {markdown_mention(full_name, callback_query.from_user.id)} установил статус: {status}.")
+        elif status_code in ("3", "4"):
+            await db.add_or_update_status(callback_query.from_user.id, status)
+            dashboard.touch()
+            keyboard = InlineKeyboardMarkup(row_width=2)
+            keyboard.add(*[
+                InlineKeyboardButton(text, callback_data=f"interval_{status_code}_{days}")
+                for days, text in INTERVAL_CHOICES
+            ])
+            keyboard.add(InlineKeyboardButton("Другая дата", callback_data=f"interval_{status_code}_date"))
+            await callback_query.message.reply(
+                f"Ваш статус сохранен: {status}. На какой срок? "
+                "До конца срока запросы статуса приходить не будут.",
+                reply_markup=keyboard
+            )
         else:
             await db.add_or_update_status(callback_query.from_user.id, status)
+            dashboard.touch()
             await callback_query.message.reply(
                 f"Ваш статус сохранен: {status}. Вы можете изменить его в любое время с помощью команды /status."
             )
 
-            await callback_query.answer()
+    @dp.callback_query_handler(Text(startswith="interval_"), state="*")
+    async def interval_callback(callback_query: CallbackQuery, state: FSMContext):
+        await callback_query.answer()
+        parts = callback_query.data.split("_")
+        if len(parts) != 3 or parts[1] not in ("3", "4"):
+            return
+        status = STATUS_CODES[parts[1]]
+        telegram_id = callback_query.from_user.id
+        if parts[2] == "date":
+            await state.update_data(interval_status=status)
+            await StatusInterval.end_date.set()
+            await callback_query.message.reply(
+                "Введите последний день в формате ГГГГ-ММ-ДД."
+            )
+            return
+        if await state.get_state() in StatusInterval.all_states_names:
+            await state.finish()
+        today = datetime.now(timezone).date()
+        # Кнопка могла быть нажата не в день выбора статуса: статус за сегодня записывается заново
+        await db.add_or_update_status(telegram_id, status)
+        dashboard.touch()
+        days = int(parts[2])
+        if days <= 1:
+            await db.end_status_interval(telegram_id, today)
+            await callback_query.message.reply(
+                "Статус сохранен только на сегодня. Вы можете изменить его в любое время с помощью команды /status."
+            )
+            return
+        end_date = today + timedelta(days=days - 1)
+        await db.set_status_interval(telegram_id, status, today, end_date)
+        await callback_query.message.reply(
+            f"Статус \"{status}\" установлен по {end_date} включительно. "
+            "Если планы изменятся, выберите новый статус командой /status."
+        )
+
+    @dp.message_handler(state=StatusInterval.end_date)
+    async def process_interval_end_date(message: types.Message, state: FSMContext):
+        today = datetime.now(timezone).date()
+        data = await state.get_data()
+        await state.finish()
+        try:
+            end_date = datetime.strptime(message.text.strip(), "%Y-%m-%d").date()
+        except ValueError:
+            await message.reply(
+                "Некорректный формат даты. Статус сохранен только на сегодня; "
+                "чтобы указать срок, выберите статус заново командой /status."
+            )
+            return
+        if not today <= end_date <= today + timedelta(days=config.STATUS_INTERVAL_MAX_DAYS):
+            await message.reply(
+                f"Дата должна быть не раньше сегодняшней и не позже чем через "
+                f"{config.STATUS_INTERVAL_MAX_DAYS} дн. Статус сохранен только на сегодня."
+            )
+            return
+        status = data['interval_status']
+        await db.set_status_interval(message.from_user.id, status, today, end_date)
+        await message.reply(
+            f"Статус \"{status}\" установлен по {end_date} включительно. "
+            "Если планы изменятся, выберите новый статус командой /status."
+        )
 
     @dp.message_handler(state=OtherStatus.description)
     async def process_other_status(message: types.Message, state: FSMContext):
@@ -420,153 +723,237 @@ def register_handlers(dp: Dispatcher, db: Database, scheduler):
         await db.add_or_update_status(
             message.from_user.id, "Другое", description
         )
+        dashboard.touch()
         await message.reply(
             "Ваш статус сохранен. Вы можете изменить его в любое время с помощью команды /status."
         )
         # Оповещение администраторов
         full_name = await get_user_full_name(db, message.from_user.id)
         await notify_admins(dp, db,
-                            f"Сотрудник [{full_name}](tg://user?id={message.from_user.id}) установил статус: Другое ({description}).")
+                            f"Сотрудник {markdown_mention(full_name, message.from_user.id)} установил статус: "
+                            f"Другое ({escape_markdown(description)}).")
         await state.finish()
 
-    requst_hour = 8
-    start_requst_min = 30
-    remind_requst_min = start_requst_min + config.REMINDER_TIME  # 40
-    check_unanswered_statuses_min = remind_requst_min + 5  # 45
-    send_admin_report_min = check_unanswered_statuses_min + 5 # 50
-
-    # Планировщик задач
-    scheduler.add_job(
-        send_status_request_scheduled,
-        trigger='cron',
-        day_of_week='mon-fri',
-        hour=requst_hour,
-        minute=start_requst_min,
-        args=(dp, db),
-        id='send_status_request_job'
+    dashboard.setup(dp, db, dashboard_report)
+    metrics.add_collector(functools.partial(collect_status_metrics, db))
+    handler_metrics.register_actions(*dispatcher_commands(dp), *CALLBACK_ACTIONS)
+
+    # Планировщик задач (каждая задача выполняется не более раза в день во всех процессах бота).
+    # Планировщик работает только в ведущем процессе и после захвата аренды возобновляется
+    # с опозданием: пропущенная за это время задача еще выполняется (один раз, coalesce)
+    # Время задач задается временем запроса статусов (sync_status_schedule переносит их вместе);
+    # в ключ запуска входит это время, поэтому перенос на более позднее время дня дает новый запуск
+    misfire_grace_time = max(
+        config.SCHEDULER_MISFIRE_GRACE, config.CLUSTER_LEASE_TTL + config.CLUSTER_LEASE_RENEW
     )
-    scheduler.add_job(
-        send_reminders,
-        trigger='cron',
-        day_of_week='mon-fri',
-        hour=requst_hour,
-        minute=remind_requst_min,
-        args=(dp, db),
-        id='send_reminders_job'
-    )
-    scheduler.add_job(
-        check_unanswered_statuses,
-        trigger='cron',
-        day_of_week='mon-fri',
-        hour=requst_hour,
-        minute=check_unanswered_statuses_min,
-        args=(dp, db),
-        id='check_unanswered_statuses_job'
-    )
-    scheduler.add_job(
-        send_admin_report_dispatcher,
-        trigger='cron',
-        day_of_week='mon-fri',
-        hour=requst_hour,
-        minute=send_admin_report_min,
-        args=(dp, db),
-        id='send_admin_report_job'
+    jobs = {
+        'send_status_request_job': send_status_request_scheduled,
+        'send_reminders_job': send_reminders,
+        'check_unanswered_statuses_job': check_unanswered_statuses,
+        'send_admin_report_job': send_admin_report_dispatcher,
+    }
+    for job_id, (hour, minute) in status_job_times(status_schedule['time']):
+        scheduler.add_job(
+            run_once(db, job_id, jobs[job_id], period=lambda: status_schedule['time']),
+            trigger='cron',
+            day_of_week='mon-fri',
+            hour=hour,
+            minute=minute,
+            args=(dp, db),
+            id=job_id,
+            misfire_grace_time=misfire_grace_time,
+            coalesce=True
+        )
+
+
+def parse_schedule_time(text: str):
+    """
+    Разбирает время в формате ЧЧ:ММ; возвращает (час, минута) или выбрасывает ValueError.
+    """
+    hour, minute = map(int, text.split(":"))
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(text)
+    return hour, minute
+
+
+def status_job_times(time_text: str):
+    """
+    Время (час, минута) каждой задачи утреннего цикла при запросе статусов в time_text.
+    """
+    hour, minute = parse_schedule_time(time_text)
+    for job_id, offset in STATUS_JOB_OFFSETS:
+        yield job_id, divmod((hour * 60 + minute + offset) % (24 * 60), 60)
+
+
+async def sync_status_schedule(db: Database, scheduler):
+    """
+    Переносит задачи утреннего цикла на время запроса статусов из базы, если оно изменилось.
+    Вызывается ведущим процессом при захвате и продлении аренды (cluster.SchedulerLeader).
+    """
+    time_text = await db.get_setting(STATUS_REQUEST_TIME_SETTING, DEFAULT_STATUS_REQUEST_TIME)
+    if time_text == status_schedule['time']:
+        return
+    for job_id, (hour, minute) in status_job_times(time_text):
+        scheduler.reschedule_job(job_id, trigger='cron', day_of_week='mon-fri', hour=hour, minute=minute)
+    status_schedule['time'] = time_text
+    logging.info(f"Время запроса статусов изменено на {time_text}.")
+
+
+async def send_status_request_scheduled(dp: Dispatcher, db: Database, kind: str = "status_request"):
+    today = datetime.now(timezone).date()
+    # Сотрудникам на больничном или в отпуске статус проставляется из интервала, без запроса
+    await db.apply_status_intervals(today)
+    dashboard.touch()
+    users = await db.get_users_without_interval(today)
+    return await outbox.enqueue(
+        [user['telegram_id'] for user in users],
+        STATUS_REQUEST_TEXT,
+        kind,
+        today,
+        reply_markup=STATUS_KEYBOARD
     )
 
 
-async def send_status_request_scheduled(dp: Dispatcher, db: Database):
-    users = await db.get_all_users()
+async def employee_picker(db: Database, page: int):
+    """
+    Возвращает текст и клавиатуру страницы выбора сотрудника (сотрудники по ФИО,
+    config.EMPLOYEE_PAGE_SIZE на странице). Если сотрудников нет, клавиатура — None.
+    """
+    total = await db.count_users()
+    if not total:
+        return "Нет зарегистрированных сотрудников.", None
+    page_size = config.EMPLOYEE_PAGE_SIZE
+    pages = (total + page_size - 1) // page_size
+    page = min(max(page, 0), pages - 1)
+    users = await db.get_users_page(page * page_size, page_size)
+    keyboard = InlineKeyboardMarkup(row_width=1)
     for user in users:
-        await send_status_request_to_user(dp, user['telegram_id'])
+        keyboard.add(
+            InlineKeyboardButton(
+                user['full_name'],
+                callback_data=f"admin_select_employee_{user['telegram_id']}"
+            )
+        )
+    navigation = []
+    if page > 0:
+        navigation.append(
+            InlineKeyboardButton("« Назад", callback_data=f"admin_employees_page_{page - 1}")
+        )
+    if page < pages - 1:
+        navigation.append(
+            InlineKeyboardButton("Вперед »", callback_data=f"admin_employees_page_{page + 1}")
+        )
+    if navigation:
+        keyboard.row(*navigation)
+    keyboard.add(InlineKeyboardButton("Поиск по ФИО", switch_inline_query_current_chat=""))
+    return f"Выберите сотрудника (страница {page + 1} из {pages}, всего {total}):", keyboard
+
+
+async def request_employee_status(dp: Dispatcher, db: Database, message: types.Message, telegram_id: int):
+    selected_user = await db.get_user(telegram_id)
+    if not selected_user:
+        await message.reply("Сотрудник не найден.")
+        return
+    await send_status_request_to_user(dp, telegram_id)
+    await message.reply(f"Запрос статуса отправлен сотруднику {selected_user['full_name']}.")
 
 
 async def send_status_request_to_user(dp: Dispatcher, user_id: int):
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(
-        InlineKeyboardButton("Очно", callback_data="status_1"),
-        InlineKeyboardButton("Удаленно", callback_data="status_2")
-    )
-    keyboard.add(
-        InlineKeyboardButton("Больничный", callback_data="status_3"),
-        InlineKeyboardButton("В отпуске", callback_data="status_4"),
-        InlineKeyboardButton("Другое", callback_data="status_5")
-    )
     await dp.bot.send_message(
         chat_id=user_id,
-        text="Пожалуйста, выберите ваш статус на сегодня:",
-        reply_markup=keyboard
+        text=STATUS_REQUEST_TEXT,
+        reply_markup=STATUS_KEYBOARD
     )
 
 
 async def send_reminders(dp: Dispatcher, db: Database):
-    users = await db.get_all_users()
     today = datetime.now(timezone).date()
-    for user in users:
-        status = await db.get_status(user['telegram_id'], today)
-        if not status:
-            await dp.bot.send_message(
-                chat_id=user['telegram_id'],
-                text="Напоминаем, что вы еще не указали свой статус на сегодня. Пожалуйста, сделайте это до 9:00."
-            )
+    unanswered = await db.get_users_without_status(today)
+    await outbox.enqueue(
+        [user['telegram_id'] for user in unanswered],
+        "Напоминаем, что вы еще не указали свой статус на сегодня. Пожалуйста, сделайте это до 9:00.",
+        "reminder",
+        today
+    )
+
+
+async def send_admin_xlsx_report(message: types.Message, db: Database, report_date=None, end_date=None):
+    try:
+        async with renderer.job():
+            await build_admin_xlsx_report(message, db, report_date, end_date)
+    except RendererBusy:
+        await message.reply(BUSY_TEXT)
 
 
-async def send_admin_xlsx_report(message: types.Message, db: Database, report_date=None):
+async def build_admin_xlsx_report(message: types.Message, db: Database, report_date=None, end_date=None):
     if report_date is None:
         report_date = datetime.now(timezone).date()
-    statuses = await db.get_statuses_for_date(report_date)
-    users = {
-        user['telegram_id']: user for user in await db.get_all_users()
-    }
-    report = format_status_report(users.values(), statuses)
-    await message.reply(f"Отчет по статусам сотрудников на {report_date}:\n{report}")
-    # Отправка отчета в Excel
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-    worksheet = workbook.add_worksheet()
-    worksheet.write('A1', 'ФИО')
-    worksheet.write('B1', 'Статус')
-    worksheet.write('C1', 'Описание')
-    row = 1
-    for user_id, user in users.items():
-        status = next(
-            (s for s in statuses if s['telegram_id'] == user_id), None
+    if end_date is None:
+        end_date = report_date
+    if end_date == report_date:
+        statuses = await db.get_statuses_for_date(report_date)
+        users = await db.get_all_users()
+        report = await renderer.run(format_status_report, users, statuses)
+        await reply_long_text(
+            message, f"Отчет по статусам сотрудников на {report_date}:\n{report}",
+            f"statuses_{report_date}.txt"
         )
-        status_text = status['status'] if status else "Не известно"
-        description = status['description'] if status else "-"
-        worksheet.write(row, 0, user['full_name'])
-        worksheet.write(row, 1, status_text)
-        worksheet.write(row, 2, description)
-        row += 1
-    workbook.close()
-    output.seek(0)
-    await message.reply_document(
-        ('Отчет.xlsx', output),
-        caption="Отчет по статусам сотрудников."
-    )
+        caption = "Отчет по статусам сотрудников."
+    else:
+        caption = f"Отчет по статусам сотрудников за период с {report_date} по {end_date}."
+    # Отправка отчета в Excel (книга пишется во временный файл)
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        await write_status_matrix(db, report_date, end_date, path)
+        await message.reply_document(
+            InputFile(path, filename='Отчет.xlsx'),
+            caption=caption
+        )
+    finally:
+        os.remove(path)
 
 
-async def send_admin_report(db: Database):
+async def send_admin_report(db: Database, report_date=None):
+    if report_date is None:
+        report_date = datetime.now(timezone).date()
+    summary = await db.get_daily_summary(report_date)
+    users = await db.get_all_users()
+    buckets = {status: summary.members(status) for status in REPORT_STATUSES}
+    return await renderer.run(format_daily_report, users, buckets)
+
+
+async def collect_status_metrics(db: Database):
+    """
+    Обновляет метрики статусов за сегодня и доли ответивших (вызывается при запросе метрик).
+    """
+    summary = await db.get_daily_summary(datetime.now(timezone).date())
+    total = await db.count_users()
+    answered = 0
+    for status in REPORT_STATUSES:
+        count = len(summary.members(status))
+        STATUS_RESPONSES.set(count, status=status)
+        if status != "Не известно":
+            answered += count
+    STATUS_RESPONSE_RATE.set(answered / total if total else 0.0)
+
+
+async def dashboard_report(db: Database, compact: bool = False):
     report_date = datetime.now(timezone).date()
-    statuses = await db.get_statuses_for_date(report_date)
-    status_dict = {status['telegram_id']: status for status in statuses}
-    users = {
-        user['telegram_id']: user for user in await db.get_all_users()
-    }
-    res_stats = {'Очно': [], 'Удаленно': [], 'Больничный': [], 'В отпуске': [], 'Другое': [], 'Не известно': []}
-    for user_id, user in users.items():
-        if user_id in status_dict:
-            status = status_dict[user_id]['status']
-            description = status_dict[user_id]['description']
-        else:
-            status = "Не известно"
-
-        print(user['full_name'])
-        res_stats[status].append(user['full_name'].split()[0])
-    
-
-    report = (f'\nВ офисе: {len(res_stats["Очно"])}\nУдаленно: {len(res_stats["Удаленно"])} - {", ".join(res_stats["Удаленно"])}\nБольничный: {len(res_stats["Больничный"])} - {", ".join(res_stats["Больничный"])}\nВ отпуске: {len(res_stats["В отпуске"])} - {", ".join(res_stats["В отпуске"])}\nДругое: {len(res_stats["Другое"])} - {", ".join(res_stats["Другое"])}\nНе известно: {len(res_stats["Не известно"])} - {", ".join(res_stats["Не известно"])}')
-
-    return report
+    if not compact:
+        report = await send_admin_report(db, report_date)
+        return f"Сводка по статусам сотрудников на {report_date}:\n{report}"
+    # Только количества: помещается в одно сообщение при любом числе сотрудников
+    summary = await db.get_daily_summary(report_date)
+    total = await db.count_users()
+    counts = {status: len(summary.members(status)) for status in REPORT_STATUSES}
+    counts["Не известно"] = total - sum(
+        count for status, count in counts.items() if status != "Не известно"
+    )
+    lines = [f"Сводка по статусам сотрудников на {report_date} (всего {total}):", ""]
+    lines.append(f'В офисе: {counts["Очно"]}')
+    lines += [f"{status}: {counts[status]}" for status in REPORT_STATUSES[1:]]
+    return "\n".join(lines)
 
 
 async def send_admin_report_dispatcher(dp: Dispatcher, db: Database):
@@ -577,9 +964,9 @@ async def send_admin_report_dispatcher(dp: Dispatcher, db: Database):
     for admin in admins:
         admin_id = admin['telegram_id']
         try:
-            await dp.bot.send_message(
-                chat_id=admin_id,
-                text=f"Отчет по статусам сотрудников на {report_date}:\n{report}"
+            await send_long_text(
+                dp.bot, admin_id, f"Отчет по статусам сотрудников на {report_date}:\n{report}",
+                f"report_{report_date}.txt"
             )
         except Exception as e:
             logging.error(f"Не удалось отправить отчет администратору {admin_id}: {e}")
@@ -587,58 +974,80 @@ async def send_admin_report_dispatcher(dp: Dispatcher, db: Database):
 
 async def send_admin_report_replay(message: types.Message, db: Database):
     report_date = datetime.now(timezone).date()
-    report = await send_admin_report(db)
-    admins = await db.get_admins()
-    for admin in admins:
-        admin_id = admin['telegram_id']
-        try:
-            await message.reply(f"Отчет по статусам сотрудников на {report_date}:\n{report}")
-        except Exception as e:
-            logging.error(f"Не удалось отправить отчет администратору {admin_id}: {e}")
+    try:
+        async with renderer.job():
+            report = await send_admin_report(db)
+    except RendererBusy:
+        await message.reply(BUSY_TEXT)
+        return
+    # Отчет получает только запросивший его администратор
+    try:
+        await reply_long_text(
+            message, f"Отчет по статусам сотрудников на {report_date}:\n{report}",
+            f"report_{report_date}.txt"
+        )
+    except Exception as e:
+        logging.error(f"Не удалось отправить отчет администратору {message.chat.id}: {e}")
 
 
 async def check_unanswered_statuses(dp: Dispatcher, db: Database):
-    users = await db.get_all_users()
     today = datetime.now(timezone).date()
-    for user in users:
-        status = await db.get_status(user['telegram_id'], today)
-        if not status:
-            await db.add_or_update_status(
-                user['telegram_id'], "Не известно"
-            )
-            # Уведомление сотруднику
-            await dp.bot.send_message(
-                chat_id=user['telegram_id'],
-                text="Вам автоматически присвоен статус 'Не известно', так как вы не ответили на запрос."
-            )
-            # Уведомление администраторам
-            admins = await db.get_admins()
-            for admin in admins:
-                await dp.bot.send_message(
-                    chat_id=admin['telegram_id'],
-                    text=(
-                        f"Сотрудник {user['full_name']} не ответил на запрос."
-                        " Статус проставлен как 'Не известно'."  # Другое (На уточнении)
-                    ),
-                    parse_mode='Markdown'
-                )
+    await db.apply_status_intervals(today)
+    dashboard.touch()
+    unanswered = await db.get_users_without_status(today)
+    if not unanswered:
+        return
+    unanswered_ids = [user['telegram_id'] for user in unanswered]
+    await db.add_unknown_statuses(unanswered_ids, today)
+    dashboard.touch()
+    # Уведомление сотрудникам
+    await outbox.enqueue(
+        unanswered_ids,
+        "Вам автоматически присвоен статус 'Не известно', так как вы не ответили на запрос.",
+        "unknown_status",
+        today
+    )
+    # Уведомление администраторам одним дайджестом
+    for user in unanswered:
+        await notify_admins(
+            dp, db,
+            f"Сотрудник {escape_markdown(user['full_name'])} не ответил на запрос."
+            " Статус проставлен как 'Не известно'."  # Другое (На уточнении)
+        )
+    await flush_admin_notifications()
 
 
 async def check_employee_statuses(message: types.Message, db: Database):
     await send_admin_xlsx_report(message, db)
 
 
-async def send_analytics(message: types.Message, db: Database):
-    # Пример простой аналитики за последний месяц
+async def send_analytics(message: types.Message, db: Database, days: int = 30):
+    end_date = datetime.now(timezone).date()
+    start_date = end_date - timedelta(days=days - 1)
+    try:
+        async with renderer.job():
+            report = await collect_analytics(db, start_date, end_date)
+    except RendererBusy:
+        await message.reply(BUSY_TEXT)
+        return
+    await reply_long_text(message, report.text, f'analytics_{start_date}_{end_date}.txt')
+    await message.reply_document(
+        InputFile(io.BytesIO(report.days_csv), filename=f'analytics_days_{start_date}_{end_date}.csv'),
+        caption="Статусы по дням (для построения графиков)."
+    )
+    await message.reply_document(
+        InputFile(io.BytesIO(report.users_csv), filename=f'analytics_users_{start_date}_{end_date}.csv'),
+        caption="Статусы по сотрудникам."
+    )
+
+
+async def send_attendance(message: types.Message, db: Database, days: int = 30):
     end_date = datetime.now(timezone).date()
-    start_date = end_date - timedelta(days=30)
-    statuses = await db.get_statuses_in_period(start_date, end_date)
-    # Анализ данных и формирование отчета
-    report = "Аналитические данные за последний месяц:\n"
-    status_counts = {}
-    for status in statuses:
-        status_text = status['status']
-        status_counts[status_text] = status_counts.get(status_text, 0) + 1
-    for status, count in status_counts.items():
-        report += f"{status}: {count} раз(а)\n"
-    await message.reply(report)
+    start_date = end_date - timedelta(days=days - 1)
+    try:
+        async with renderer.job():
+            report = await collect_attendance(db, start_date, end_date)
+    except RendererBusy:
+        await message.reply(BUSY_TEXT)
+        return
+    await reply_long_text(message, report, f'attendance_{start_date}_{end_date}.txt')
@@ -0,0 +1,556 @@
+'''
+Пояснения по коду:
+
+Нагрузочный прогон утреннего цикла без обращения к настоящему Telegram:
+
+python loadtest.py [--users N] [--speed K] [--latency С] [--flood P] [--api-limit N] [--blocked P] ...
+
+Поддельный Bot API (FakeBotAPI):
+
+Локальный aiohttp-сервер отвечает на запросы бота вместо api.telegram.org
+(Bot создается с server=TelegramAPIServer.from_base(...)) и считает вызовы по методам.
+Он умеет добавлять задержку ответа (экспоненциальное распределение со средним --latency),
+возвращать RetryAfter (429) — случайно с вероятностью --flood и при превышении --api-limit
+сообщений в секунду, а также BotBlocked (403) для доли --blocked сотрудников.
+
+Синтетические сотрудники:
+
+В пустую базу (по умолчанию — временный файл SQLite, другой адрес можно задать переменной
+LOADTEST_DATABASE_URL) добавляются --users сотрудников и --admins администраторов.
+Получив запрос статуса, сотрудник с вероятностью --answer нажимает кнопку через
+логнормально распределенное время (медиана --response-median секунд); остальные с вероятностью
+--after-reminder отвечают после напоминания. Выбор "Другое" сопровождается пояснением,
+"Больничный" и "В отпуске" — датой окончания или кнопкой "Только сегодня";
+доля --double-tap нажатий повторяется дважды подряд. Нажатия передаются в dp.updates_handler.notify,
+как при работе бота (с промежуточным обработчиком throttling.py и хранилищем FSM в базе).
+
+Поддельные часы (SimClock):
+
+Этапы выполняются в том же порядке и с теми же интервалами, что в планировщике
+(send_status_request_scheduled → send_reminders → check_unanswered_statuses →
+send_admin_report_dispatcher), но время ускорено в --speed раз. Очередной этап не начинается,
+пока не отправлена волна предыдущего: отправка ограничена лимитами рассылки (broadcast.py),
+которые не ускоряются.
+
+Результаты:
+
+Для каждого этапа — длительность задачи, время отправки волны (и успевает ли она
+до следующего этапа в реальном расписании) и количество запросов к базе; для обновлений —
+медиана и 99-й процентиль времени обработки и число запросов к базе на обновление;
+вызовы Bot API, счетчики очереди сообщений и ограничения частоты, итоговые статусы за день.
+'''
+# loadtest.py
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+# Адрес базы задается до импорта config, чтобы прогон не затронул рабочую базу из .env
+os.environ['DATABASE_URL'] = os.getenv('LOADTEST_DATABASE_URL') or 'sqlite:///' + os.path.join(
+    tempfile.mkdtemp(prefix='loadtest_'), 'loadtest.db'
+)
+FAKE_BOT_TOKEN = '123456:LOADTEST'
+os.environ['BOT_TOKEN'] = FAKE_BOT_TOKEN
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import config
+import handlers
+from db import Database, users as users_table, OUTBOX_PENDING, OUTBOX_SENDING
+from fsm_storage import DatabaseStorage
+from outbox import outbox
+from rendering import renderer
+from throttling import throttling
+from metrics import handler_metrics
+from tracing import tracing_middleware
+from utils import REPORT_STATUSES, flush_admin_notifications
+
+# Методы Bot API, к которым применяются лимиты и блокировка
+SEND_METHODS = {'sendMessage', 'sendDocument', 'editMessageText'}
+
+# Первый Telegram ID синтетических сотрудников
+FIRST_USER_ID = 10_000_000
+
+# Выбор статуса сотрудниками: код кнопки и вес
+STATUS_WEIGHTS = (('1', 60), ('2', 25), ('3', 3), ('4', 2), ('5', 10))
+
+# Через сколько секунд (по поддельным часам) сотрудник вводит пояснение или дату окончания
+FOLLOW_UP_DELAY = 30
+
+# Как часто проверяется, отправлена ли волна, в секундах
+DRAIN_POLL_INTERVAL = 0.1
+
+# Запросы к базе текущего обновления; None — запрос не относится к обновлению
+_update_queries = ContextVar('loadtest_update_queries', default=None)
+# Служебные запросы самого прогона не учитываются
+_untracked = ContextVar('loadtest_untracked', default=False)
+
+
+def percentile(values, share: float):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class SimClock:
+    """
+    Поддельные часы: секунда по ним длится 1 / speed реальных секунд.
+    """
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self._started = time.monotonic()
+
+    def now(self):
+        return (time.monotonic() - self._started) * self.speed
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds / self.speed)
+
+    async def sleep_until(self, moment: float):
+        delay = moment - self.now()
+        if delay > 0:
+            await self.sleep(delay)
+
+
+class QueryCounter:
+    """
+    Считает запросы к базе (вызовы методов databases.Database) по этапам и по обновлениям.
+    """
+
+    METHODS = ('execute', 'execute_many', 'fetch_all', 'fetch_one', 'fetch_val', 'iterate')
+
+    def __init__(self):
+        self.stage = None
+        self.by_stage = Counter()
+
+    def install(self, database):
+        for name in self.METHODS:
+            setattr(database, name, self._wrap(getattr(database, name)))
+
+    def _count(self):
+        if _untracked.get():
+            return
+        self.by_stage[self.stage] += 1
+        queries = _update_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+    def _wrap(self, method):
+        def wrapper(*args, **kwargs):
+            self._count()
+            return method(*args, **kwargs)
+        return wrapper
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float, flood: float, retry_after: int, api_limit: int, blocked, on_send):
+        self.latency = latency
+        self.flood = flood
+        self.retry_after = retry_after
+        self.api_limit = api_limit
+        self.blocked = blocked
+        self.on_send = on_send
+        self.calls = Counter()
+        self.errors = Counter()
+        self._message_ids = itertools.count(1)
+        self._recent = deque()
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Запускает сервер и возвращает его адрес для TelegramAPIServer.from_base.
+        """
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @staticmethod
+    def _error(status: int, description: str, parameters=None):
+        body = {'ok': False, 'error_code': status, 'description': description}
+        if parameters:
+            body['parameters'] = parameters
+        return web.json_response(body, status=status)
+
+    def _over_limit(self):
+        # Скользящее окно в одну секунду по всем отправкам
+        if not self.api_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.api_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _message(self, chat_id, params):
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text', ''),
+        }
+
+    async def handle(self, request: web.Request):
+        method = request.match_info['method']
+        params = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+        chat_id = int(params['chat_id']) if 'chat_id' in params else None
+        if method in SEND_METHODS:
+            if chat_id in self.blocked:
+                self.errors['blocked'] += 1
+                return self._error(403, 'Forbidden: bot was blocked by the user')
+            if random.random() < self.flood or self._over_limit():
+                self.errors['flood'] += 1
+                return self._error(
+                    429, f"Too Many Requests: retry after {self.retry_after}",
+                    {'retry_after': self.retry_after}
+                )
+        if method == 'getMe':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}
+        elif method in SEND_METHODS:
+            result = self._message(chat_id, params)
+            if method == 'sendMessage':
+                self.on_send(chat_id, params, result['message_id'])
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+
+class SimulatedUser:
+    def __init__(self, telegram_id: int, answers: bool, after_reminder: bool):
+        self.telegram_id = telegram_id
+        self.answers = answers
+        self.after_reminder = after_reminder
+        self.request_message_id = None
+        self.scheduled = False
+
+
+class MorningSimulation:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.clock = SimClock(args.speed)
+        self.queries = QueryCounter()
+        self.users = {}
+        self.blocked = set()
+        self.latencies = {}
+        self.update_queries = []
+        self.presses = Counter()
+        self.stages = []
+        self._update_ids = itertools.count(1)
+        self._tasks = set()
+        self.api = FakeBotAPI(
+            args.latency, args.flood, args.retry_after, args.api_limit, self.blocked, self.on_send
+        )
+        self.db = None
+        self.dp = None
+
+    # Синтетические сотрудники
+
+    async def create_users(self):
+        args = self.args
+        rows = []
+        for n in range(args.users):
+            telegram_id = FIRST_USER_ID + n
+            self.users[telegram_id] = SimulatedUser(
+                telegram_id,
+                answers=self.rng.random() < args.answer,
+                after_reminder=self.rng.random() < args.after_reminder
+            )
+            if self.rng.random() < args.blocked:
+                self.blocked.add(telegram_id)
+            rows.append({
+                'telegram_id': telegram_id,
+                'full_name': f"Сотрудник {n + 1}",
+                'is_admin': n < args.admins,
+            })
+        await self.db.database.execute_many(users_table.insert(), rows)
+
+    def on_send(self, chat_id, params, message_id):
+        """
+        Вызывается поддельным Bot API при каждом sendMessage: запрос статуса или напоминание
+        планирует нажатие кнопки сотрудником.
+        """
+        user = self.users.get(chat_id)
+        if user is None or user.scheduled:
+            return
+        if 'status_' in params.get('reply_markup', ''):
+            user.request_message_id = message_id
+            if user.answers:
+                self._schedule(user, self.args.response_median)
+        elif params.get('text', '').startswith('Напоминаем') and user.after_reminder:
+            self._schedule(user, self.args.response_median / 3)
+
+    def _schedule(self, user: SimulatedUser, median: float):
+        user.scheduled = True
+        delay = self.rng.lognormvariate(math.log(median), self.args.response_sigma)
+        self._spawn(self._press(user, delay))
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Обновления от сотрудников
+
+    def _from_user(self, telegram_id: int):
+        return {'id': telegram_id, 'is_bot': False, 'first_name': f"User{telegram_id}"}
+
+    def _callback_update(self, user: SimulatedUser, data: str):
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._update_ids)),
+                'from': self._from_user(user.telegram_id),
+                'message': {
+                    'message_id': user.request_message_id or 1,
+                    'date': int(time.time()),
+                    'chat': {'id': user.telegram_id, 'type': 'private'},
+                    'text': handlers.STATUS_REQUEST_TEXT,
+                },
+                'chat_instance': str(user.telegram_id),
+                'data': data,
+            },
+        }
+
+    def _message_update(self, user: SimulatedUser, text: str):
+        return {
+            'update_id': next(self._update_ids),
+            'message': {
+                'message_id': next(self._update_ids),
+                'date': int(time.time()),
+                'chat': {'id': user.telegram_id, 'type': 'private'},
+                'from': self._from_user(user.telegram_id),
+                'text': text,
+            },
+        }
+
+    async def _dispatch(self, update: dict, kind: str):
+        # Нажатия планируются из обработчика поддельного API, где текущий бот не задан
+        Dispatcher.set_current(self.dp)
+        Bot.set_current(self.dp.bot)
+        queries = [0]
+        _update_queries.set(queries)
+        started = time.monotonic()
+        try:
+            # Как в webhook.py: у каждого обновления свой контекст и промежуточные обработчики
+            await asyncio.ensure_future(self.dp.updates_handler.notify(types.Update(**update)))
+        except Exception as e:
+            self.presses['errors'] += 1
+            logging.error(f"Ошибка при обработке обновления {update['update_id']}: {e}")
+        self.latencies.setdefault(kind, []).append(time.monotonic() - started)
+        self.update_queries.append(queries[0])
+
+    async def _press(self, user: SimulatedUser, delay: float):
+        await self.clock.sleep(delay)
+        codes, weights = zip(*STATUS_WEIGHTS)
+        code = self.rng.choices(codes, weights)[0]
+        self.presses[code] += 1
+        update = self._callback_update(user, f"status_{code}")
+        if self.rng.random() < self.args.double_tap:
+            self.presses['double_tap'] += 1
+            self._spawn(self._dispatch(self._callback_update(user, f"status_{code}"), 'callback'))
+        await self._dispatch(update, 'callback')
+        if code == '5':
+            await self.clock.sleep(FOLLOW_UP_DELAY)
+            await self._dispatch(self._message_update(user, "Командировка"), 'message')
+        elif code in ('3', '4'):
+            await self.clock.sleep(FOLLOW_UP_DELAY)
+            choice = self.rng.random()
+            if choice < 0.2:
+                # Вопрос о сроке остается без ответа: следующий выбор статуса должен обработаться
+                self.presses['interval_ignored'] += 1
+                await self.clock.sleep(FOLLOW_UP_DELAY)
+                await self._dispatch(self._callback_update(user, f"status_{code}"), 'callback')
+            elif choice < 0.8:
+                days = self.rng.choice((1, 3, 7, 14))
+                await self._dispatch(self._callback_update(user, f"interval_{code}_{days}"), 'callback')
+            else:
+                await self._dispatch(self._callback_update(user, f"interval_{code}_date"), 'callback')
+                await self.clock.sleep(FOLLOW_UP_DELAY)
+                end_date = datetime.now(self.db.timezone).date() + timedelta(days=self.rng.randint(1, 14))
+                await self._dispatch(self._message_update(user, end_date.isoformat()), 'message')
+
+    # Утренний цикл
+
+    async def wait_drained(self):
+        """
+        Ждет, пока в очереди не останется неотправленных сообщений; возвращает время ожидания.
+        """
+        token = _untracked.set(True)
+        started = time.monotonic()
+        try:
+            while True:
+                stats = await self.db.outbox_stats()
+                if not stats.get(OUTBOX_PENDING) and not stats.get(OUTBOX_SENDING):
+                    return time.monotonic() - started
+                await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        finally:
+            _untracked.reset(token)
+
+    async def run_stages(self):
+        gap = 5 * 60
+        reminder = config.REMINDER_TIME * 60
+        # Те же интервалы, что у задач планировщика в handlers.register_handlers
+        stages = (
+            (0, "Запрос статусов", handlers.send_status_request_scheduled),
+            (reminder, "Напоминание", handlers.send_reminders),
+            (reminder + gap, "Проверка неответивших", handlers.check_unanswered_statuses),
+            (reminder + 2 * gap, "Отчет администраторам", handlers.send_admin_report_dispatcher),
+        )
+        for number, (moment, name, job) in enumerate(stages):
+            await self.clock.sleep_until(moment)
+            self.queries.stage = name
+            started = time.monotonic()
+            await job(self.dp, self.db)
+            job_seconds = time.monotonic() - started
+            wave_seconds = job_seconds + await self.wait_drained()
+            next_gap = stages[number + 1][0] - moment if number + 1 < len(stages) else None
+            self.stages.append((name, moment, job_seconds, wave_seconds, next_gap))
+        self.queries.stage = "После отчета"
+        # Сотрудники, которые еще не ответили, отвечают уже после отчета
+        await self.clock.sleep(self.args.tail)
+        late = sum(1 for task in self._tasks if not task.done())
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.presses['late'] = late
+        await flush_admin_notifications()
+
+    async def run(self):
+        base_url = await self.api.start()
+        bot = Bot(token=FAKE_BOT_TOKEN, server=TelegramAPIServer.from_base(base_url))
+        self.db = Database()
+        await self.db.connect()
+        if await self.db.count_users():
+            await self.db.disconnect()
+            await bot.session.close()
+            await self.api.stop()
+            raise SystemExit("База данных не пуста: нагрузочный прогон выполняется только на пустой базе.")
+        storage = DatabaseStorage(
+            self.db, config.FSM_CACHE_SIZE, config.FSM_STATE_TTL,
+            config.FSM_FLUSH_INTERVAL, config.FSM_FLUSH_BATCH
+        )
+        self.dp = Dispatcher(bot, storage=storage)
+        self.dp.middleware.setup(throttling)
+        self.dp.middleware.setup(handler_metrics)
+        self.dp.middleware.setup(tracing_middleware)
+        Dispatcher.set_current(self.dp)
+        Bot.set_current(bot)
+        # Планировщик не запускается: задачи вызываются по поддельным часам
+        register_scheduler = AsyncIOScheduler(timezone=self.db.timezone)
+        handlers.register_handlers(self.dp, self.db, register_scheduler)
+        await self.create_users()
+        self.queries.install(self.db.database)
+        outbox.setup(bot, self.db)
+        outbox.start()
+        self.clock = SimClock(self.args.speed)
+        try:
+            await self.run_stages()
+        finally:
+            await outbox.stop()
+            await storage.close()
+            await storage.wait_closed()
+            await bot.session.close()
+            summary = await self.db.get_daily_summary(datetime.now(self.db.timezone).date())
+            self.final_statuses = {status: len(summary.members(status)) for status in REPORT_STATUSES}
+            await self.db.disconnect()
+            await self.api.stop()
+            renderer.shutdown()
+
+    # Отчет
+
+    def report(self):
+        args = self.args
+        lines = [
+            f"Сотрудников: {args.users} (администраторов {args.admins}, "
+            f"заблокировали бота {len(self.blocked)}), ускорение часов: {args.speed}×."
+        ]
+        for name, moment, job_seconds, wave_seconds, next_gap in self.stages:
+            line = (
+                f"{name} (+{int(moment // 60)} мин): задача {job_seconds:.2f} с, "
+                f"волна {wave_seconds:.2f} с"
+            )
+            if next_gap is not None:
+                fits = "да" if wave_seconds <= next_gap else "нет"
+                line += f", успевает до следующего этапа ({next_gap // 60} мин): {fits}"
+            lines.append(line + f"; запросов к базе: {self.queries.by_stage[name]}")
+        lines.append(f"Запросов к базе после отчета: {self.queries.by_stage['После отчета']}")
+        lines.append(
+            "Нажатия: " + ", ".join(f"{key}: {count}" for key, count in sorted(self.presses.items()))
+        )
+        everything = [value for values in self.latencies.values() for value in values]
+        for kind, values in [('все', everything)] + sorted(self.latencies.items()):
+            lines.append(
+                f"Обработка обновлений ({kind}, {len(values)}): медиана {percentile(values, 0.5) * 1000:.1f} мс, "
+                f"99% {percentile(values, 0.99) * 1000:.1f} мс, максимум {max(values or [0]) * 1000:.1f} мс"
+            )
+        if self.update_queries:
+            lines.append(
+                f"Запросов к базе на обновление: в среднем "
+                f"{sum(self.update_queries) / len(self.update_queries):.1f}, максимум {max(self.update_queries)}"
+            )
+        lines.append("Вызовы Bot API: " + json.dumps(dict(self.api.calls), ensure_ascii=False))
+        lines.append("Ошибки Bot API: " + json.dumps(dict(self.api.errors), ensure_ascii=False))
+        lines.append("Очередь сообщений: " + json.dumps(outbox.stats(), ensure_ascii=False))
+        lines.append("Ограничение частоты: " + json.dumps(throttling.stats(), ensure_ascii=False))
+        lines.append("Статусы за день: " + json.dumps(self.final_statuses, ensure_ascii=False))
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон утреннего цикла с поддельным Bot API")
+    parser.add_argument("--users", type=int, default=5000, help="количество сотрудников")
+    parser.add_argument("--admins", type=int, default=3, help="сколько из них администраторов")
+    parser.add_argument("--speed", type=float, default=30, help="ускорение поддельных часов")
+    parser.add_argument("--latency", type=float, default=0.05, help="средняя задержка ответа Bot API, с")
+    parser.add_argument("--flood", type=float, default=0.001, help="вероятность случайного RetryAfter")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429, с")
+    parser.add_argument(
+        "--api-limit", type=int, default=30, help="сообщений в секунду до ответа 429 (0 — без лимита)"
+    )
+    parser.add_argument("--blocked", type=float, default=0.02, help="доля заблокировавших бота")
+    parser.add_argument("--answer", type=float, default=0.85, help="доля ответивших на запрос")
+    parser.add_argument(
+        "--after-reminder", type=float, default=0.6, help="доля остальных, ответивших после напоминания"
+    )
+    parser.add_argument(
+        "--response-median", type=float, default=180, help="медиана времени ответа, с (по поддельным часам)"
+    )
+    parser.add_argument("--response-sigma", type=float, default=1.0, help="разброс времени ответа (sigma)")
+    parser.add_argument("--double-tap", type=float, default=0.05, help="доля повторных нажатий")
+    parser.add_argument(
+        "--tail", type=float, default=300, help="сколько ждать поздних ответов после отчета, с (по поддельным часам)"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    simulation = MorningSimulation(args)
+    asyncio.run(simulation.run())
+    print(simulation.report())
@@ -6,7 +6,7 @@
 asyncio для запуска асинхронного цикла событий.
 logging для настройки логирования.
 Bot, Dispatcher, BotCommand из библиотеки aiogram для работы с ботом.
-MemoryStorage из aiogram.contrib.fsm_storage.memory для хранения состояний FSM в памяти.
+DatabaseStorage из файла fsm_storage.py для хранения состояний FSM в базе данных.
 AsyncIOScheduler из apscheduler.schedulers.asyncio для планирования задач.
 Database из файла db.py для взаимодействия с базой данных.
 register_handlers из файла handlers.py для регистрации обработчиков команд и сообщений.
@@ -18,11 +18,13 @@ BOT_TOKEN из файла config.py для доступа к токену бот
 
 Инициализация бота и диспетчера:
 Создается экземпляр Bot с использованием токена из config.py.
-Создается экземпляр Dispatcher с передачей бота и хранилища состояний MemoryStorage.
+Создается экземпляр Database и хранилище состояний DatabaseStorage поверх него.
+Создается экземпляр Dispatcher с передачей бота и хранилища состояний.
 Инициализация базы данных:
-Создается экземпляр Database и устанавливается соединение с базой данных.
+Устанавливается соединение с базой данных (пул соединений настраивается в config.py).
+В процессах --workers миграции не применяются: их один раз применяет родительский процесс.
 Инициализация планировщика:
-Создается экземпляр AsyncIOScheduler и запускается.
+Создается экземпляр AsyncIOScheduler и запускается приостановленным; задачи выполняются, пока процесс владеет арендой ведущего (cluster.py).
 Регистрация обработчиков:
 Вызывается функция register_handlers, которая регистрирует все обработчики и планировщики задач, передавая диспетчер, базу данных и планировщик.
 Установка команд бота:
@@ -30,31 +32,53 @@ BOT_TOKEN из файла config.py для доступа к токену бот
 /start — регистрация в системе.
 /status — проверка или изменение статуса.
 /admin — панель администратора.
+Метрики:
+Промежуточный обработчик handler_metrics измеряет время обработчиков, планировщик сообщает о пропущенных запусках,
+а при METRICS_PORT != 0 запускается HTTP-сервер метрик в формате Prometheus (metrics.py).
+Промежуточный обработчик tracing_middleware группирует запросы к базе по обновлениям (tracing.py).
 Запуск бота:
 Запускается метод start_polling для начала приема и обработки обновлений от Telegram.
+При запуске с ключом --webhook вместо этого запускается webhook-сервер (webhook.py); для него обязателен WEBHOOK_SECRET.
+С ключом --workers N запускается N процессов, которые слушают один порт (reuse_port),
+а плановые задачи выполняет только ведущий процесс (cluster.py).
 Обработка завершения работы:
-В блоке finally происходит корректное закрытие сессии бота и отключение от базы данных.
+В блоке finally несохраненные состояния FSM записываются в базу, закрывается сессия бота и происходит отключение от базы данных.
 Точка входа в приложение:
 
 Проверка if __name__ == "__main__" гарантирует, что функция main будет выполнена только при непосредственном запуске файла main.py.
-asyncio.run(main()) запускает асинхронную функцию main в событийном цикле.
+asyncio.run(main(...)) запускает асинхронную функцию main в событийном цикле.
 '''
 # main.py
+import argparse
 import asyncio
+import functools
 import logging
+import multiprocessing
 from aiogram import Bot, Dispatcher
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import pytz
 from db import Database
-from handlers import register_handlers
-from config import BOT_TOKEN, DATABASE_URL
+from handlers import register_handlers, sync_status_schedule
+from config import (
+    BOT_TOKEN, DATABASE_URL, FSM_CACHE_SIZE, FSM_STATE_TTL, FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    METRICS_HOST, METRICS_PORT
+)
+from cluster import leader
+from throttling import throttling
+from fsm_storage import DatabaseStorage
+from rendering import renderer
+from utils import flush_admin_notifications
+from outbox import outbox
+from webhook import WebhookServer, SECRET_PATTERN
+from metrics import metrics, metrics_server, handler_metrics, watch_scheduler
+from tracing import tracing_middleware
 
 
 logging.basicConfig(level=logging.INFO) # change to INFO
 
-async def main():
+async def main(use_webhook: bool = False, shared: bool = False, worker: int = 0):
     if not BOT_TOKEN:
         logging.error("Не указан токен бота. Пожалуйста, установите переменную BOT_TOKEN в файле .env")
         exit(1)
@@ -64,22 +88,50 @@ async def main():
         exit(1)
     # Инициализация бота и диспетчера
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(bot, storage=MemoryStorage())
-
-    # Инициализация базы данных
-    db = Database()
-    await db.connect()
+    db = Database(shared=shared)
+    if shared:
+        # Состояние пользователя может прочитать другой процесс: без кэша и с немедленной записью
+        storage = DatabaseStorage(db, 0, FSM_STATE_TTL, FSM_FLUSH_INTERVAL, 1)
+    else:
+        storage = DatabaseStorage(db, FSM_CACHE_SIZE, FSM_STATE_TTL, FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH)
+    dp = Dispatcher(bot, storage=storage)
+    # Порядок обновлений каждого пользователя и ограничение частоты (throttling.py)
+    dp.middleware.setup(throttling)
+    # Время обработчиков для метрик
+    dp.middleware.setup(handler_metrics)
+    # Трассировка запросов к базе по обновлениям (после throttling: отброшенные обновления не трассируются)
+    dp.middleware.setup(tracing_middleware)
+
+    # Инициализация базы данных; в режиме --workers миграции уже применены в migrate()
+    await db.connect(migrate=not shared)
 
     # Установка таймзоны
     timezone = pytz.timezone('Europe/Moscow')  # Укажите вашу таймзону
 
     # Инициализация планировщика с таймзоной
+    # Планировщик запускается приостановленным и работает только в ведущем процессе (cluster.py)
     scheduler = AsyncIOScheduler(timezone=timezone)
-    scheduler.start()
+    scheduler.start(paused=True)
+    watch_scheduler(scheduler)
 
     # Регистрация обработчиков
     register_handlers(dp, db, scheduler)
 
+    # Запуск обработчиков очереди исходящих сообщений
+    outbox.setup(bot, db)
+    outbox.start()
+    metrics.add_collector(outbox.collect_metrics)
+    metrics.add_collector(db.collect_metrics)
+
+    # Сервер метрик; у каждого процесса (--workers) свой порт
+    if METRICS_PORT:
+        await metrics_server.start(METRICS_HOST, METRICS_PORT + worker)
+
+    # Выбор ведущего процесса для планировщика
+    # Ведущий процесс применяет время запроса статусов, сохраненное администратором в базе
+    leader.setup(db, scheduler, sync=functools.partial(sync_status_schedule, db, scheduler))
+    leader.start()
+
     # Установка команд бота
     await bot.set_my_commands([
         BotCommand(command="/start", description="Регистрация в системе"),
@@ -91,12 +143,57 @@ async def main():
 
     # Запуск бота
     try:
-        await dp.start_polling()
+        if use_webhook:
+            server = WebhookServer(dp, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_SECRET)
+            await server.serve_forever(WEBAPP_HOST, WEBAPP_PORT, reuse_port=shared)
+        else:
+            await dp.start_polling()
     finally:
         # Корректное завершение работы
+        await metrics_server.stop()
+        await leader.stop()
+        await outbox.stop()
+        await flush_admin_notifications()
+        await storage.close()
+        await storage.wait_closed()
         await bot.session.close()
         await db.disconnect()
+        renderer.shutdown()
+
+async def migrate():
+    db = Database()
+    await db.connect()
+    await db.disconnect()
+
+
+def run_worker(worker: int):
+    asyncio.run(main(use_webhook=True, shared=True, worker=worker))
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--webhook", action="store_true", help="принимать обновления через webhook")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="количество процессов бота (только вместе с --webhook)"
+    )
+    args = parser.parse_args()
+    if args.webhook and not SECRET_PATTERN.fullmatch(WEBHOOK_SECRET):
+        parser.error(
+            "--webhook требует WEBHOOK_SECRET (1–256 символов A-Z, a-z, 0-9, _, -): "
+            "без него сервер принял бы поддельные обновления"
+        )
+    if args.workers > 1:
+        if not args.webhook:
+            parser.error("--workers требует --webhook: getUpdates нельзя вызывать из нескольких процессов")
+        # Миграции применяются один раз до запуска процессов
+        asyncio.run(migrate())
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=run_worker, args=(i,)) for i in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    else:
+        asyncio.run(main(args.webhook))
     
\ No newline at end of file
@@ -0,0 +1,359 @@
+'''
+Пояснения по коду:
+
+Метрики бота в формате Prometheus (http://config.METRICS_HOST:config.METRICS_PORT/metrics):
+
+Registry хранит счетчики (Counter), гистограммы (Histogram) и текущие значения (Gauge)
+с метками и отдает их в текстовом формате Prometheus. Значения, которые дорого
+поддерживать постоянно (очередь сообщений, доля ответивших за день), вычисляются
+сборщиками (add_collector) непосредственно при запросе метрик.
+
+Что измеряется:
+
+bot_handler_seconds — время обработчиков aiogram по имени обработчика и действию
+(callback_data без числовых частей, например admin_employees_page, или команда).
+Измеряется промежуточным обработчиком HandlerMetricsMiddleware. Число значений метки action
+ограничено: учитываются только зарегистрированные команды (dispatcher_commands) и известные
+действия кнопок (register_actions), остальные команды и callback_data попадают в action="other".
+bot_db_seconds — время каждого публичного метода Database (instrument_methods в db.py).
+bot_telegram_sends_total, bot_telegram_send_errors_total, bot_telegram_send_seconds —
+отправки движка рассылки (broadcast.send_one) по результату, ошибки по типу, время запроса к API.
+bot_job_seconds, bot_job_runs_total, bot_job_misfires_total — длительность и результат
+плановых задач (cluster.run_once) и пропущенные запуски планировщика (watch_scheduler).
+bot_status_responses, bot_status_response_rate — статусы за сегодня и доля ответивших.
+bot_outbox_messages — сообщения в таблице outbox по состояниям.
+bot_db_pool_connections — размер пула соединений с базой, свободные соединения и максимум.
+
+В режиме нескольких процессов (main.py --workers N) каждый процесс отдает свои метрики
+на порту config.METRICS_PORT + номер процесса.
+'''
+# metrics.py
+import functools
+import inspect
+import logging
+import re
+import time
+from contextvars import ContextVar
+from aiohttp import web
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from apscheduler.events import EVENT_JOB_MISSED
+import config
+
+# Границы корзин гистограмм по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Границы корзин для плановых задач, в секундах
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def _key(self, labels: dict):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # Количество по корзинам (не накопительное), сумма и количество наблюдений
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        """
+        Добавляет асинхронную функцию без аргументов, которая обновляет значения Gauge
+        перед каждой выдачей метрик.
+        """
+        self.collectors.append(collector)
+
+    async def render(self):
+        for collector in self.collectors:
+            try:
+                await collector()
+            except Exception as e:
+                logging.error(f"Не удалось собрать метрики ({collector}): {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry()
+
+HANDLER_SECONDS = metrics.histogram(
+    'bot_handler_seconds', 'Время обработчиков обновлений.', ('handler', 'action')
+)
+DB_SECONDS = metrics.histogram(
+    'bot_db_seconds', 'Время методов Database.', ('method',)
+)
+TELEGRAM_SENDS = metrics.counter(
+    'bot_telegram_sends_total', 'Отправки движка рассылки по результату.', ('result',)
+)
+TELEGRAM_SEND_ERRORS = metrics.counter(
+    'bot_telegram_send_errors_total', 'Ошибки Bot API при отправке по типу.', ('error',)
+)
+TELEGRAM_SEND_SECONDS = metrics.histogram(
+    'bot_telegram_send_seconds', 'Время запроса sendMessage движка рассылки.'
+)
+JOB_SECONDS = metrics.histogram(
+    'bot_job_seconds', 'Длительность плановых задач.', ('job',), JOB_BUCKETS
+)
+JOB_RUNS = metrics.counter(
+    'bot_job_runs_total', 'Запуски плановых задач по результату.', ('job', 'result')
+)
+JOB_MISFIRES = metrics.counter(
+    'bot_job_misfires_total', 'Пропущенные запуски плановых задач.', ('job',)
+)
+STATUS_RESPONSES = metrics.gauge(
+    'bot_status_responses', 'Статусы сотрудников за сегодня.', ('status',)
+)
+STATUS_RESPONSE_RATE = metrics.gauge(
+    'bot_status_response_rate', 'Доля сотрудников, ответивших на запрос статуса сегодня.'
+)
+OUTBOX_MESSAGES = metrics.gauge(
+    'bot_outbox_messages', 'Сообщения в очереди outbox по состояниям.', ('state',)
+)
+
+DB_POOL_CONNECTIONS = metrics.gauge(
+    'bot_db_pool_connections', 'Соединения пула базы данных (size, idle, max).', ('state',)
+)
+
+
+def instrument_methods(cls, histogram: Histogram, exclude=()):
+    """
+    Оборачивает публичные асинхронные методы класса (и асинхронные генераторы)
+    измерением времени в histogram с меткой method.
+    """
+    for name, func in list(vars(cls).items()):
+        if name.startswith('_') or name in exclude:
+            continue
+        if inspect.isasyncgenfunction(func):
+            setattr(cls, name, _timed_generator(func, histogram, name))
+        elif inspect.iscoroutinefunction(func):
+            setattr(cls, name, _timed(func, histogram, name))
+
+
+def _timed(func, histogram: Histogram, name: str):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started, method=name)
+    return wrapper
+
+
+def _timed_generator(func, histogram: Histogram, name: str):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            async for item in func(*args, **kwargs):
+                yield item
+        finally:
+            histogram.observe(time.perf_counter() - started, method=name)
+    return wrapper
+
+
+def watch_scheduler(scheduler):
+    """
+    Считает пропущенные запуски задач планировщика (misfire).
+    """
+    def on_missed(event):
+        JOB_MISFIRES.inc(job=event.job_id)
+    scheduler.add_listener(on_missed, EVENT_JOB_MISSED)
+
+
+def dispatcher_commands(dp):
+    """
+    Команды, для которых в диспетчере зарегистрированы обработчики сообщений.
+    """
+    commands = set()
+    for handler in dp.message_handlers.handlers:
+        for filter_obj in handler.filters or ():
+            commands.update(getattr(filter_obj.filter, 'commands', None) or ())
+    return commands
+
+
+# Имя обработчика, действие и время начала текущей обработки
+_handler_started = ContextVar('metrics_handler_started', default=None)
+
+# Значение метки action для незарегистрированных команд и callback_data
+OTHER_ACTION = 'other'
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self):
+        super().__init__()
+        # Допустимые значения метки action; пустая строка — сообщение без команды
+        self._actions = {''}
+
+    def register_actions(self, *actions):
+        """
+        Добавляет действия (команды и callback_data без числовых частей) в набор значений метки action.
+        """
+        self._actions.update(actions)
+
+    def _action(self, event):
+        data = getattr(event, 'data', None)
+        if isinstance(data, str):
+            # Числовые части (номер страницы, Telegram ID, код статуса) не входят в действие
+            action = re.sub(r'_-?\d+(?=_|$)', '', data)
+        else:
+            get_command = getattr(event, 'get_command', None)
+            action = (get_command(pure=True) or '') if get_command else ''
+        # Произвольные команды и callback_data не должны порождать новые временные ряды
+        return action if action in self._actions else OTHER_ACTION
+
+    def _start(self, event):
+        handler = current_handler.get(None)
+        name = getattr(handler, '__name__', 'unknown')
+        _handler_started.set((name, self._action(event), time.perf_counter()))
+
+    def _finish(self):
+        started = _handler_started.get()
+        if started is None:
+            return
+        _handler_started.set(None)
+        name, action, started_at = started
+        HANDLER_SECONDS.observe(time.perf_counter() - started_at, handler=name, action=action)
+
+    async def on_process_message(self, message, data: dict):
+        self._start(message)
+
+    async def on_post_process_message(self, message, results, data: dict):
+        self._finish()
+
+    async def on_process_callback_query(self, callback_query, data: dict):
+        self._start(callback_query)
+
+    async def on_post_process_callback_query(self, callback_query, results, data: dict):
+        self._finish()
+
+    async def on_process_inline_query(self, inline_query, data: dict):
+        self._start(inline_query)
+
+    async def on_post_process_inline_query(self, inline_query, results, data: dict):
+        self._finish()
+
+
+handler_metrics = HandlerMetricsMiddleware()
+
+
+class MetricsServer:
+    def __init__(self, registry: Registry):
+        self.registry = registry
+        self._runner = None
+
+    async def handle(self, request: web.Request):
+        body = await self.registry.render()
+        return web.Response(body=body.encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self, host: str, port: int):
+        app = web.Application()
+        app.router.add_get(config.METRICS_PATH, self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info(f"Метрики доступны на http://{host}:{port}{config.METRICS_PATH}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer(metrics)
@@ -0,0 +1,331 @@
+'''
+Пояснения по коду:
+
+Версионные миграции схемы базы данных:
+
+Каждая миграция — асинхронная функция, получающая объект Operations, и запись в списке MIGRATIONS
+с номером версии и названием. Номера версий только растут; уже примененную миграцию изменять нельзя,
+изменения схемы добавляются новой миграцией в конец списка.
+
+Таблица schema_migrations:
+version — номер примененной миграции, первичный ключ.
+name — название миграции.
+applied_at — время применения (UTC).
+
+Функция run_migrations:
+
+Вызывается при подключении к базе данных (Database.connect) вместо metadata.create_all.
+Читает список уже примененных версий и выполняет только новые миграции, каждую в своей транзакции,
+поэтому повторный запуск на актуальной базе стоит одного запроса.
+
+Миграции описывают таблицы собственными "снимками" схемы, а не таблицами из db.py,
+чтобы старые миграции не менялись при последующем изменении моделей.
+Поддерживаются SQLite, PostgreSQL и MySQL.
+'''
+# migrations.py
+import logging
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Text, Boolean, Date, DateTime, MetaData, Table, Index,
+    select, text, true
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.schema import CreateTable, CreateIndex, DDLElement
+
+migrations_metadata = MetaData()
+
+# Таблица учета примененных миграций
+schema_migrations = Table(
+    'schema_migrations', migrations_metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class Operations:
+    """
+    Обертка над подключением databases для выполнения DDL и проверки состояния схемы.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.dialect = database.url.dialect
+        if self.dialect == 'sqlite':
+            self.sa_dialect = sqlite.dialect()
+        elif self.dialect == 'mysql':
+            self.sa_dialect = mysql.dialect()
+        else:
+            self.sa_dialect = postgresql.dialect()
+
+    async def execute(self, statement):
+        # DDL компилируется в строку заранее: databases не умеет компилировать CREATE INDEX
+        if isinstance(statement, DDLElement):
+            statement = str(statement.compile(dialect=self.sa_dialect))
+        if isinstance(statement, str):
+            statement = text(statement)
+        await self.database.execute(statement)
+
+    async def has_table(self, name: str):
+        if self.dialect == 'sqlite':
+            query = "SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"
+        elif self.dialect == 'mysql':
+            query = (
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            )
+        else:
+            query = (
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = current_schema() AND table_name = :name"
+            )
+        return await self.database.fetch_one(query=query, values={'name': name}) is not None
+
+    async def has_index(self, name: str):
+        if self.dialect == 'sqlite':
+            query = "SELECT name FROM sqlite_master WHERE type = 'index' AND name = :name"
+        elif self.dialect == 'mysql':
+            query = (
+                "SELECT index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND index_name = :name"
+            )
+        else:
+            query = (
+                "SELECT indexname FROM pg_indexes "
+                "WHERE schemaname = current_schema() AND indexname = :name"
+            )
+        return await self.database.fetch_one(query=query, values={'name': name}) is not None
+
+    async def create_table(self, table: Table):
+        if not await self.has_table(table.name):
+            await self.execute(CreateTable(table))
+
+    async def create_index(self, index: Index):
+        if not await self.has_index(index.name):
+            await self.execute(CreateIndex(index))
+
+
+async def initial_schema(op: Operations):
+    """
+    Таблицы users и statuses (на уже существующей базе, созданной create_all, ничего не меняет).
+    """
+    meta = MetaData()
+    await op.create_table(Table(
+        'users', meta,
+        Column('telegram_id', Integer, primary_key=True),
+        Column('full_name', String, nullable=False),
+        Column('is_admin', Boolean, default=False),
+    ))
+    await op.create_table(Table(
+        'statuses', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('telegram_id', Integer, nullable=False),
+        Column('status', String, nullable=False),
+        Column('description', String, nullable=True),
+        Column('date', Date, nullable=False),
+    ))
+
+
+async def unique_status_per_day(op: Operations):
+    """
+    Уникальный индекс statuses (telegram_id, date). Он же используется запросами
+    по пользователю и дате (get_status, upsert). Перед созданием удаляются дубликаты,
+    остается последняя запись за день.
+    """
+    meta = MetaData()
+    statuses = Table(
+        'statuses', meta,
+        Column('telegram_id', Integer),
+        Column('date', Date),
+    )
+    index = Index(
+        'uq_statuses_telegram_id_date', statuses.c.telegram_id, statuses.c.date, unique=True
+    )
+    if await op.has_index(index.name):
+        return
+    await op.execute(
+        "DELETE FROM statuses WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MAX(id) AS id FROM statuses "
+        "GROUP BY telegram_id, date) AS latest)"
+    )
+    await op.execute(CreateIndex(index))
+
+
+async def report_indexes(op: Operations):
+    """
+    Индекс statuses (date) для отчетов за дату и период и частичный индекс
+    users (is_admin) для выборки администраторов (в MySQL — обычный индекс).
+    """
+    meta = MetaData()
+    statuses = Table('statuses', meta, Column('date', Date))
+    users = Table('users', meta, Column('is_admin', Boolean))
+    await op.create_index(Index('ix_statuses_date', statuses.c.date))
+    await op.create_index(Index(
+        'ix_users_is_admin', users.c.is_admin,
+        sqlite_where=users.c.is_admin == true(),
+        postgresql_where=users.c.is_admin == true(),
+    ))
+
+
+async def outbox_table(op: Operations):
+    """
+    Таблица исходящих сообщений (outbox) с уникальным ключом идемпотентности
+    и индексом для выборки сообщений, готовых к отправке.
+    """
+    meta = MetaData()
+    outbox = Table(
+        'outbox', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('idempotency_key', String(255), nullable=False),
+        Column('chat_id', BigInteger, nullable=False),
+        Column('text', Text, nullable=False),
+        Column('reply_markup', Text, nullable=True),
+        Column('parse_mode', String(16), nullable=True),
+        Column('state', String(16), nullable=False),
+        Column('attempts', Integer, nullable=False, default=0),
+        Column('next_attempt_at', DateTime, nullable=False),
+        Column('claimed_by', String(64), nullable=True),
+        Column('created_at', DateTime, nullable=False),
+        Column('last_error', Text, nullable=True),
+    )
+    await op.create_table(outbox)
+    await op.create_index(Index(
+        'uq_outbox_idempotency_key', outbox.c.idempotency_key, unique=True
+    ))
+    await op.create_index(Index(
+        'ix_outbox_state_next_attempt_at', outbox.c.state, outbox.c.next_attempt_at
+    ))
+
+
+async def fsm_states_table(op: Operations):
+    """
+    Таблица состояний FSM с индексом для удаления брошенных состояний.
+    """
+    meta = MetaData()
+    fsm_states = Table(
+        'fsm_states', meta,
+        Column('chat_id', BigInteger, primary_key=True, autoincrement=False),
+        Column('user_id', BigInteger, primary_key=True, autoincrement=False),
+        Column('state', String(255), nullable=True),
+        Column('data', Text, nullable=False),
+        Column('bucket', Text, nullable=False),
+        Column('updated_at', DateTime, nullable=False),
+    )
+    await op.create_table(fsm_states)
+    await op.create_index(Index('ix_fsm_states_updated_at', fsm_states.c.updated_at))
+
+
+async def cluster_tables(op: Operations):
+    """
+    Таблицы для работы нескольких процессов: аренды (выбор ведущего планировщика)
+    и запуски плановых задач (не более одного запуска задачи за период).
+    """
+    meta = MetaData()
+    leases = Table(
+        'leases', meta,
+        Column('name', String(64), primary_key=True),
+        Column('holder', String(128), nullable=False),
+        Column('expires_at', DateTime, nullable=False),
+    )
+    job_runs = Table(
+        'job_runs', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('job_id', String(64), nullable=False),
+        Column('run_key', String(64), nullable=False),
+        Column('holder', String(128), nullable=False),
+        Column('started_at', DateTime, nullable=False),
+        Column('finished_at', DateTime, nullable=True),
+    )
+    await op.create_table(leases)
+    await op.create_table(job_runs)
+    await op.create_index(Index(
+        'uq_job_runs_job_id_run_key', job_runs.c.job_id, job_runs.c.run_key, unique=True
+    ))
+
+
+async def users_full_name_index(op: Operations):
+    """
+    Индекс users (full_name, telegram_id) для постраничного вывода сотрудников по ФИО.
+    """
+    meta = MetaData()
+    users = Table('users', meta, Column('telegram_id', Integer), Column('full_name', String))
+    await op.create_index(Index(
+        'ix_users_full_name', users.c.full_name, users.c.telegram_id,
+        mysql_length={'full_name': 255}
+    ))
+
+
+async def status_intervals_table(op: Operations):
+    """
+    Таблица многодневных статусов (больничный, отпуск) с индексом для поиска
+    интервалов, действующих на дату.
+    """
+    meta = MetaData()
+    status_intervals = Table(
+        'status_intervals', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('telegram_id', BigInteger, nullable=False),
+        Column('status', String(64), nullable=False),
+        Column('start_date', Date, nullable=False),
+        Column('end_date', Date, nullable=False),
+    )
+    await op.create_table(status_intervals)
+    await op.create_index(Index(
+        'ix_status_intervals_end_date_start_date',
+        status_intervals.c.end_date, status_intervals.c.start_date
+    ))
+    await op.create_index(Index(
+        'ix_status_intervals_telegram_id', status_intervals.c.telegram_id
+    ))
+
+
+async def settings_table(op: Operations):
+    """
+    Таблица настроек, общих для всех процессов бота.
+    """
+    meta = MetaData()
+    settings = Table(
+        'settings', meta,
+        Column('name', String(64), primary_key=True),
+        Column('value', Text, nullable=False),
+        Column('updated_at', DateTime, nullable=False),
+    )
+    await op.create_table(settings)
+
+
+# Список миграций: (версия, название, функция)
+MIGRATIONS = [
+    (1, 'initial schema', initial_schema),
+    (2, 'unique status per user and day', unique_status_per_day),
+    (3, 'report indexes', report_indexes),
+    (4, 'outbox', outbox_table),
+    (5, 'fsm states', fsm_states_table),
+    (6, 'cluster leases and job runs', cluster_tables),
+    (7, 'users full name index', users_full_name_index),
+    (8, 'status intervals', status_intervals_table),
+    (9, 'settings', settings_table),
+]
+
+
+async def run_migrations(database):
+    """
+    Применяет к базе все еще не примененные миграции по порядку версий.
+    """
+    op = Operations(database)
+    await op.create_table(schema_migrations)
+    applied = {
+        row['version'] for row in await database.fetch_all(
+            select(schema_migrations.c.version)
+        )
+    }
+    for version, name, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        logging.info(f"Применение миграции {version}: {name}")
+        async with database.transaction():
+            await migration(op)
+            await database.execute(schema_migrations.insert().values(
+                version=version,
+                name=name,
+                applied_at=datetime.utcnow()
+            ))
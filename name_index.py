@@ -0,0 +1,64 @@
+'''
+Пояснения по коду:
+
+Поиск сотрудников по началу ФИО (inline-режим бота в панели администратора):
+
+NameIndex хранит отсортированный список ключей "слово ФИО в нижнем регистре → сотрудник",
+по ключу на каждое слово (фамилия, имя, отчество).
+Поиск по префиксу — два двоичных поиска (bisect) по списку, без перебора всех сотрудников,
+поэтому среди тысяч сотрудников нужный находится за микросекунды.
+Запрос из нескольких слов ("иван пет") ищется по самому длинному слову, а остальные слова
+проверяются среди найденных: каждое должно быть началом какого-либо слова ФИО.
+
+Индекс строится из Database.get_all_users и перестраивается, только когда этот список
+изменился (добавление, удаление сотрудника или истечение кэша пользователей).
+'''
+# name_index.py
+from bisect import bisect_left, bisect_right
+
+
+class NameIndex:
+    def __init__(self):
+        self.keys = []
+        self.entries = []
+        self._users = None
+
+    def build(self, users):
+        """
+        Строит индекс по списку пользователей.
+        """
+        pairs = []
+        for user in users:
+            full_name = user['full_name']
+            entry = (user['telegram_id'], full_name)
+            pairs.extend((word, entry) for word in set(full_name.lower().split()))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.entries = [entry for _, entry in pairs]
+        self._users = users
+
+    async def search(self, db, prefix: str, limit: int):
+        """
+        Возвращает до limit сотрудников (telegram_id, full_name), у которых каждое слово
+        запроса — начало одного из слов ФИО, упорядоченных по ФИО.
+        """
+        users = await db.get_all_users()
+        if users is not self._users:
+            self.build(users)
+        words = prefix.lower().split()
+        if not words:
+            return []
+        longest = max(words, key=len)
+        start = bisect_left(self.keys, longest)
+        end = bisect_right(self.keys, longest + '\uffff')
+        found = {}
+        for entry in self.entries[start:end]:
+            if entry[0] in found:
+                continue
+            name_words = entry[1].lower().split()
+            if all(any(word.startswith(query) for word in name_words) for query in words):
+                found[entry[0]] = entry
+        return sorted(found.values(), key=lambda entry: (entry[1], entry[0]))[:limit]
+
+
+name_index = NameIndex()
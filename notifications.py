@@ -0,0 +1,76 @@
+'''
+Пояснения по коду:
+
+Сводные уведомления администраторов (дайджест):
+
+Вместо отдельного сообщения каждому администратору на каждое событие
+(сотрудник не ответил, сотрудник выбрал статус "Другое" и т.п.) события копятся
+в AdminDigest в течение окна config.ADMIN_DIGEST_WINDOW секунд после первого события,
+а затем отправляются всем администраторам одним сообщением.
+Если текст дайджеста больше лимита Telegram, он делится на несколько сообщений
+по границам строк (broadcast.split_text).
+
+Дайджест не отправляется напрямую, а ставится в очередь outbox (вид "admin_digest"),
+поэтому на него распространяются повторы при временных ошибках и лимиты отправки,
+а дайджест, поставленный в очередь перед остановкой бота, отправляется после запуска.
+Каждая часть каждого дайджеста получает свой вид admin_digest:<номер дайджеста>:<номер части>,
+чтобы ключ идемпотентности "пользователь:день:вид" не склеивал разные дайджесты одного дня.
+
+Плановые задачи, которые порождают много событий сразу (check_unanswered_statuses),
+вызывают flush в конце работы, чтобы администраторы получили дайджест без ожидания окна.
+'''
+# notifications.py
+import asyncio
+import logging
+import uuid
+from datetime import date
+import config
+from broadcast import split_text
+from outbox import outbox
+
+
+class AdminDigest:
+    def __init__(self, window: float):
+        self.window = window
+        self.events = []
+        self._db = None
+        self._task = None
+
+    def add(self, db, text: str):
+        """
+        Добавляет событие в дайджест и при необходимости планирует его отправку.
+        """
+        self._db = db
+        self.events.append(text)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Не удалось отправить дайджест администраторам: {e}")
+
+    async def flush(self):
+        """
+        Немедленно ставит накопленные события в очередь outbox для всех администраторов.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        events, self.events = self.events, []
+        if not events:
+            return
+        admins = await self._db.get_admins()
+        admin_ids = [admin['telegram_id'] for admin in admins]
+        header = "Уведомления:" if len(events) > 1 else ""
+        text = "\n".join([header] + events if header else events)
+        digest_id = uuid.uuid4().hex[:8]
+        for number, chunk in enumerate(split_text(text), 1):
+            await outbox.enqueue(admin_ids, chunk, f"admin_digest:{digest_id}:{number}", date.today(),
+                                 parse_mode='Markdown')
+
+
+admin_digest = AdminDigest(config.ADMIN_DIGEST_WINDOW)
@@ -0,0 +1,188 @@
+'''
+Пояснения по коду:
+
+Надежная отправка сообщений через таблицу outbox:
+
+Плановые задачи и массовые рассылки не отправляют сообщения сами, а только ставят их
+в очередь (enqueue) и сразу завершаются. Каждое сообщение получает ключ идемпотентности
+"пользователь:день:вид", поэтому повторный запуск задачи (например, после перезапуска бота
+посреди рассылки) не приводит к повторной отправке уже поставленных сообщений.
+
+Фоновые обработчики (OutboxWorkers, config.OUTBOX_WORKERS задач):
+
+Забирают сообщения пакетами по config.OUTBOX_BATCH_SIZE (Database.claim_outbox_batch)
+и отправляют их через движок рассылки (broadcast.send_one) с учетом лимитов Telegram.
+Отправленные и заблокированные сообщения отмечаются одним запросом на пакет.
+Сообщения с постоянной ошибкой (BadRequest: неверная разметка, слишком длинный текст и т.п.)
+сразу помечаются как неотправленные, не расходуя лимит отправки на повторы.
+Сообщения с временной ошибкой (сеть, RetryAfter, ошибка сервера Telegram)
+возвращаются в очередь с экспоненциальной задержкой
+(config.OUTBOX_RETRY_DELAY × 2^попытка), после config.OUTBOX_MAX_ATTEMPTS попыток
+сообщение помечается как неотправленное.
+Если процесс завершился во время отправки, аренда сообщений истекает через
+config.OUTBOX_LEASE секунд, и они отправляются после запуска.
+
+Счетчики (OutboxWorkers.stats): отправлено, заблокировано, не отправлено, повторов
+и средняя скорость отправки. Количество сообщений в очереди по состояниям отдается
+в метрике bot_outbox_messages (collect_metrics).
+'''
+# outbox.py
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import config
+from broadcast import send_one, SENT, BLOCKED, FAILED
+from db import OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_FAILED, OUTBOX_BLOCKED
+from metrics import OUTBOX_MESSAGES
+
+# Как долго хранятся обработанные сообщения в таблице outbox
+OUTBOX_RETENTION = timedelta(days=7)
+
+
+class OutboxWorkers:
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.counters = Counter()
+        self._bot = None
+        self._db = None
+        self._tasks = []
+        self._wakeup = None
+        self._semaphore = None
+        self._started_at = None
+
+    def setup(self, bot, db):
+        self._bot, self._db = bot, db
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(config.BROADCAST_CONCURRENCY)
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._purge()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """
+        Будит обработчики, не дожидаясь очередного опроса таблицы.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def enqueue(self, chat_ids, text: str, kind: str, day, reply_markup=None, parse_mode=None):
+        """
+        Ставит сообщение text в очередь для каждого чата из chat_ids.
+        kind — вид сообщения; вместе с чатом и днем образует ключ идемпотентности.
+        """
+        markup = reply_markup.as_json() if reply_markup is not None else None
+        messages = [
+            {
+                'idempotency_key': f"{chat_id}:{day}:{kind}",
+                'chat_id': chat_id,
+                'text': text,
+                'reply_markup': markup,
+                'parse_mode': parse_mode,
+            }
+            for chat_id in chat_ids
+        ]
+        await self._db.enqueue_messages(messages)
+        self.notify()
+        return len(messages)
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        stats = dict(self.counters)
+        stats['rate'] = round(self.counters['sent'] / elapsed, 2) if elapsed else 0.0
+        return stats
+
+    async def collect_metrics(self):
+        """
+        Обновляет метрику bot_outbox_messages (вызывается при запросе метрик).
+        """
+        counts = await self._db.outbox_stats()
+        for state in (OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_FAILED, OUTBOX_BLOCKED):
+            OUTBOX_MESSAGES.set(counts.get(state, 0), state=state)
+
+    async def _worker(self):
+        while True:
+            try:
+                batch = await self._db.claim_outbox_batch(self.batch_size, config.OUTBOX_LEASE)
+            except Exception as e:
+                logging.error(f"Не удалось получить сообщения из очереди: {e}")
+                batch = []
+            if not batch:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), config.OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                # Сообщения пакета будут отправлены повторно после истечения аренды
+                logging.error(f"Ошибка при обработке пакета сообщений: {e}")
+
+    async def _send(self, message):
+        async with self._semaphore:
+            kwargs = {}
+            if message['reply_markup']:
+                kwargs['reply_markup'] = message['reply_markup']
+            if message['parse_mode']:
+                kwargs['parse_mode'] = message['parse_mode']
+            # Повторы выполняет очередь с задержкой, не занимая обработчик
+            return await send_one(
+                self._bot, message['chat_id'], message['text'], retries=0, **kwargs
+            )
+
+    async def _send_batch(self, batch):
+        results = await asyncio.gather(*(self._send(message) for message in batch))
+        sent, blocked, failed = [], [], []
+        for message, result in zip(batch, results):
+            if result == SENT:
+                sent.append(message['id'])
+            elif result == BLOCKED:
+                blocked.append(message['id'])
+            elif result == FAILED:
+                # Постоянная ошибка: повторная отправка получит тот же ответ
+                failed.append(message['id'])
+                logging.error(f"Сообщение {message['idempotency_key']} не отправлено: ошибка запроса.")
+            else:
+                await self._retry(message)
+        await self._db.finish_outbox(sent, OUTBOX_SENT)
+        await self._db.finish_outbox(blocked, OUTBOX_BLOCKED)
+        await self._db.finish_outbox(failed, OUTBOX_FAILED)
+        self.counters['sent'] += len(sent)
+        self.counters['blocked'] += len(blocked)
+        self.counters['failed'] += len(failed)
+
+    async def _retry(self, message):
+        attempts = message['attempts'] + 1
+        if attempts >= config.OUTBOX_MAX_ATTEMPTS:
+            await self._db.finish_outbox([message['id']], OUTBOX_FAILED)
+            self.counters['failed'] += 1
+            logging.error(
+                f"Сообщение {message['idempotency_key']} не отправлено после {attempts} попыток."
+            )
+            return
+        delay = config.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+        await self._db.retry_outbox(message['id'], attempts, delay, "send failed")
+        self.counters['retried'] += 1
+
+    async def _purge(self):
+        while True:
+            try:
+                await self._db.purge_outbox(datetime.utcnow() - OUTBOX_RETENTION)
+            except Exception as e:
+                logging.error(f"Не удалось очистить очередь сообщений: {e}")
+            await asyncio.sleep(60 * 60)
+
+
+outbox = OutboxWorkers(config.OUTBOX_WORKERS, config.OUTBOX_BATCH_SIZE)
@@ -0,0 +1,77 @@
+'''
+Пояснения по коду:
+
+Исполнитель генерации отчетов:
+
+Формирование текста отчетов и книг Excel — синхронная работа, нагружающая процессор.
+Чтобы она не блокировала цикл событий, обслуживающий нажатия кнопок сотрудников,
+такие функции выполняются в отдельном пуле потоков (config.REPORT_WORKERS потоков)
+через ReportRenderer.run. На вход передаются уже полученные из базы строки,
+на выходе — готовый текст или записанный файл.
+
+Используется пул потоков, а не процессов: книга Excel пишется по частям одним объектом
+xlsxwriter, который нельзя передавать между процессами.
+
+Ограничение очереди:
+
+Каждый отчет, запрошенный администратором, занимает место в очереди (ReportRenderer.job).
+Если одновременно формируется config.REPORT_QUEUE_LIMIT отчетов, новый запрос
+отклоняется исключением RendererBusy, чтобы множество одновременных выгрузок
+не занимало все ресурсы бота.
+'''
+# rendering.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+import config
+
+
+class RendererBusy(Exception):
+    """
+    Очередь генерации отчетов заполнена.
+    """
+
+
+class ReportRenderer:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='report'
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Выполняет func(*args, **kwargs) в пуле потоков и возвращает результат.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def job(self):
+        """
+        Резервирует место в очереди отчетов на время формирования одного отчета.
+        """
+        if self.pending >= self.queue_limit:
+            raise RendererBusy()
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+renderer = ReportRenderer(config.REPORT_WORKERS, config.REPORT_QUEUE_LIMIT)
@@ -0,0 +1,75 @@
+'''
+Пояснения по коду:
+
+Отправка записанных обновлений Telegram на webhook-сервер бота (локальная проверка режима --webhook):
+
+python replay_updates.py updates.json [--url URL] [--concurrency N] [--repeat N]
+
+Файл содержит обновления в формате Bot API: JSON-массив или по одному объекту в строке.
+Каждое обновление отправляется POST-запросом с секретом config.WEBHOOK_SECRET в заголовке,
+номера update_id при повторах заменяются новыми. В конце выводится количество ответов
+по HTTP-кодам и время ответа сервера (медиана, 95-й процентиль, максимум).
+'''
+# replay_updates.py
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+import aiohttp
+import config
+from webhook import SECRET_HEADER
+
+
+def load_updates(path: str):
+    with open(path, encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+async def replay(url: str, updates, concurrency: int, repeat: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    codes = Counter()
+    latencies = []
+    headers = {SECRET_HEADER: config.WEBHOOK_SECRET}
+
+    async def post(session, update):
+        async with semaphore:
+            started = time.monotonic()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                codes[response.status] += 1
+            latencies.append(time.monotonic() - started)
+
+    async with aiohttp.ClientSession() as session:
+        started = time.monotonic()
+        jobs = []
+        for i in range(repeat):
+            for n, update in enumerate(updates):
+                jobs.append(post(session, dict(update, update_id=i * len(updates) + n + 1)))
+        await asyncio.gather(*jobs)
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    print(f"Отправлено {len(latencies)} обновлений за {elapsed:.2f} с.")
+    print("Коды ответов: " + ", ".join(f"{code}: {count}" for code, count in sorted(codes.items())))
+    if latencies:
+        print(
+            f"Время ответа: медиана {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+            f"95% {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс, "
+            f"максимум {latencies[-1] * 1000:.1f} мс."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка записанных обновлений на webhook-сервер")
+    parser.add_argument("path", help="файл с обновлениями (JSON-массив или JSON по строкам)")
+    parser.add_argument(
+        "--url", default=f"http://127.0.0.1:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(replay(args.url, load_updates(args.path), args.concurrency, args.repeat))
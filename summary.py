@@ -0,0 +1,83 @@
+'''
+Пояснения по коду:
+
+DailySummary — агрегат статусов сотрудников за один день:
+
+statuses — текущий статус и описание каждого ответившего пользователя.
+buckets — пользователи, сгруппированные по статусу (в порядке проставления).
+Количество сотрудников с каждым статусом — len(buckets[status]), без обхода всех записей.
+
+Агрегат поддерживается инкрементально классом Database:
+при каждой записи статуса (add_or_update_status, upsert_statuses) вызывается set,
+при массовой отметке "Не известно" — set_if_missing (уже выбранные статусы не меняются),
+при удалении пользователя — remove.
+
+Если агрегата за день еще нет в памяти, он строится из записей таблицы statuses
+(Database.rebuild_daily_summary), что также позволяет пересчитать любой прошедший день.
+Агрегат регистрируется до загрузки, поэтому записи во время загрузки попадают в него сразу.
+Статус из set новее данных из базы и при загрузке сохраняется. Статус из set_if_missing
+записывается в базу, только если у пользователя еще нет статуса, поэтому до окончания
+загрузки он считается предварительным и при загрузке заменяется статусом из базы.
+'''
+# summary.py
+import asyncio
+
+
+class DailySummary:
+    def __init__(self, date_):
+        self.date = date_
+        self.statuses = {}
+        self.buckets = {}
+        # Устанавливается после загрузки записей из базы данных
+        self.loaded = asyncio.Event()
+        # Пользователи со статусом из set_if_missing, записанным до окончания загрузки
+        self._tentative = set()
+
+    def set(self, telegram_id: int, status: str, description: str = None):
+        self._tentative.discard(telegram_id)
+        previous = self.statuses.get(telegram_id)
+        if previous is not None:
+            self.buckets[previous[0]].pop(telegram_id, None)
+        self.statuses[telegram_id] = (status, description)
+        self.buckets.setdefault(status, {})[telegram_id] = description
+
+    def set_if_missing(self, telegram_id: int, status: str, description: str = None):
+        if telegram_id not in self.statuses:
+            self.set(telegram_id, status, description)
+            if not self.loaded.is_set():
+                self._tentative.add(telegram_id)
+
+    def remove(self, telegram_id: int):
+        self._tentative.discard(telegram_id)
+        previous = self.statuses.pop(telegram_id, None)
+        if previous is not None:
+            self.buckets[previous[0]].pop(telegram_id, None)
+
+    def load(self, rows):
+        """
+        Заполняет агрегат записями из базы данных. Статусы, записанные через set после
+        начала загрузки, новее данных из базы и не перезаписываются; предварительные
+        статусы из set_if_missing заменяются статусом из базы.
+        """
+        for row in rows:
+            if row['telegram_id'] in self._tentative:
+                self.set(row['telegram_id'], row['status'], row['description'])
+            else:
+                self.set_if_missing(row['telegram_id'], row['status'], row['description'])
+        self._tentative.clear()
+        self.loaded.set()
+
+    def count(self, status: str):
+        return len(self.buckets.get(status, ()))
+
+    def members(self, status: str):
+        """
+        Возвращает Telegram ID пользователей с указанным статусом.
+        """
+        return list(self.buckets.get(status, ()))
+
+    def get(self, telegram_id: int):
+        """
+        Возвращает (статус, описание) пользователя или None, если он еще не ответил.
+        """
+        return self.statuses.get(telegram_id)
@@ -0,0 +1,164 @@
+'''
+Пояснения по коду:
+
+Промежуточный обработчик (middleware) обновлений: порядок, ограничение частоты и защита от наплыва.
+
+Порядок обработки:
+
+Обновления одного пользователя обрабатываются строго по очереди (asyncio.Lock на пользователя),
+поэтому, например, выбор статуса и ввод описания "Другое" не перемешиваются.
+Обновления разных пользователей обрабатываются параллельно.
+
+Ограничение частоты (token bucket):
+
+У каждого пользователя есть "ведро" на config.THROTTLE_BURST запросов, которое пополняется
+со скоростью config.THROTTLE_RATE запросов в секунду. Обновление без свободного запроса
+отбрасывается; пользователь один раз получает предупреждение, нажатие кнопки получает
+всплывающий ответ.
+
+Объединение повторных нажатий:
+
+Если нажатие той же кнопки (тот же callback_data) еще ожидает обработки или обрабатывается,
+повторное нажатие отбрасывается — в базу пишется один статус вместо десяти.
+
+Ограничение очереди:
+
+У пользователя не может быть больше config.THROTTLE_MAX_PENDING ожидающих обновлений;
+остальные отбрасываются, поэтому при утреннем наплыве очередь не растет без ограничений.
+
+Счетчики (UpdateThrottlingMiddleware.stats): обработано, отброшено по частоте,
+объединено, отброшено из-за переполнения очереди.
+
+Ограничение: блокировки, ведра и очереди хранятся в памяти процесса. В режиме
+main.py --workers N (SO_REUSEPORT) каждый процесс ограничивает только те обновления,
+которые получил сам, поэтому общий предел для пользователя может быть до N раз выше,
+а порядок обновлений одного пользователя в разных процессах не гарантируется (см. cluster.py).
+'''
+# throttling.py
+import asyncio
+import logging
+import time
+from collections import Counter
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.utils.exceptions import TelegramAPIError
+import config
+
+THROTTLED_TEXT = "Слишком много запросов. Пожалуйста, подождите немного."
+
+# Как часто удаляются состояния неактивных пользователей, в секундах
+PRUNE_INTERVAL = 60
+
+
+class UserState:
+    def __init__(self, burst: int):
+        self.lock = asyncio.Lock()
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.pending = 0
+        # callback_data нажатий, которые ожидают обработки или обрабатываются
+        self.callbacks = set()
+        self.warned = False
+
+
+class UpdateThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, rate: float, burst: int, max_pending: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_pending = max_pending
+        self.users = {}
+        self.counters = Counter()
+        self._last_prune = time.monotonic()
+
+    @staticmethod
+    def _user_id(update: types.Update):
+        for event in (
+            update.message, update.edited_message, update.callback_query, update.inline_query
+        ):
+            if event is not None and event.from_user is not None:
+                return event.from_user.id
+        return None
+
+    def _take_token(self, user: UserState):
+        now = time.monotonic()
+        user.tokens = min(self.burst, user.tokens + (now - user.updated_at) * self.rate)
+        user.updated_at = now
+        if user.tokens < 1:
+            return False
+        user.tokens -= 1
+        user.warned = False
+        return True
+
+    def _prune(self):
+        # Ведро неактивного пользователя уже полное, его состояние можно не хранить
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        idle = self.burst / self.rate
+        for user_id, user in list(self.users.items()):
+            if not user.pending and now - user.updated_at > idle:
+                del self.users[user_id]
+
+    async def _reject(self, update: types.Update, user: UserState, counter: str):
+        self.counters[counter] += 1
+        try:
+            if update.callback_query is not None:
+                await update.callback_query.answer(THROTTLED_TEXT if counter != 'coalesced' else None)
+            elif update.message is not None and not user.warned:
+                user.warned = True
+                await update.message.reply(THROTTLED_TEXT)
+        except TelegramAPIError as e:
+            logging.warning(f"Не удалось ответить на отброшенное обновление: {e}")
+        raise CancelHandler()
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        user_id = self._user_id(update)
+        if user_id is None:
+            return
+        self._prune()
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserState(self.burst)
+
+        callback_data = update.callback_query.data if update.callback_query else None
+        if callback_data is not None and callback_data in user.callbacks:
+            await self._reject(update, user, 'coalesced')
+        if user.pending >= self.max_pending:
+            await self._reject(update, user, 'overflow')
+        if not self._take_token(user):
+            await self._reject(update, user, 'throttled')
+
+        user.pending += 1
+        if callback_data is not None:
+            user.callbacks.add(callback_data)
+        try:
+            await user.lock.acquire()
+        except BaseException:
+            user.pending -= 1
+            user.callbacks.discard(callback_data)
+            raise
+        data['throttling_user'] = (user, callback_data)
+
+    async def on_post_process_update(self, update: types.Update, results, data: dict):
+        state = data.get('throttling_user')
+        if state is None:
+            return
+        user, callback_data = state
+        user.lock.release()
+        user.pending -= 1
+        user.callbacks.discard(callback_data)
+        self.counters['processed'] += 1
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['users'] = len(self.users)
+        stats['pending'] = sum(user.pending for user in self.users.values())
+        return stats
+
+
+throttling = UpdateThrottlingMiddleware(
+    config.THROTTLE_RATE, config.THROTTLE_BURST, config.THROTTLE_MAX_PENDING
+)
@@ -0,0 +1,218 @@
+'''
+Пояснения по коду:
+
+Трассировка запросов к базе данных (включается и выключается из панели администратора):
+
+QueryTracer оборачивает методы подключения databases.Database (execute, fetch_all и т.д.)
+и, пока трассировка включена, для каждого запроса определяет текст SQL, форму параметров
+(имена и типы значений, для execute_many — число строк), длительность и место вызова
+(метод Database и вызвавшая его функция).
+
+Группировка по обновлениям и задачам:
+
+Запросы относятся к трассе текущего обновления Telegram (TracingMiddleware)
+или плановой задачи (cluster.run_once). Трасса хранится в контекстной переменной,
+поэтому запросы параллельно обрабатываемых обновлений не смешиваются.
+
+Что попадает в лог:
+
+Запрос дольше config.TRACE_SLOW_QUERY секунд — сразу, с текстом, параметрами и местом вызова.
+По завершении трассы — каждый запрос, выполненный в ней не менее config.TRACE_REPEAT_THRESHOLD
+раз (признак N+1: запрос в цикле по сотрудникам вместо одного запроса на всех).
+Последние предупреждения и счетчики доступны в QueryTracer.stats (команда /bot_stats).
+
+Трассировка выключена по умолчанию (config.TRACE_QUERIES); в выключенном состоянии
+обертки только проверяют флаг. Переключение действует на процесс, обработавший нажатие.
+'''
+# tracing.py
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from aiogram import types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+import config
+
+# Файлы, кадры которых пропускаются при поиске места вызова
+_SKIP_FILES = (__file__, os.path.join('databases', ''), 'metrics.py', 'contextlib.py')
+
+# Сколько последних предупреждений хранится для /bot_stats
+RECENT_WARNINGS = 10
+
+# Максимальная длина текста SQL в логе
+SQL_LOG_LIMIT = 300
+
+_current_trace = ContextVar('query_trace', default=None)
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.queries = 0
+        self.duration = 0.0
+        self.counts = Counter()
+        self.callers = {}
+
+
+class QueryTracer:
+    METHODS = ('execute', 'execute_many', 'fetch_all', 'fetch_one', 'fetch_val', 'iterate')
+
+    def __init__(self, enabled: bool, slow_query: float, repeat_threshold: int):
+        self.enabled = enabled
+        self.slow_query = slow_query
+        self.repeat_threshold = repeat_threshold
+        self.counters = Counter()
+        self.warnings = deque(maxlen=RECENT_WARNINGS)
+
+    def install(self, database):
+        """
+        Оборачивает методы выполнения запросов подключения databases.Database.
+        """
+        for name in self.METHODS:
+            method = getattr(database, name)
+            wrapper = self._wrap_iterate(method) if name == 'iterate' else self._wrap(method, name)
+            setattr(database, name, wrapper)
+
+    def _wrap(self, method, name: str):
+        async def wrapper(query, *args, **kwargs):
+            if not self.enabled:
+                return await method(query, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await method(query, *args, **kwargs)
+            finally:
+                values = args[0] if args else kwargs.get('values')
+                self._record(query, values, name, time.perf_counter() - started)
+        return wrapper
+
+    def _wrap_iterate(self, method):
+        async def wrapper(query, *args, **kwargs):
+            if not self.enabled:
+                async for row in method(query, *args, **kwargs):
+                    yield row
+                return
+            started = time.perf_counter()
+            try:
+                async for row in method(query, *args, **kwargs):
+                    yield row
+            finally:
+                values = args[0] if args else kwargs.get('values')
+                self._record(query, values, 'iterate', time.perf_counter() - started)
+        return wrapper
+
+    # Описание запроса
+
+    @staticmethod
+    def _sql(query):
+        return ' '.join(str(query).split())
+
+    @staticmethod
+    def _shape(query, values, method: str):
+        def describe(params):
+            items = [f"{key}:{type(value).__name__}" for key, value in list(params.items())[:6]]
+            if len(params) > 6:
+                items.append(f"... всего {len(params)}")
+            return "(" + ", ".join(items) + ")"
+
+        if method == 'execute_many':
+            values = values or []
+            return f"{len(values)} строк × {describe(values[0]) if values else '()'}"
+        if values:
+            return describe(values)
+        try:
+            return describe(query.compile().params)
+        except AttributeError:
+            return "()"
+
+    @staticmethod
+    def _caller():
+        frames = []
+        frame = sys._getframe(2)
+        while frame is not None and len(frames) < 2:
+            filename = frame.f_code.co_filename
+            if not any(part in filename for part in _SKIP_FILES):
+                frames.append(f"{os.path.basename(filename)[:-3]}.{frame.f_code.co_name}")
+            frame = frame.f_back
+        return " ← ".join(frames) or "неизвестно"
+
+    def _record(self, query, values, method: str, duration: float):
+        sql = self._sql(query)
+        trace = _current_trace.get()
+        self.counters['queries'] += 1
+        if trace is not None:
+            trace.queries += 1
+            trace.duration += duration
+            trace.counts[sql] += 1
+            if sql not in trace.callers:
+                trace.callers[sql] = self._caller()
+        if duration >= self.slow_query:
+            self.counters['slow'] += 1
+            message = (
+                f"Медленный запрос {duration * 1000:.1f} мс ({trace.name if trace else 'вне трассы'}, "
+                f"{self._caller()}): {sql[:SQL_LOG_LIMIT]} {self._shape(query, values, method)}"
+            )
+            self.warnings.append(message)
+            logging.warning(message)
+
+    # Трассы
+
+    def start(self, name: str):
+        """
+        Начинает трассу name в текущем контексте; возвращает токен для finish.
+        """
+        if not self.enabled:
+            return None
+        return _current_trace.set(Trace(name))
+
+    def finish(self, token):
+        if token is None:
+            return
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        if trace is None or not trace.queries:
+            return
+        self.counters['traces'] += 1
+        for sql, count in trace.counts.items():
+            if count >= self.repeat_threshold:
+                self.counters['repeated'] += 1
+                message = (
+                    f"Возможный N+1 в {trace.name}: запрос выполнен {count} раз "
+                    f"({trace.callers[sql]}): {sql[:SQL_LOG_LIMIT]}"
+                )
+                self.warnings.append(message)
+                logging.warning(message)
+        logging.debug(
+            f"Трасса {trace.name}: {trace.queries} запросов, {trace.duration * 1000:.1f} мс в базе."
+        )
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['enabled'] = self.enabled
+        return stats
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Открывает трассу на время обработки каждого обновления.
+    """
+
+    @staticmethod
+    def _name(update: types.Update):
+        if update.callback_query is not None:
+            return f"update {update.update_id} (callback {update.callback_query.data})"
+        if update.message is not None:
+            command = update.message.get_command()
+            return f"update {update.update_id} (message{' ' + command if command else ''})"
+        return f"update {update.update_id}"
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        data['query_trace'] = tracer.start(self._name(update))
+
+    async def on_post_process_update(self, update: types.Update, results, data: dict):
+        tracer.finish(data.get('query_trace'))
+
+
+tracer = QueryTracer(config.TRACE_QUERIES, config.TRACE_SLOW_QUERY, config.TRACE_REPEAT_THRESHOLD)
+tracing_middleware = TracingMiddleware()
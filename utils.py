@@ -4,16 +4,30 @@
 is_admin декоратор:
 
 Проверяет, является ли пользователь администратором, перед выполнением обработчика.
-Если пользователь не администратор, отправляет сообщение о недостаточности прав.
+Если пользователь не администратор, отправляет сообщение о недостаточности прав
+(для нажатия кнопки — всплывающее уведомление).
 format_status_report функция:
 
 Форматирует текстовый отчет по статусам сотрудников.
 Используется для отправки отчета администраторам.
 При необходимости добавляет пояснение к статусу "Другое".
+format_daily_report функция:
+
+Форматирует ежедневный отчет (количество и имена по статусам) из агрегата статусов за день.
+Функции форматирования не обращаются к базе данных и выполняются в пуле потоков (rendering.py).
 notify_admins функция:
 
-Отправляет указанное сообщение всем администраторам.
+Добавляет сообщение в сводный дайджест для всех администраторов (notifications.py).
+Дайджест отправляется с разметкой Markdown, поэтому введенные пользователями ФИО и пояснения
+вставляются в текст через escape_markdown и markdown_mention: один символ _ или * в имени
+иначе сделал бы недоставляемым весь дайджест.
+flush_admin_notifications немедленно ставит накопленный дайджест в очередь outbox.
 Используется для уведомления администраторов о неответивших сотрудниках и других событиях.
+send_long_text и reply_long_text функции:
+
+Отправляют длинный отчет несколькими сообщениями не длиннее лимита Telegram (4096 символов),
+разделяя текст по границам строк, а если сообщений больше config.REPORT_MAX_PAGES — одним текстовым файлом.
+Отчеты собираются списком строк и объединяются одним join.
 get_user_full_name функция:
 
 Получает полное имя пользователя по его Telegram ID.
@@ -39,11 +53,15 @@ Database из файла db.py для взаимодействия с базой
 '''
 
 # utils.py
+import io
+import re
 from functools import wraps
 from aiogram import types
+from aiogram.types import InputFile
+import config
 from db import Database
-from aiogram.utils.exceptions import ChatNotFound
-import logging
+from notifications import admin_digest
+from broadcast import limiter, split_text
 
 def is_admin(db: Database):
     """
@@ -55,6 +73,8 @@ def is_admin(db: Database):
             user = await db.get_user(message.from_user.id)
             if user and user['is_admin']:
                 return await handler(message, *args, **kwargs)
+            elif isinstance(message, types.CallbackQuery):
+                await message.answer("У вас нет прав администратора.", show_alert=True)
             else:
                 await message.reply("У вас нет прав администратора.")
         return wrapper
@@ -64,7 +84,7 @@ def format_status_report(users, statuses):
     """
     Форматирует отчет по статусам сотрудников для отправки администратору.
     """
-    report = ""
+    lines = []
     status_dict = {status['telegram_id']: status for status in statuses}
     for user in users:
         user_id = user['telegram_id']
@@ -75,23 +95,89 @@ def format_status_report(users, statuses):
                 status += f" ({description})"
         else:
             status = "Другое (На уточнении)"
-        report += f"{user['full_name']}: {status}\n"
-    return report
+        lines.append(f"{user['full_name']}: {status}")
+    return "\n".join(lines)
+
+# Статусы в порядке их вывода в ежедневном отчете
+REPORT_STATUSES = ('Очно', 'Удаленно', 'Больничный', 'В отпуске', 'Другое', 'Не известно')
+
+def format_daily_report(users, buckets):
+    """
+    Форматирует ежедневный отчет по статусам: количество и имена сотрудников по каждому статусу.
+    buckets — словарь статус -> список Telegram ID; сотрудники, не попавшие ни в один статус,
+    считаются "Не известно".
+    """
+    names = {user['telegram_id']: user['full_name'].split()[0] for user in users}
+    res_stats = {
+        status: [names[user_id] for user_id in buckets.get(status, ()) if user_id in names]
+        for status in REPORT_STATUSES
+    }
+    answered = set()
+    for members in buckets.values():
+        answered.update(members)
+    res_stats['Не известно'] += [
+        name for user_id, name in names.items() if user_id not in answered
+    ]
+
+    lines = ["", f'В офисе: {len(res_stats["Очно"])}']
+    for status in REPORT_STATUSES[1:]:
+        lines.append(f'{status}: {len(res_stats[status])} - {", ".join(res_stats[status])}')
+    return "\n".join(lines)
+
+def escape_markdown(text: str) -> str:
+    """
+    Экранирует символы разметки Markdown (_ * ` [) в тексте, введенном пользователем.
+    """
+    return re.sub(r'([_*`\[])', r'\\\1', str(text))
+
+def markdown_mention(full_name: str, telegram_id: int) -> str:
+    """
+    Ссылка Markdown на пользователя. Внутри ссылки разметка не разбирается,
+    поэтому квадратные скобки, которые завершили бы текст ссылки, заменяются круглыми.
+    """
+    name = str(full_name).replace('[', '(').replace(']', ')')
+    return f"[{name}](tg://user?id={telegram_id})"
 
 async def notify_admins(dp, db: Database, message_text: str):
     """
-    Уведомляет всех администраторов указанным сообщением.
-    """
-    admins = await db.get_admins()
-    for admin in admins:
-        try:
-            await dp.bot.send_message(
-                chat_id=admin['telegram_id'],
-                text=message_text,
-                parse_mode='Markdown'
-            )
-        except ChatNotFound:
-            logging.error(f"Чат с администратором {admin['telegram_id']} не найден.")
+    Уведомляет всех администраторов указанным сообщением (разметка Markdown;
+    пользовательские значения экранируются escape_markdown).
+    Сообщение попадает в сводный дайджест (notifications.py), который отправляется
+    администраторам одним сообщением по истечении окна накопления.
+    """
+    admin_digest.add(db, message_text)
+
+async def flush_admin_notifications():
+    """
+    Немедленно ставит накопленный дайджест уведомлений администраторам в очередь outbox.
+    """
+    await admin_digest.flush()
+
+async def send_long_text(bot, chat_id: int, text: str, filename: str, reply_to_message_id: int = None):
+    """
+    Отправляет длинный текст (отчет) с учетом лимита Telegram на длину сообщения:
+    несколько сообщений по границам строк, а если их больше config.REPORT_MAX_PAGES —
+    один текстовый файл filename с первой строкой текста в подписи.
+    """
+    pages = split_text(text)
+    if len(pages) > config.REPORT_MAX_PAGES:
+        await bot.send_document(
+            chat_id,
+            InputFile(io.BytesIO(text.encode('utf-8')), filename=filename),
+            caption=text.split('\n', 1)[0][:1024],
+            reply_to_message_id=reply_to_message_id
+        )
+        return
+    for page in pages:
+        await limiter.acquire(chat_id)
+        await bot.send_message(chat_id, page, reply_to_message_id=reply_to_message_id)
+        reply_to_message_id = None
+
+async def reply_long_text(message: types.Message, text: str, filename: str):
+    """
+    Отвечает на сообщение длинным текстом (см. send_long_text).
+    """
+    await send_long_text(message.bot, message.chat.id, text, filename, message.message_id)
 
 async def get_user_full_name(db: Database, telegram_id: int):
     """
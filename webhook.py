@@ -0,0 +1,132 @@
+'''
+Пояснения по коду:
+
+Режим приема обновлений через webhook (python main.py --webhook):
+
+Telegram отправляет каждое обновление POST-запросом на config.WEBHOOK_URL + config.WEBHOOK_PATH,
+вместо того чтобы бот постоянно опрашивал getUpdates. Обновления приходят сразу,
+а в отсутствие событий бот ничего не делает.
+
+Проверка секрета:
+
+При регистрации webhook (set_webhook) передается config.WEBHOOK_SECRET; Telegram присылает его
+в заголовке X-Telegram-Bot-Api-Secret-Token. Запросы без верного секрета отклоняются с кодом 403.
+Без секрета сервер не создается: иначе любой, кто может обратиться к порту, отправил бы
+поддельное обновление от имени администратора. Сервер по умолчанию слушает только 127.0.0.1
+(config.WEBAPP_HOST), внешние запросы принимает обратный прокси.
+
+Ограниченный пул обработчиков:
+
+HTTP-обработчик только разбирает обновление, кладет его в очередь (не больше
+config.WEBHOOK_QUEUE_SIZE) и сразу отвечает 200, поэтому Telegram не ждет окончания обработки.
+Обновления из очереди обрабатывают config.WEBHOOK_WORKERS задач (dp.updates_handler.notify):
+число одновременно выполняемых обработчиков ограничено при любом всплеске нажатий.
+Если очередь заполнена, возвращается 503 и Telegram повторит доставку позже.
+
+Для локальной проверки записанные обновления можно отправить на сервер скриптом
+replay_updates.py (WEBHOOK_URL при этом можно не указывать — см. config.WEBHOOK_URL).
+'''
+# webhook.py
+import asyncio
+import hmac
+import logging
+import re
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+import config
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Допустимый секрет webhook по правилам Bot API
+SECRET_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,256}')
+
+
+class WebhookServer:
+    def __init__(self, dp: Dispatcher, workers: int, queue_size: int, secret: str):
+        if not SECRET_PATTERN.fullmatch(secret or ''):
+            raise ValueError(
+                "WEBHOOK_SECRET не задан или содержит недопустимые символы (1–256 символов A-Z, a-z, 0-9, _, -)."
+            )
+        self.dp = dp
+        self.workers = workers
+        self.secret = secret
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._runner = None
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, self.handle)
+        return app
+
+    async def handle(self, request: web.Request):
+        """
+        Принимает обновление от Telegram и ставит его в очередь на обработку.
+        """
+        if not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, '').encode(), self.secret.encode()
+        ):
+            return web.Response(status=403)
+        try:
+            update = types.Update(**await request.json())
+        except ValueError:
+            return web.Response(status=400)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logging.warning("Очередь обновлений заполнена, обновление будет доставлено повторно.")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self):
+        Dispatcher.set_current(self.dp)
+        Bot.set_current(self.dp.bot)
+        while True:
+            update = await self.queue.get()
+            try:
+                # Отдельная задача на обновление: фильтры aiogram кэшируют состояние FSM
+                # в контекстных переменных, которые не должны переходить к следующему обновлению.
+                # updates_handler.notify, в отличие от process_update, вызывает промежуточные
+                # обработчики обновлений (throttling.py)
+                await asyncio.ensure_future(self.dp.updates_handler.notify(update))
+            except Exception as e:
+                logging.error(f"Ошибка при обработке обновления {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, host: str, port: int, reuse_port: bool = False):
+        """
+        Запускает обработчики и HTTP-сервер, регистрирует webhook в Telegram.
+        reuse_port позволяет нескольким процессам слушать один порт (main.py --workers).
+        """
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port, reuse_port=reuse_port or None).start()
+        if config.WEBHOOK_URL:
+            await self.dp.bot.set_webhook(
+                config.WEBHOOK_URL + config.WEBHOOK_PATH,
+                secret_token=self.secret,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS
+            )
+        logging.info(f"Webhook-сервер запущен на {host}:{port}{config.WEBHOOK_PATH}")
+
+    async def stop(self):
+        """
+        Останавливает прием обновлений и дожидается обработки уже принятых.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def serve_forever(self, host: str, port: int, reuse_port: bool = False):
+        await self.start(host, port, reuse_port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()